@@ -0,0 +1,45 @@
+import hashlib
+import logging
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Lives in legal_db; names starting with "_" are skipped by content retrieval.
+CORPUS_META_COLLECTION = "_corpus_meta"
+CORPUS_VERSION_ID = "version"
+# Non-content collections that may live next to the corpus in legal_db.
+NON_CONTENT_COLLECTIONS = {
+    'logs', 'users', 'admin_marking', 'admin_answers', 'keywords',
+    'fs.files', 'fs.chunks', 'admin_users', 'system.views',
+    'system.version', 'system.profile'
+}
+
+
+def is_content_collection(name: str) -> bool:
+    return not name.startswith('system.') and not name.startswith('_') and name not in NON_CONTENT_COLLECTIONS
+
+
+def bump_corpus_version(db, reason: str = "") -> str:
+    '''Records a content change in the legal corpus (call after ETL writes). Returns the new version.'''
+    version = uuid.uuid4().hex
+    db[CORPUS_META_COLLECTION].update_one(
+        {"_id": CORPUS_VERSION_ID},
+        {"$set": {"version": version, "reason": reason, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    logger.info(f"Corpus version bumped to {version} ({reason}).")
+    return version
+
+
+def get_corpus_version(db) -> str:
+    '''
+    Version of the legal corpus: the last ETL-recorded version combined with a fingerprint of
+    the content collections and their document counts, so manual edits that add or remove
+    documents also count as a change. Uses only metadata operations.
+    '''
+    meta = db[CORPUS_META_COLLECTION].find_one({"_id": CORPUS_VERSION_ID}, {"version": 1}) or {}
+    parts = [meta.get("version", "")]
+    for name in sorted(filter(is_content_collection, db.list_collection_names())):
+        parts.append(f"{name}={db[name].estimated_document_count()}")
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
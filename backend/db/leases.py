@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from backend.db.mongo_utils import get_async_chatbot_db
+
+
+class Lease:
+    '''
+    Time-limited lease on a state document in chatbot_db, so only one app worker at a time
+    runs a periodic job. It is taken with an upsert that only matches a free, expired or
+    self-owned lease; a worker that hits the existing document instead gets None. The state
+    document also carries the job's own progress fields (high-water marks and the like).
+    '''
+
+    def __init__(self, collection: str, state_id: str, seconds: float):
+        self.collection = collection
+        self.state_id = state_id
+        self.seconds = seconds
+        self.owner = uuid.uuid4().hex
+
+    async def acquire(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        '''Takes (or, for the holder, renews) the lease. Returns the state document, or None while another worker holds it.'''
+        now = now or datetime.utcnow()
+        try:
+            return await get_async_chatbot_db()[self.collection].find_one_and_update(
+                {"_id": self.state_id, "$or": [
+                    {"lease_until": {"$lt": now}},
+                    {"lease_until": {"$exists": False}},
+                    {"lease_owner": self.owner},
+                ]},
+                {"$set": {
+                    "lease_until": now + timedelta(seconds=self.seconds),
+                    "lease_owner": self.owner
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The state document exists and another worker holds the lease.
+            return None
+
+    async def release(self, fields: Optional[Dict[str, Any]] = None) -> None:
+        '''Gives the lease up, storing fields on the state document if given. A no-op if it was taken over.'''
+        update: Dict[str, Any] = {"$unset": {"lease_until": "", "lease_owner": ""}}
+        if fields:
+            update["$set"] = fields
+        await get_async_chatbot_db()[self.collection].update_one(
+            {"_id": self.state_id, "lease_owner": self.owner}, update
+        )
@@ -0,0 +1,191 @@
+import io
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from backend.db.mongo_utils import LOGS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Overridable from the environment.
+EXPORT_BATCH_SIZE = int(os.getenv("LOG_EXPORT_BATCH_SIZE", "50000"))  # rows per record batch / row group
+
+# Column name -> (Arrow type, path of the value in the log document).
+LOG_COLUMNS: Dict[str, tuple] = {
+    "_id": (pa.string(), ("_id",)),
+    "timestamp": (pa.timestamp("ms"), ("timestamp",)),
+    "user_id": (pa.string(), ("user_id",)),
+    "query_text": (pa.string(), ("query_text",)),
+    "bot_response_text": (pa.string(), ("bot_response_text",)),
+    "status": (pa.string(), ("status",)),
+    "language": (pa.string(), ("language",)),
+    "similarity_score": (pa.float64(), ("similarity_score",)),
+    "triage": (pa.string(), ("triage",)),
+}
+# Admin markings and answers, stored on the log entry by insert_admin_marking / insert_admin_answer.
+ADMIN_COLUMNS: Dict[str, tuple] = {
+    "mark_status": (pa.string(), ("marking", "status")),
+    "marked_by": (pa.string(), ("marking", "marked_by")),
+    "marked_at": (pa.timestamp("ms"), ("marking", "marked_at")),
+    "answer": (pa.string(), ("answer",)),
+    "answered_at": (pa.timestamp("ms"), ("answered_at",)),
+    "answered_by": (pa.string(), ("answered_by",)),
+}
+DEFAULT_COLUMNS = list(LOG_COLUMNS)
+
+
+def resolve_columns(columns: Optional[List[str]] = None, include_admin: bool = False) -> List[str]:
+    '''Validated column list; defaults to all log columns, plus the admin columns if requested.'''
+    available = {**LOG_COLUMNS, **ADMIN_COLUMNS}
+    columns = list(columns or DEFAULT_COLUMNS)
+    if include_admin:
+        columns += [c for c in ADMIN_COLUMNS if c not in columns]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {unknown}. Available: {list(available)}")
+    return columns
+
+
+def build_schema(columns: List[str]) -> pa.Schema:
+    available = {**LOG_COLUMNS, **ADMIN_COLUMNS}
+    return pa.schema([(c, available[c][0]) for c in columns])
+
+
+def build_export_query(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+    if not (start or end):
+        return {}
+    window = {}
+    if start:
+        window["$gte"] = start
+    if end:
+        window["$lt"] = end
+    return {"timestamp": window}
+
+
+def _projection(columns: List[str]) -> Dict[str, int]:
+    available = {**LOG_COLUMNS, **ADMIN_COLUMNS}
+    return {".".join(available[c][1]): 1 for c in columns}
+
+
+def _value(doc: Dict[str, Any], path: tuple) -> Any:
+    for key in path:
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def iter_record_batches(
+    db,
+    columns: List[str],
+    query: Optional[Dict[str, Any]] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[pa.RecordBatch]:
+    '''
+    Streams logs from a (sync) Mongo cursor as Arrow record batches of batch_size rows.
+    Only one batch of column buffers is held in memory at a time.
+    '''
+    available = {**LOG_COLUMNS, **ADMIN_COLUMNS}
+    schema = build_schema(columns)
+    paths = [available[c][1] for c in columns]
+    cursor = (
+        db[LOGS_COLLECTION]
+        .find(query or {}, _projection(columns))
+        .sort("timestamp", 1)
+        .batch_size(min(batch_size, 10000))
+    )
+    values: List[list] = [[] for _ in columns]
+    rows = 0
+    try:
+        for doc in cursor:
+            for column_values, path in zip(values, paths):
+                value = _value(doc, path)
+                # ObjectIds and any other non-string ids are exported as strings.
+                column_values.append(str(value) if path == ("_id",) else value)
+            rows += 1
+            if rows == batch_size:
+                yield pa.record_batch(values, schema=schema)
+                values = [[] for _ in columns]
+                rows = 0
+        if rows:
+            yield pa.record_batch(values, schema=schema)
+    finally:
+        cursor.close()
+
+
+class _ChunkSink(io.RawIOBase):
+    '''Write-only file object that hands written bytes back to the caller in chunks.'''
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        chunk, self._chunks = b"".join(self._chunks), []
+        return chunk
+
+
+def iter_export_bytes(
+    db,
+    columns: List[str],
+    query: Optional[Dict[str, Any]] = None,
+    fmt: str = "parquet",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    '''
+    Encodes the export as Parquet (one row group per batch) or an Arrow IPC stream and yields
+    the bytes as each batch is written, so an HTTP response can stream it.
+    '''
+    schema = build_schema(columns)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    elif fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    rows = 0
+    with writer:
+        for batch in iter_record_batches(db, columns, query, batch_size):
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=batch_size)
+            else:
+                writer.write_batch(batch)
+            rows += batch.num_rows
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    chunk = sink.take()
+    if chunk:
+        yield chunk
+    logger.info(f"Exported {rows} log rows as {fmt} ({len(columns)} columns).")
+
+
+def export_to_file(
+    db,
+    path: str,
+    columns: List[str],
+    query: Optional[Dict[str, Any]] = None,
+    fmt: str = "parquet",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> None:
+    '''Writes the export to a local file.'''
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in iter_export_bytes(db, columns, query, fmt, batch_size):
+            f.write(chunk)
+    os.replace(tmp_path, path)
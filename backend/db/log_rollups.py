@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from backend.db.mongo_utils import get_async_chatbot_db, LOGS_COLLECTION
+from backend.db.leases import Lease
+
+logger = logging.getLogger(__name__)
+
+# Refresh schedule and windows (all overridable from the environment).
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "300"))  # seconds between incremental refreshes
+# Logs reach MongoDB through the batched log sink, so leave recent entries for the next run.
+ROLLUP_LAG_SECONDS = float(os.getenv("ROLLUP_LAG_SECONDS", "60"))
+# Each refresh recomputes the hours this far behind the high-water mark, so logs written up
+# to this long after their timestamp (slow sink flushes, retries) are still counted.
+ROLLUP_LATE_SECONDS = float(os.getenv("ROLLUP_LATE_SECONDS", "3600"))
+ROLLUP_LEASE_SECONDS = float(os.getenv("ROLLUP_LEASE_SECONDS", "600"))
+ROLLUP_WRITE_BATCH_SIZE = int(os.getenv("ROLLUP_WRITE_BATCH_SIZE", "1000"))
+
+HOURLY_COLLECTION = "log_rollups_hourly"
+DAILY_COLLECTION = "log_rollups_daily"
+QUESTIONS_COLLECTION = "log_rollup_questions"
+STATE_COLLECTION = "log_rollup_state"
+STATE_ID = "logs"
+
+
+def _key(value: Optional[str]) -> str:
+    '''Makes a status/language value safe to use as a field name.'''
+    return (value or "unknown").replace(".", "_").replace("$", "_")
+
+
+def _empty_counts() -> Dict[str, Any]:
+    return {"total": 0, "status": {}, "language": {}}
+
+
+def _add_counts(totals: Dict[str, Any], doc: Dict[str, Any]) -> None:
+    '''Adds the counters of a rollup document into totals.'''
+    totals["total"] += doc.get("total", 0)
+    for field in ("status", "language"):
+        for name, count in doc.get(field, {}).items():
+            totals[field][name] = totals[field].get(name, 0) + count
+
+
+class LogRollups:
+    '''
+    Incremental per-hour/per-day summaries of the chat logs, so dashboard reads scale with
+    the number of days, not queries. Each refresh recomputes the hours from ROLLUP_LATE_SECONDS
+    before the stored high-water mark up to now (minus ROLLUP_LAG_SECONDS) and overwrites their
+    rollup documents; the days they fall in are re-summed from the hourly documents. Rewriting
+    totals instead of incrementing them makes a refresh safe to repeat after a failure or a
+    lease takeover. The lease on the state document keeps workers from doing the work twice.
+    '''
+
+    def __init__(self, interval: float = ROLLUP_INTERVAL):
+        self.interval = interval
+        self._lease = Lease(STATE_COLLECTION, STATE_ID, ROLLUP_LEASE_SECONDS)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        await self.ensure_indexes()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Log rollups started (interval={self.interval}s).")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def ensure_indexes(self) -> None:
+        db = get_async_chatbot_db()
+        await db[QUESTIONS_COLLECTION].create_index(
+            [("day", ASCENDING), ("count", DESCENDING)],
+            name="day_count_questions"
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Log rollup refresh failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> int:
+        '''Recomputes the rollups of the hours since the high-water mark. Returns the number of logs in them.'''
+        # Log timestamps are naive local time (LogEntry default), so the window is too.
+        now = datetime.now()
+        state = await self._lease.acquire(now)
+        if state is None:
+            return 0
+        high_water_mark = state.get("high_water_mark")
+        upto = now - timedelta(seconds=ROLLUP_LAG_SECONDS)
+        if high_water_mark is not None and high_water_mark >= upto:
+            await self._lease.release()
+            return 0
+
+        start = None
+        if high_water_mark is not None:
+            start = (high_water_mark - timedelta(seconds=ROLLUP_LATE_SECONDS)).replace(minute=0, second=0, microsecond=0)
+        try:
+            added = await self._aggregate_window(start, upto)
+        except Exception:
+            await self._lease.release()
+            raise
+        await self._lease.release({"high_water_mark": upto, "updated_at": datetime.now()})
+        if added:
+            logger.info(f"Rolled up {added} log entries up to {upto.isoformat()} (recomputed from {start}).")
+        return added
+
+    async def _aggregate_window(self, start: Optional[datetime], end: datetime) -> int:
+        '''Rewrites the rollups of the hours in [start, end]; start must be on an hour boundary.'''
+        db = get_async_chatbot_db()
+        window = {"$lte": end}
+        if start is not None:
+            window["$gte"] = start
+        match = {"$match": {"timestamp": window}}
+
+        buckets = await (await db[LOGS_COLLECTION].aggregate([
+            match,
+            {"$group": {
+                "_id": {
+                    "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+                    "status": {"$ifNull": ["$status", "unknown"]},
+                    "language": {"$ifNull": ["$language", "unknown"]},
+                },
+                "count": {"$sum": 1},
+            }},
+        ])).to_list(None)
+        if not buckets:
+            return 0
+
+        hourly: Dict[datetime, Dict[str, Any]] = {}
+        for bucket in buckets:
+            counts = hourly.setdefault(bucket["_id"]["hour"], _empty_counts())
+            _add_counts(counts, {
+                "total": bucket["count"],
+                "status": {_key(bucket["_id"]["status"]): bucket["count"]},
+                "language": {_key(bucket["_id"]["language"]): bucket["count"]},
+            })
+        await db[HOURLY_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": hour}, counts, upsert=True) for hour, counts in hourly.items()], ordered=False
+        )
+
+        # Days are re-summed from their hourly documents, which also covers hours outside the window.
+        daily = []
+        for day in sorted({hour.replace(hour=0) for hour in hourly}):
+            totals = _empty_counts()
+            async for doc in db[HOURLY_COLLECTION].find({"_id": {"$gte": day, "$lt": day + timedelta(days=1)}}):
+                _add_counts(totals, doc)
+            daily.append(ReplaceOne({"_id": day}, totals, upsert=True))
+        await db[DAILY_COLLECTION].bulk_write(daily, ordered=False)
+
+        questions = await (await db[LOGS_COLLECTION].aggregate([
+            match,
+            {"$group": {
+                "_id": {
+                    "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+                    "question": {"$toLower": {"$trim": {"input": {"$ifNull": ["$query_text", ""]}}}},
+                },
+                "count": {"$sum": 1},
+            }},
+            {"$match": {"_id.question": {"$ne": ""}}},
+        ], allowDiskUse=True)).to_list(None)
+        requests: List[UpdateOne] = []
+        for q in questions:
+            hour, question = q["_id"]["hour"], q["_id"]["question"]
+            digest = hashlib.sha1(question.encode("utf-8")).hexdigest()
+            requests.append(UpdateOne(
+                {"_id": f"{hour:%Y-%m-%dT%H}:{digest}"},
+                {"$set": {"count": q["count"]}, "$setOnInsert": {"day": hour.replace(hour=0), "hour": hour, "question": question}},
+                upsert=True
+            ))
+        for i in range(0, len(requests), ROLLUP_WRITE_BATCH_SIZE):
+            await db[QUESTIONS_COLLECTION].bulk_write(requests[i:i + ROLLUP_WRITE_BATCH_SIZE], ordered=False)
+
+        return sum(bucket["count"] for bucket in buckets)
+
+    async def get_stats(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: str = "day",
+        top: int = 10,
+    ) -> Dict[str, Any]:
+        '''Dashboard statistics for [start, end), read from the rollups only.'''
+        db = get_async_chatbot_db()
+        if start is None:
+            span = timedelta(days=30) if granularity == "day" else timedelta(hours=48)
+            start = (end or datetime.now()) - span
+        # Widen start to the bucket containing it.
+        first_bucket = start.replace(minute=0, second=0, microsecond=0)
+        if granularity == "day":
+            first_bucket = first_bucket.replace(hour=0)
+        bucket_range: Dict[str, Any] = {"$gte": first_bucket}
+        if end is not None:
+            bucket_range["$lt"] = end
+        collection = DAILY_COLLECTION if granularity == "day" else HOURLY_COLLECTION
+
+        docs = await db[collection].find({"_id": bucket_range}).sort("_id", ASCENDING).to_list(None)
+        totals = _empty_counts()
+        buckets = []
+        for doc in docs:
+            buckets.append({
+                "start": doc["_id"],
+                "total": doc.get("total", 0),
+                "status": doc.get("status", {}),
+                "language": doc.get("language", {}),
+            })
+            _add_counts(totals, doc)
+        answered = totals["status"].get("answered", 0)
+        totals["answered_ratio"] = round(answered / totals["total"], 4) if totals["total"] else None
+
+        day_range = {"$gte": first_bucket.replace(hour=0)}
+        if end is not None:
+            day_range["$lt"] = end
+        top_questions = await (await db[QUESTIONS_COLLECTION].aggregate([
+            {"$match": {"day": day_range}},
+            {"$group": {"_id": "$question", "count": {"$sum": "$count"}}},
+            {"$sort": {"count": -1}},
+            {"$limit": top},
+        ])).to_list(None)
+
+        state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"high_water_mark": 1})
+        return {
+            "granularity": granularity,
+            "up_to": state.get("high_water_mark") if state else None,
+            "totals": totals,
+            "buckets": buckets,
+            "top_questions": [{"question": q["_id"], "count": q["count"]} for q in top_questions],
+        }
+
+
+log_rollups = LogRollups()
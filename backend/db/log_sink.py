@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from pymongo.errors import BulkWriteError
+from backend.services.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Writer tuning; every value can be overridden from the environment.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))  # seconds
+LOG_OVERFLOW_POLICY = os.getenv("LOG_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest | drop_newest
+# Entries that wait longer than this before being written are counted as delayed.
+LOG_DELAY_THRESHOLD = float(os.getenv("LOG_DELAY_THRESHOLD", "5.0"))  # seconds
+
+
+class LogSink:
+    '''
+    Background writer for chat logs. Requests enqueue entries without touching MongoDB;
+    a writer task flushes them with insert_many(ordered=False) whenever LOG_BATCH_SIZE
+    entries are waiting or LOG_FLUSH_INTERVAL has passed, whichever comes first.
+    When the bounded queue is full, the overflow policy drops the oldest or the newest entry.
+    '''
+
+    def __init__(
+        self,
+        collection_getter: Callable[[], Any],
+        max_queue: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        overflow_policy: str = LOG_OVERFLOW_POLICY,
+    ):
+        if overflow_policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        self._collection_getter = collection_getter
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[tuple] = []
+        self.metrics: Dict[str, float] = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "delayed": 0,
+            "flushes": 0,
+            "max_delay_seconds": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, float]:
+        '''Snapshot of the sink counters plus the current queue depth.'''
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {**self.metrics, "queue_depth": depth + len(self._batch)}
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Log sink started (batch={self.batch_size}, interval={self.flush_interval}s, policy={self.overflow_policy}).")
+
+    async def stop(self) -> None:
+        '''Stops the writer and flushes everything still queued.'''
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            # Shielded, so cancelling stop() itself doesn't interrupt the final flush.
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                raise  # stop() was cancelled; the flush finishes in the background
+        # A writer cancelled before it ever ran never reached its shutdown flush.
+        await self._drain()
+        logger.info(f"Log sink stopped: {self.stats()}")
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        '''Enqueues an entry without blocking. Returns False if an entry was dropped for it.'''
+        item = (time.monotonic(), entry)
+        try:
+            self._queue.put_nowait(item)
+            self.metrics["enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.metrics["dropped"] += 1
+        if self.metrics["dropped"] == 1 or self.metrics["dropped"] % 100 == 0:
+            logger.warning(f"Log queue full ({self.max_queue}); {int(self.metrics['dropped'])} entries dropped so far.")
+        if self.overflow_policy == "drop_newest":
+            return False
+        try:
+            self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self._queue.put_nowait(item)
+        self.metrics["enqueued"] += 1
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                self._batch.append(await self._queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(self._batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                batch, self._batch = self._batch, []
+                try:
+                    await self._flush(batch)
+                except asyncio.CancelledError:
+                    # Cancelled mid-write: put the batch back for the shutdown flush (_drain).
+                    # insert_many set each entry's _id, so entries that did get written
+                    # come back as duplicates instead of being inserted twice.
+                    self._batch = batch + self._batch
+                    raise
+        except asyncio.CancelledError:
+            await self._drain()
+            raise
+
+    async def _drain(self) -> None:
+        '''Shutdown: writes the partial batch and whatever is still queued.'''
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+        batch, self._batch = self._batch, []
+        for start in range(0, len(batch), self.batch_size):
+            await self._flush(batch[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        now = time.monotonic()
+        oldest = max(now - queued_at for queued_at, _ in batch)
+        self.metrics["max_delay_seconds"] = max(self.metrics["max_delay_seconds"], oldest)
+        self.metrics["delayed"] += sum(1 for queued_at, _ in batch if now - queued_at > LOG_DELAY_THRESHOLD)
+        entries = [entry for _, entry in batch]
+        try:
+            collection = self._collection_getter()
+            with stage_timer("mongo_log_flush").time():
+                await collection.insert_many(entries, ordered=False)
+            self.metrics["written"] += len(entries)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            # Duplicate keys are entries already written by an interrupted flush.
+            written = e.details.get("nInserted", 0) + sum(1 for err in errors if err.get("code") == 11000)
+            self.metrics["written"] += written
+            self.metrics["failed"] += len(entries) - written
+            if written < len(entries):
+                logger.error(f"Failed to write {len(entries) - written} of {len(entries)} log entries: {errors[:3]}")
+        except Exception as e:
+            self.metrics["failed"] += len(entries)
+            logger.error(f"Failed to write {len(entries)} log entries: {e}", exc_info=True)
+        finally:
+            self.metrics["flushes"] += 1
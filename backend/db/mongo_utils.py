@@ -1,23 +1,37 @@
+import asyncio
+import base64
 import logging
 import os
+import re
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from bson import ObjectId
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import ConnectionFailure
+from bson.errors import InvalidId
+from pymongo import MongoClient, AsyncMongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import ConnectionFailure, BulkWriteError
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from backend.db.log_sink import LogSink
+from backend.services.metrics import stage_timer
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# ATLAS client and database instances o(≧∀≦)o  
+# ATLAS client and database instances o(≧∀≦)o
+# The async client serves the API routes; the sync client is a facade for the
+# synchronous RAG code and ETL scripts.
+async_client: Optional[AsyncMongoClient] = None
 client: Optional[MongoClient] = None
 chatbot_db = None   # For users, logs, keywords (user base)
 admin_db = None     # For admin users, markings, answers (admin base)
 legal_db = None     # data base BWHAHAHA ^o^/
 links_db = None     # For reference links
+# Sync facade handles of the same databases
+sync_chatbot_db = None
+sync_admin_db = None
+sync_legal_db = None
+sync_links_db = None
 
 # .env refrence
 LOGS_COLLECTION = os.getenv('LOGS_COLLECTION', 'logs')
@@ -25,61 +39,107 @@ KEYWORDS_COLLECTION = os.getenv('KEYWORDS_COLLECTION', 'keywords')
 ADMIN_USERS_COLLECTION = os.getenv('ADMIN_USERS_COLLECTION', 'admin_users')
 ADMIN_MARKINGS_COLLECTION = 'admin_markings'
 ADMIN_ANSWERS_COLLECTION = 'admin_answers'
-
-async def connect_to_mongo(mongo_uri: str) -> None:
-    '''Initialize MongoDB connections <init>'''
-    global client, legal_db, chatbot_db, admin_db, links_db
+LOGS_PAGE_MAX = 1000
+# Admin triage state of a log entry. Open items (unanswered/marked) form the admin queue.
+TRIAGE_UNANSWERED = 'unanswered'
+TRIAGE_MARKED = 'marked'
+TRIAGE_ANSWERED = 'answered'
+OPEN_TRIAGE_STATES = [TRIAGE_UNANSWERED, TRIAGE_MARKED]
+# Index behind keyset pagination of the logs, and the name an older timestamp-only one used.
+LOGS_TIMESTAMP_INDEX = 'timestamp_id_logs'
+LOGS_TIMESTAMP_INDEX_KEYS = [("timestamp", ASCENDING), ("_id", ASCENDING)]
+LEGACY_LOGS_TIMESTAMP_INDEX = 'timestamp_logs'
+# One document per one-off data migration that has been applied to chatbot_db.
+MIGRATIONS_COLLECTION = 'migrations'
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+# Connection pool tuning for the async client (Atlas round trips dominate, so keep warm connections).
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_MAX_CONNECTING = int(os.getenv('MONGO_MAX_CONNECTING', '4'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+# The sync facade only serves RAG lookups and scripts, so it gets a smaller pool.
+MONGO_SYNC_MAX_POOL_SIZE = int(os.getenv('MONGO_SYNC_MAX_POOL_SIZE', '20'))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+async def connect_to_mongo(
+    mongo_uri: str,
+    async_mongo_client: Optional[AsyncMongoClient] = None,
+    sync_mongo_client: Optional[MongoClient] = None,
+) -> None:
+    '''
+    Initialize MongoDB connections <init>
+    Pre-built clients can be passed in (e.g. a local mongod or an in-memory stand-in for tests).
+    '''
+    global async_client, client, legal_db, chatbot_db, admin_db, links_db
+    global sync_legal_db, sync_chatbot_db, sync_admin_db, sync_links_db
     try:
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        async_client = async_mongo_client or AsyncMongoClient(
+            mongo_uri,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            maxConnecting=MONGO_MAX_CONNECTING,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            retryWrites=True,
+        )
+        client = sync_mongo_client or MongoClient(
+            mongo_uri,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGO_SYNC_MAX_POOL_SIZE,
+        )
         # <Test> ¬_¬
-        client.admin.command('ping')
+        await async_client.admin.command('ping')
 
         # Initialize separate databases for future databases catogaries extension.... ig
-        legal_db = client['legal_db']
-        chatbot_db = client['chatbot_db']
-        admin_db = client['admin_db']
-        links_db = client['links_db']
-
-        # Drop existing indexes in chatbot_db to avoid conflicts
-        try:
-            chatbot_db.users.drop_indexes()
-            chatbot_db[KEYWORDS_COLLECTION].drop_indexes()
-            chatbot_db[LOGS_COLLECTION].drop_indexes()
-            chatbot_db[ADMIN_USERS_COLLECTION].drop_indexes()
-            logger.info("Dropped existing indexes in chatbot_db")
-        except Exception as e:
-            logger.warning(f"Error dropping indexes: {e}")
+        legal_db = async_client['legal_db']
+        chatbot_db = async_client['chatbot_db']
+        admin_db = async_client['admin_db']
+        links_db = async_client['links_db']
+        sync_legal_db = client['legal_db']
+        sync_chatbot_db = client['chatbot_db']
+        sync_admin_db = client['admin_db']
+        sync_links_db = client['links_db']
 
         # Clean up null values in chatbot_db
         try:
-            chatbot_db[KEYWORDS_COLLECTION].delete_many({"keyword": None})
-            chatbot_db.users.delete_many({"email": None})
-            chatbot_db[ADMIN_USERS_COLLECTION].delete_many({"email": None})
+            await chatbot_db[KEYWORDS_COLLECTION].delete_many({"keyword": None})
+            await chatbot_db.users.delete_many({"email": None})
+            await chatbot_db[ADMIN_USERS_COLLECTION].delete_many({"email": None})
             logger.info("Cleaned up null values in chatbot_db")
         except Exception as e:
             logger.warning(f"Error cleaning up null values: {e}")
 
-        # Create new indexes with explicit names in chatbot_db
-        chatbot_db.users.create_index(
+        # Create indexes with explicit names in chatbot_db (a no-op when they already exist)
+        await chatbot_db.users.create_index(
             [("email", ASCENDING)],
             unique=True,
             partialFilterExpression={"email": {"$type": "string"}},
             name="unique_email_users"
         )
 
-        chatbot_db[LOGS_COLLECTION].create_index(
-            [("timestamp", ASCENDING)],
-            name="timestamp_logs"
+        await _ensure_logs_timestamp_index()
+
+        # Admin queue: only open items are indexed, newest first via (timestamp, _id).
+        # ($in in a partial filter needs MongoDB 6.0+.)
+        await chatbot_db[LOGS_COLLECTION].create_index(
+            [("triage", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+            partialFilterExpression={"triage": {"$in": OPEN_TRIAGE_STATES}},
+            name="open_triage_logs"
         )
+        await backfill_log_triage()
 
-        chatbot_db[KEYWORDS_COLLECTION].create_index(
+        await chatbot_db[KEYWORDS_COLLECTION].create_index(
             [("keyword", ASCENDING)],
             unique=True,
             partialFilterExpression={"keyword": {"$type": "string"}},
             name="unique_keyword"
         )
 
-        chatbot_db[ADMIN_USERS_COLLECTION].create_index(
+        await chatbot_db[ADMIN_USERS_COLLECTION].create_index(
             [("email", ASCENDING)],
             unique=True,
             partialFilterExpression={"email": {"$type": "string"}},
@@ -95,39 +155,101 @@ async def connect_to_mongo(mongo_uri: str) -> None:
         logger.error(f"❌ Unexpected error connecting to MongoDB: {e}", exc_info=True)
         raise
 
-def get_legal_db():
-    '''Get the legal content database connection.'''
+async def _ensure_logs_timestamp_index() -> None:
+    '''
+    (timestamp, _id) index on the logs, so keyset pagination of the admin log views is a pure
+    index scan. Replaces the older timestamp-only index, which is dropped once.
+    '''
+    logs = get_async_chatbot_db()[LOGS_COLLECTION]
+    legacy = (await logs.index_information()).get(LEGACY_LOGS_TIMESTAMP_INDEX)
+    if legacy and [tuple(part) for part in legacy["key"]] == LOGS_TIMESTAMP_INDEX_KEYS:
+        # Already built with this key under the old name; building it again would conflict.
+        return
+    if legacy:
+        await logs.drop_index(LEGACY_LOGS_TIMESTAMP_INDEX)
+        logger.info(f"Dropped legacy index {LEGACY_LOGS_TIMESTAMP_INDEX} on {LOGS_COLLECTION}")
+    await logs.create_index(LOGS_TIMESTAMP_INDEX_KEYS, name=LOGS_TIMESTAMP_INDEX)
+
+def connect_sync_facade(mongo_uri: str, sync_mongo_client: Optional[MongoClient] = None) -> None:
+    '''
+    Initialize only the sync facade (for batch scripts that reuse the RAG pipeline).
+    Unlike connect_to_mongo it leaves the indexes alone.
+    '''
+    global client, sync_legal_db, sync_chatbot_db, sync_admin_db, sync_links_db
+    client = sync_mongo_client or MongoClient(
+        mongo_uri,
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=MONGO_SYNC_MAX_POOL_SIZE,
+    )
+    client.admin.command('ping')
+    sync_legal_db = client['legal_db']
+    sync_chatbot_db = client['chatbot_db']
+    sync_admin_db = client['admin_db']
+    sync_links_db = client['links_db']
+
+async def close_mongo_connection() -> None:
+    '''Close both the async client and the sync facade client.'''
+    global async_client, client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
+    if client is not None:
+        client.close()
+        client = None
+
+# --- Async database handles (API routes) ---
+
+def get_async_legal_db():
+    '''Get the async legal content database handle.'''
     if legal_db is None:
         raise ConnectionFailure("Legal database connection not established")
     return legal_db
 
-def get_chatbot_db():
-    '''Get the chatbot database connection.'''
+def get_async_chatbot_db():
+    '''Get the async chatbot database handle.'''
     if chatbot_db is None:
         raise ConnectionFailure("Chatbot database connection not established")
     return chatbot_db
 
-# <--- THE MISSING FUNCTION DEFINITION IS ADDED HERE
-def get_admin_db():
-    '''Get the admin database connection.'''
+def get_async_admin_db():
+    '''Get the async admin database handle.'''
     if admin_db is None:
         raise ConnectionFailure("Admin database connection not established")
     return admin_db
-# ---> END OF ADDED CODE
+
+# --- Sync facade (RAG pipeline, ETL scripts) ---
+
+def get_legal_db():
+    '''Get the legal content database connection.'''
+    if sync_legal_db is None:
+        raise ConnectionFailure("Legal database connection not established")
+    return sync_legal_db
+
+def get_chatbot_db():
+    '''Get the chatbot database connection.'''
+    if sync_chatbot_db is None:
+        raise ConnectionFailure("Chatbot database connection not established")
+    return sync_chatbot_db
+
+def get_admin_db():
+    '''Get the admin database connection.'''
+    if sync_admin_db is None:
+        raise ConnectionFailure("Admin database connection not established")
+    return sync_admin_db
 
 def get_links_db():
     '''Get the links database connection.'''
-    if links_db is None:
+    if sync_links_db is None:
         raise ConnectionFailure("Links database connection not established")
-    return links_db
+    return sync_links_db
 
 def get_all_faqs() -> List[Dict[str, Any]]:
     '''Get all FAQ documents from the legal database.'''
     db = get_legal_db()
     # Get all collections except system collections
-    collections = [c for c in db.list_collection_names() 
+    collections = [c for c in db.list_collection_names()
                    if not c.startswith('system.')]
-    
+
     results = []
     for cname in collections:
         docs = list(db[cname].find({}, {"_id": 0}))
@@ -135,90 +257,330 @@ def get_all_faqs() -> List[Dict[str, Any]]:
     logger.info(f"Fetched {len(results)} documents from {len(collections)} legal content collections")
     return results
 
+def triage_for_status(status: Optional[str]) -> str:
+    '''Initial triage state of a chat log: anything the bot did not answer goes to the admin queue.'''
+    return TRIAGE_ANSWERED if status == "answered" else TRIAGE_UNANSWERED
+
+async def backfill_log_triage() -> None:
+    '''
+    Sets the triage state on logs written before it existed. Runs once per database: a
+    marker in MIGRATIONS_COLLECTION makes later startups skip the collection scan.
+    '''
+    migrations = get_async_chatbot_db()[MIGRATIONS_COLLECTION]
+    if await migrations.find_one({"_id": "log_triage"}):
+        return
+    logs = get_async_chatbot_db()[LOGS_COLLECTION]
+    missing = {"triage": {"$exists": False}}
+    answered = await logs.update_many(
+        {**missing, "$or": [{"answer": {"$nin": [None, ""]}}, {"status": "answered"}]},
+        {"$set": {"triage": TRIAGE_ANSWERED}}
+    )
+    opened = await logs.update_many(missing, {"$set": {"triage": TRIAGE_UNANSWERED}})
+    if answered.modified_count or opened.modified_count:
+        logger.info(f"Backfilled triage state: {answered.modified_count} answered, {opened.modified_count} open.")
+    # Another worker may have finished first; the backfill is idempotent either way.
+    await migrations.update_one(
+        {"_id": "log_triage"}, {"$setOnInsert": {"applied_at": datetime.utcnow()}}, upsert=True
+    )
+
+# Background batched writer for chat logs, started/stopped in the FastAPI lifespan.
+log_sink = LogSink(lambda: get_async_chatbot_db()[LOGS_COLLECTION])
+
 async def insert_log_entry(entry: Dict[str, Any]) -> str:
-    '''Insert a log entry into the logs collection in chatbot_db.'''
-    result = get_chatbot_db()[LOGS_COLLECTION].insert_one(entry)
+    '''
+    Queue a log entry for the background log writer in chatbot_db.
+    The _id is assigned up front, so the ID is known before the entry is written.
+    Falls back to a direct insert when the writer is not running.
+    '''
+    entry.setdefault("_id", ObjectId())
+    if not entry.get("triage"):
+        entry["triage"] = triage_for_status(entry.get("status"))
+    if log_sink.running:
+        log_sink.submit(entry)
+        return str(entry["_id"])
+    with stage_timer("mongo_log_insert").time():
+        result = await get_async_chatbot_db()[LOGS_COLLECTION].insert_one(entry)
     logger.info(f"📝 Log entry inserted with ID: {result.inserted_id}")
     return str(result.inserted_id)
 
-def get_unanswered_logs() -> List[Dict[str, Any]]:
-    '''Get all unanswered log entries from chatbot_db.'''
-    logs = get_chatbot_db()[LOGS_COLLECTION].find({
-        "$or": [
-            {"answer": None},
-            {"answer": ""},
-            {"answer": {"$exists": False}}
-        ]
-    })
-    return [{**log, "_id": str(log["_id"])} for log in logs]
+async def get_unanswered_logs() -> List[Dict[str, Any]]:
+    '''Get the open (unanswered or marked) log entries, newest first, from the open_triage_logs index.'''
+    cursor = (
+        get_async_chatbot_db()[LOGS_COLLECTION]
+        .find({"triage": {"$in": OPEN_TRIAGE_STATES}})
+        .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+    )
+    return [{**log, "_id": str(log["_id"])} async for log in cursor]
 
 
-def get_all_logs_entries() -> List[Dict[str, Any]]:
+async def get_all_logs_entries() -> List[Dict[str, Any]]:
     '''Get all log entries.'''
-    logs = get_chatbot_db()[LOGS_COLLECTION].find({})
-    return [{**log, "_id": str(log["_id"])} for log in logs]
+    cursor = get_async_chatbot_db()[LOGS_COLLECTION].find({})
+    return [{**log, "_id": str(log["_id"])} async for log in cursor]
+
+# --- Keyset pagination over logs (newest first, on the (timestamp, _id) index) ---
+
+def encode_log_cursor(log: Dict[str, Any]) -> str:
+    '''Opaque cursor pointing just after the given log entry.'''
+    raw = f"{log['timestamp'].isoformat()}|{log['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_log_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    '''Inverse of encode_log_cursor. Raises ValueError for malformed cursors.'''
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, log_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(log_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def build_logs_query(
+    status: Optional[str] = None,
+    language: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    unanswered: bool = False,
+    triage: Optional[str] = None,
+) -> Dict[str, Any]:
+    '''Filter document for the admin log views.'''
+    clauses: List[Dict[str, Any]] = []
+    if status:
+        clauses.append({"status": status})
+    if language:
+        clauses.append({"language": language})
+    if start or end:
+        time_range = {}
+        if start:
+            time_range["$gte"] = start
+        if end:
+            time_range["$lt"] = end
+        clauses.append({"timestamp": time_range})
+    # Both filters apply when both are given: unanswered=True with a closed triage state matches nothing.
+    if triage:
+        clauses.append({"triage": triage})
+    if unanswered:
+        clauses.append({"triage": {"$in": OPEN_TRIAGE_STATES}})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def build_logs_projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+    '''Projection for the requested fields; _id and timestamp are always kept for the cursor.'''
+    if not fields:
+        return None
+    invalid = [f for f in fields if not _FIELD_NAME_RE.match(f)]
+    if invalid:
+        raise ValueError(f"Invalid field names: {invalid}")
+    return {**{f: 1 for f in fields}, "_id": 1, "timestamp": 1}
+
+def _serialize_log(log: Dict[str, Any]) -> Dict[str, Any]:
+    return {**log, "_id": str(log["_id"])}
+
+async def get_logs_page(
+    query: Dict[str, Any],
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    '''
+    One page of log entries, newest first. Returns (entries, next_cursor); next_cursor is None
+    on the last page. Cost is constant per page regardless of the collection size.
+    '''
+    limit = max(1, min(limit, LOGS_PAGE_MAX))
+    if cursor:
+        timestamp, log_id = decode_log_cursor(cursor)
+        after = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": log_id}}
+        ]}
+        query = {"$and": [query, after]} if query else after
+    logs = await (
+        get_async_chatbot_db()[LOGS_COLLECTION]
+        .find(query, build_logs_projection(fields))
+        .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = encode_log_cursor(logs[limit - 1]) if len(logs) > limit else None
+    return [_serialize_log(log) for log in logs[:limit]], next_cursor
+
+async def stream_logs(
+    query: Dict[str, Any],
+    fields: Optional[List[str]] = None,
+    batch_size: int = 500,
+) -> AsyncIterator[Dict[str, Any]]:
+    '''Streams matching log entries newest first without materializing them.'''
+    cursor = (
+        get_async_chatbot_db()[LOGS_COLLECTION]
+        .find(query, build_logs_projection(fields))
+        .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+        .batch_size(batch_size)
+    )
+    async for log in cursor:
+        yield _serialize_log(log)
 
 async def create_user(user_data: Dict[str, Any]) -> str:
     '''Create a new user in the database.'''
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    mongodb = get_chatbot_db()
-    users_collection = mongodb.users
+    users_collection = get_async_chatbot_db().users
 
-    if users_collection.find_one({"email": user_data["email"]}):
+    if await users_collection.find_one({"email": user_data["email"]}):
         raise ValueError("Email already registered")
 
     if "password" in user_data:
         plain_pw = user_data.pop("password")
-        user_data["hashed_password"] = pwd_context.hash(plain_pw)
+        # bcrypt is deliberately slow; keep it off the event loop.
+        user_data["hashed_password"] = await asyncio.to_thread(pwd_context.hash, plain_pw)
     elif "hashed_password" in user_data:
         user_data["hashed_password"] = str(user_data["hashed_password"])
     else:
         raise ValueError("Password is required to create a user")
 
-    result = users_collection.insert_one(user_data)
+    result = await users_collection.insert_one(user_data)
     return str(result.inserted_id)
 
 async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     '''Get user by email.'''
-    return get_chatbot_db().users.find_one({"email": email})
+    return await get_async_chatbot_db().users.find_one({"email": email})
 
 async def verify_user(email: str, password: str) -> bool:
     '''Verify user credentials.'''
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     user = await get_user_by_email(email)
     if not user:
         return False
-    return pwd_context.verify(password, user.get("hashed_password", ""))
+    return await asyncio.to_thread(pwd_context.verify, password, user.get("hashed_password", ""))
 
 async def get_admin_user(email: str) -> Optional[Dict[str, Any]]:
     '''Get admin user by email.'''
-    return get_admin_db()[ADMIN_USERS_COLLECTION].find_one({"email": email})
+    return await get_async_admin_db()[ADMIN_USERS_COLLECTION].find_one({"email": email})
 
 async def create_admin_user(admin_data: Dict[str, Any]) -> str:
     '''Create a new admin user.'''
-    result = get_admin_db()[ADMIN_USERS_COLLECTION].insert_one(admin_data)
+    result = await get_async_admin_db()[ADMIN_USERS_COLLECTION].insert_one(admin_data)
     return str(result.inserted_id)
 
 async def insert_admin_marking(log_id: str, marking: Dict[str, Any]) -> bool:
-    '''Insert admin marking for a log entry.'''
+    '''
+    Insert admin marking for an open log entry and move it to the marked triage state.
+    The marking is kept in its own sub-document so it doesn't overwrite the log's status.
+    '''
     try:
-        result = get_admin_db()[LOGS_COLLECTION].update_one(
-            {"_id": log_id},
-            {"$set": marking}
+        result = await get_async_chatbot_db()[LOGS_COLLECTION].update_one(
+            {"_id": ObjectId(log_id), "triage": {"$in": OPEN_TRIAGE_STATES}},
+            {"$set": {"triage": TRIAGE_MARKED, "marking": marking}}
         )
         return result.modified_count > 0
+    except InvalidId:
+        logger.warning(f"Invalid log id for marking: {log_id}")
+        return False
     except Exception as e:
         logger.error(f"Error inserting admin marking: {e}")
         return False
 
-async def insert_admin_answer(log_id: str, answer: str) -> bool:
-    '''Insert admin answer for a log entry.'''
+async def insert_admin_answer(log_id: str, answer: str, answered_by: Optional[str] = None) -> bool:
+    '''Insert admin answer for a log entry and close it (answered triage state).'''
     try:
-        result = get_admin_db()[LOGS_COLLECTION].update_one(
-            {"_id": log_id},
-            {"$set": {"answer": answer}}
+        update = {"answer": answer, "triage": TRIAGE_ANSWERED, "answered_at": datetime.utcnow()}
+        if answered_by:
+            update["answered_by"] = answered_by
+        result = await get_async_chatbot_db()[LOGS_COLLECTION].update_one(
+            {"_id": ObjectId(log_id)},
+            {"$set": update}
         )
         return result.modified_count > 0
+    except InvalidId:
+        logger.warning(f"Invalid log id for answer: {log_id}")
+        return False
     except Exception as e:
         logger.error(f"Error inserting admin answer: {e}")
-        return False
\ No newline at end of file
+        return False
+
+async def _bulk_update_logs(
+    updates: List[Tuple[str, Dict[str, Any]]],
+    open_only: bool,
+    applied: str,
+) -> List[Dict[str, str]]:
+    '''
+    Applies ($set) updates to many logs with one read of their current state and one unordered
+    bulk_write. Returns one result per input item, in input order: `applied`, "invalid_id",
+    "duplicate" (repeated id, only the first is applied), "not_found", "not_open" or "error".
+    '''
+    logs = get_async_chatbot_db()[LOGS_COLLECTION]
+    results: List[Dict[str, str]] = [{"query_id": log_id, "result": ""} for log_id, _ in updates]
+    targets: Dict[ObjectId, int] = {}
+    for i, (log_id, _) in enumerate(updates):
+        try:
+            oid = ObjectId(log_id)
+        except (InvalidId, TypeError):
+            results[i]["result"] = "invalid_id"
+            continue
+        if oid in targets:
+            results[i]["result"] = "duplicate"
+            continue
+        targets[oid] = i
+
+    if targets:
+        found = {
+            doc["_id"]: doc.get("triage")
+            async for doc in logs.find({"_id": {"$in": list(targets)}}, {"triage": 1})
+        }
+        operations, op_items = [], []
+        for oid, i in targets.items():
+            if oid not in found:
+                results[i]["result"] = "not_found"
+            elif open_only and found[oid] not in OPEN_TRIAGE_STATES:
+                results[i]["result"] = "not_open"
+            else:
+                query = {"_id": oid}
+                if open_only:
+                    # Re-checked at write time in case the item was closed meanwhile.
+                    query["triage"] = {"$in": OPEN_TRIAGE_STATES}
+                operations.append(UpdateOne(query, {"$set": updates[i][1]}))
+                op_items.append(i)
+                results[i]["result"] = applied
+        if operations:
+            try:
+                matched = (await logs.bulk_write(operations, ordered=False)).matched_count
+            except BulkWriteError as e:
+                matched = e.details.get("nMatched", 0)
+                for error in e.details.get("writeErrors", []):
+                    results[op_items[error["index"]]]["result"] = "error"
+                logger.error(f"Bulk log update failed for {len(e.details.get('writeErrors', []))} of {len(operations)} items.")
+            written = [i for i in op_items if results[i]["result"] == applied]
+            if matched < len(written):
+                # Some items were closed (or deleted) between the read and the write, so their
+                # filter matched nothing: look at where they stand now.
+                current = {
+                    doc["_id"]: doc.get("triage")
+                    async for doc in logs.find({"_id": {"$in": [ObjectId(updates[i][0]) for i in written]}}, {"triage": 1})
+                }
+                for i in written:
+                    oid = ObjectId(updates[i][0])
+                    if oid not in current:
+                        results[i]["result"] = "not_found"
+                    elif open_only and current[oid] not in OPEN_TRIAGE_STATES:
+                        results[i]["result"] = "not_open"
+    return results
+
+async def bulk_mark_logs(markings: List[Tuple[str, str]], marked_by: str) -> List[Dict[str, str]]:
+    '''Marks many open logs at once: (log_id, mark status) pairs, with marked_by/marked_at audit fields.'''
+    marked_at = datetime.utcnow()
+    return await _bulk_update_logs(
+        [
+            (log_id, {"triage": TRIAGE_MARKED, "marking": {"status": mark_status, "marked_by": marked_by, "marked_at": marked_at}})
+            for log_id, mark_status in markings
+        ],
+        open_only=True,
+        applied="marked",
+    )
+
+async def bulk_answer_logs(answers: List[Tuple[str, str]], answered_by: str) -> List[Dict[str, str]]:
+    '''Answers many logs at once: (log_id, answer) pairs, closing them with answered_by/answered_at.'''
+    answered_at = datetime.utcnow()
+    return await _bulk_update_logs(
+        [
+            (log_id, {"answer": answer, "triage": TRIAGE_ANSWERED, "answered_at": answered_at, "answered_by": answered_by})
+            for log_id, answer in answers
+        ],
+        open_only=False,
+        applied="answered",
+    )
@@ -1,37 +1,112 @@
-
 import os
 import json
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import ConnectionFailure, BulkWriteError
 from sentence_transformers import SentenceTransformer
 import logging
 from dotenv import load_dotenv
 
+# Run from the repository root: python -m backend.etl_scripts.ingest_chunk
+from ..nlp.embedding_cache import get_embedding_cache
+from ..db.corpus_version import bump_corpus_version
+from ..utils.atomic_files import write_json_atomic
+
 load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env')))
 
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("LEGAL_DB", "legal_db")  # Changed to use LEGAL_DB
 SBERT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 DATA_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+ENCODE_BATCH_SIZE = int(os.getenv("INGEST_ENCODE_BATCH_SIZE", "128"))
+WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "1000"))
+CHUNK_KEY_FIELD = "chunk_key"
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(DATA_DIRECTORY, ".ingest_manifest.json"))
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-try:
-    sbert_model = SentenceTransformer(SBERT_MODEL_NAME)
-    logger.info("Sentence-Transformer model loaded for multilingual embeddings.")
-except Exception as e:
-    logger.error(f"Failed to load Sentence-Transformer model: {e}")
-    sbert_model = None
+# Loaded lazily so that every pool worker loads its own copy instead of the parent paying for it at import time.
+sbert_model = None
+# Per-process MongoDB client used by pool workers (clients must not be shared across a fork).
+_worker_client = None
+
+def load_sbert_model():
+    """Loads the Sentence-Transformer model once per process and returns it (None if loading failed)."""
+    global sbert_model
+    if sbert_model is None:
+        try:
+            sbert_model = SentenceTransformer(SBERT_MODEL_NAME)
+            logger.info("Sentence-Transformer model loaded for multilingual embeddings.")
+        except Exception as e:
+            logger.error(f"Failed to load Sentence-Transformer model: {e}")
+            sbert_model = None
+    return sbert_model
+
+def compute_chunk_key(source, content_en: str, content_hi: str) -> str:
+    """
+    Hashed natural key of a chunk: (source, content_en, content_hi).
+    Replaces filtering on the full content text, which no index can support.
+    """
+    key = "\x1f".join([str(source or ""), content_en, content_hi])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def ensure_chunk_key_index(collection):
+    """
+    Backfills chunk_key on documents ingested before it existed and creates the unique index on it.
+    """
+    missing = collection.find(
+        {CHUNK_KEY_FIELD: {"$exists": False}},
+        {"source": 1, "content_en": 1, "content_hi": 1}
+    )
+    ops = []
+    for doc in missing:
+        key = compute_chunk_key(
+            doc.get("source"),
+            (doc.get("content_en") or "").strip(),
+            (doc.get("content_hi") or "").strip()
+        )
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {CHUNK_KEY_FIELD: key}}))
+        if len(ops) >= WRITE_BATCH_SIZE:
+            collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
+    collection.create_index(
+        [(CHUNK_KEY_FIELD, ASCENDING)],
+        unique=True,
+        partialFilterExpression={CHUNK_KEY_FIELD: {"$type": "string"}},
+        name="unique_chunk_key"
+    )
 
-def ingest_file_to_mongodb(file_path: str, client: MongoClient):
+def encode_texts(texts):
+    """
+    Encodes a list of texts in large batches and returns one list of floats per text.
+    Texts already in the shared embedding cache are not re-encoded.
+    """
+    if not texts:
+        return []
+    return get_embedding_cache().encode(
+        SBERT_MODEL_NAME,
+        texts,
+        lambda missing: sbert_model.encode(missing, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True)
+    )
+
+def ingest_file_to_mongodb(file_path: str, client: MongoClient) -> int:
     """
     Ingests a single JSON file into a MongoDB collection, generating embeddings.
     The collection name is derived from the filename.
+    All texts of the file are encoded in batches and written with unordered bulk upserts
+    keyed on the hashed natural key. Returns the number of chunks written, or None if the file failed.
     """
-    if not sbert_model:
+    if not load_sbert_model():
         logger.error("Embedding model not loaded. Cannot ingest file.")
-        return
+        return None
 
     collection_name = os.path.basename(file_path).replace('.json', '').replace('.', '_')
     logger.info(f"Processing file: '{os.path.basename(file_path)}' into collection '{collection_name}'")
@@ -42,12 +117,14 @@ def ingest_file_to_mongodb(file_path: str, client: MongoClient):
         
         if not isinstance(chunks, list) or not all(isinstance(c, dict) for c in chunks):
             logger.error(f"Skipping {file_path}: content is not a list of dictionaries.")
-            return
+            return None
 
         db = client[DB_NAME]
         collection = db[collection_name]
-        
-        processed_count = 0
+        ensure_chunk_key_index(collection)
+
+        start_time = time.perf_counter()
+        valid_chunks = []
         for i, chunk in enumerate(chunks):
             content_en = chunk.get("content_en", "").strip()
             content_hi = chunk.get("content_hi", "").strip()
@@ -56,68 +133,184 @@ def ingest_file_to_mongodb(file_path: str, client: MongoClient):
                 logger.warning(f"Skipping chunk {i} in {file_path}: both 'content_en' and 'content_hi' are empty.")
                 continue
 
+            chunk[CHUNK_KEY_FIELD] = compute_chunk_key(chunk.get("source"), content_en, content_hi)
+            valid_chunks.append((chunk, content_en, content_hi))
+
+        # Generate embeddings for non-empty content, one batched call per language
+        en_chunks = [(chunk, text) for chunk, text, _ in valid_chunks if text]
+        hi_chunks = [(chunk, text) for chunk, _, text in valid_chunks if text]
+        for (chunk, _), embedding in zip(en_chunks, encode_texts([text for _, text in en_chunks])):
+            chunk['embedding_en'] = embedding
+        for (chunk, _), embedding in zip(hi_chunks, encode_texts([text for _, text in hi_chunks])):
+            chunk['embedding_hi'] = embedding
+
+        processed_count = 0
+        for offset in range(0, len(valid_chunks), WRITE_BATCH_SIZE):
+            batch = valid_chunks[offset:offset + WRITE_BATCH_SIZE]
+            ops = [
+                UpdateOne({CHUNK_KEY_FIELD: chunk[CHUNK_KEY_FIELD]}, {"$set": chunk}, upsert=True)
+                for chunk, _, _ in batch
+            ]
             try:
-                # Generate embeddings for non-empty content
-                if content_en:
-                    chunk['embedding_en'] = sbert_model.encode(content_en).tolist()
-                if content_hi:
-                    chunk['embedding_hi'] = sbert_model.encode(content_hi).tolist()
-
-                # Use content and source to uniquely identify a chunk for upserting
-                filter_query = {
-                    "source": chunk.get("source"),
-                    "content_en": content_en,
-                    "content_hi": content_hi
-                }
-                
-                collection.update_one(
-                    filter_query,
-                    {"$set": chunk},
-                    upsert=True
-                )
-                processed_count += 1
-
-            except Exception as e:
-                logger.error(f"Error processing chunk {i} in {file_path}: {e}", exc_info=True)
-        
-        logger.info(f"Successfully ingested/updated {processed_count} documents from {file_path} into collection '{collection_name}'.")
+                result = collection.bulk_write(ops, ordered=False)
+                processed_count += result.upserted_count + result.matched_count
+            except BulkWriteError as e:
+                details = e.details
+                processed_count += details.get("nUpserted", 0) + details.get("nMatched", 0)
+                logger.error(f"{len(details.get('writeErrors', []))} chunks in {file_path} failed to write: {details.get('writeErrors', [])[:3]}")
+
+        elapsed = time.perf_counter() - start_time
+        rate = processed_count / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Successfully ingested/updated {processed_count} documents from {file_path} into collection '{collection_name}' "
+                    f"in {elapsed:.2f}s ({rate:.1f} chunks/sec).")
+        return processed_count
 
     except json.JSONDecodeError:
         logger.error(f"Invalid JSON format in file: {file_path}")
     except Exception as e:
         logger.error(f"An unexpected error occurred for file {file_path}: {e}", exc_info=True)
+    return None
+
+def file_sha256(file_path: str) -> str:
+    """Content hash of a data file, used to skip unchanged files on re-runs."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Loads the file hash -> ingested state manifest (empty if missing or unreadable)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable ingest manifest {path}: {e}")
+        return {}
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH) -> None:
+    """Writes the manifest atomically."""
+    write_json_atomic(path, manifest)
+
+def find_data_files(data_directory: str = DATA_DIRECTORY):
+    """Lists all JSON files under the data directory."""
+    files = []
+    for root, _, names in os.walk(data_directory):
+        for name in names:
+            if name.endswith('.json'):
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+def _init_worker(threads_per_worker: int):
+    """Pool initializer: one model and one MongoDB client per worker process."""
+    global _worker_client
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    load_sbert_model()
+    _worker_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
 
-def main():
+def _ingest_in_worker(file_path: str):
+    """Runs in a pool worker. Returns (file_path, chunks written or None on failure)."""
+    return file_path, ingest_file_to_mongodb(file_path, _worker_client)
+
+def main(workers: int = None, force: bool = False):
     """
     Main function to walk through the data directory and ingest all JSON files.
+    Files whose content hash matches the manifest are skipped (unless force is set);
+    the rest are spread across a process pool with one model per worker.
     """
-    if not sbert_model:
-        logger.error("Embedding model is not available. Aborting ingestion process.")
-        return
-        
     if not os.path.exists(DATA_DIRECTORY):
         logger.error(f"Data directory not found: {DATA_DIRECTORY}")
         return
 
-    logger.info(f"Starting ingestion process from directory: {DATA_DIRECTORY}")
-    
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, workers or cpu_count)
+    logger.info(f"Starting ingestion process from directory: {DATA_DIRECTORY} with {workers} worker(s)")
+
+    manifest = load_manifest()
+    pending = {}
+    skipped = 0
+    for file_path in find_data_files():
+        rel_path = os.path.relpath(file_path, DATA_DIRECTORY)
+        digest = file_sha256(file_path)
+        entry = manifest.get(rel_path)
+        if not force and entry and entry.get("sha256") == digest and entry.get("model") == SBERT_MODEL_NAME:
+            skipped += 1
+            continue
+        pending[file_path] = digest
+    logger.info(f"{len(pending)} file(s) to ingest, {skipped} unchanged file(s) skipped.")
+
+    start_time = time.perf_counter()
+    total_chunks = 0
+    ingested = 0
+    failed = 0
+
+    def record(file_path, count):
+        nonlocal total_chunks, ingested, failed
+        if count is None:
+            failed += 1
+            return
+        ingested += 1
+        total_chunks += count
+        manifest[os.path.relpath(file_path, DATA_DIRECTORY)] = {
+            "sha256": pending[file_path],
+            "model": SBERT_MODEL_NAME,
+            "chunks": count,
+            "ingested_at": datetime.utcnow().isoformat(),
+        }
+        save_manifest(manifest)
+
     try:
-        with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
-            client.admin.command('ping') # Verify connection
-            logger.info("Successfully connected to MongoDB.")
-            
-            for root, _, files in os.walk(DATA_DIRECTORY):
-                for file in files:
-                    if file.endswith('.json'):
-                        file_path = os.path.join(root, file)
-                        ingest_file_to_mongodb(file_path, client)
+        if pending and workers == 1:
+            if not load_sbert_model():
+                logger.error("Embedding model is not available. Aborting ingestion process.")
+                return
+            with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
+                client.admin.command('ping') # Verify connection
+                logger.info("Successfully connected to MongoDB.")
+                for file_path in pending:
+                    record(file_path, ingest_file_to_mongodb(file_path, client))
+        elif pending:
+            with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
+                client.admin.command('ping') # Verify connection before spawning workers
+                logger.info("Successfully connected to MongoDB.")
+            threads_per_worker = max(1, cpu_count // workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+                futures = [pool.submit(_ingest_in_worker, file_path) for file_path in pending]
+                for future in as_completed(futures):
+                    try:
+                        file_path, count = future.result()
+                    except Exception as e:
+                        logger.error(f"Ingestion worker failed: {e}", exc_info=True)
+                        failed += 1
+                        continue
+                    record(file_path, count)
+
+        if total_chunks:
+            with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
+                bump_corpus_version(client[DB_NAME], f"ingest_chunk: {total_chunks} chunks")
 
     except ConnectionFailure as e:
         logger.error(f"MongoDB connection failed: {e}")
     except Exception as e:
         logger.error(f"An error occurred during the ingestion process: {e}", exc_info=True)
-    
+
+    elapsed = time.perf_counter() - start_time
+    rate = total_chunks / elapsed if elapsed > 0 else 0.0
+    # Counted as files are written, so a run that stops part-way doesn't count the files it never reached.
+    not_run = len(pending) - ingested - failed
+    logger.info(f"Ingestion summary: {ingested} file(s) ingested, {skipped} skipped, {failed} failed, {not_run} not run; "
+                f"{total_chunks} chunks in {elapsed:.2f}s ({rate:.1f} chunks/sec) using {workers} worker(s).")
     logger.info("Ingestion process finished.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest JSON chunk files from the data directory into MongoDB.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: number of CPU cores).")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if they are unchanged since the last run.")
+    args = parser.parse_args()
+    main(workers=args.workers, force=args.force)
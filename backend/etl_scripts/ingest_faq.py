@@ -1,24 +1,123 @@
 import pandas as pd
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure, BulkWriteError
 from sentence_transformers import SentenceTransformer
 import os
+import sys
+import time
 import logging
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+# Run from the repository root: python -m backend.etl_scripts.ingest_faq
+from ..nlp.embedding_cache import get_embedding_cache
+from ..db.corpus_version import bump_corpus_version
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', 'backend', '.env'))
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "legal_db")
 FAQ_COLLECTION = os.getenv("FAQ_COLLECTION", "faqs")
 NLP_MODEL_NAME = os.getenv("NLP_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+ENCODE_BATCH_SIZE = int(os.getenv("FAQ_ENCODE_BATCH_SIZE", "128"))
+CSV_CHUNKSIZE = int(os.getenv("FAQ_CSV_CHUNKSIZE", "0")) or None  # rows per CSV chunk; unset reads the whole file
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_etl(faq_data_path: str):
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _text_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Stripped string column, or empty strings if the column is absent."""
+    if name not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[name].astype(str).str.strip()
+
+def _keywords_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Splits a comma-separated keyword column into lists of non-empty, stripped keywords."""
+    exploded = _text_column(df, name).str.split(',').explode().str.strip()
+    exploded = exploded[exploded != ""]
+    keywords = exploded.groupby(level=0).agg(list).reindex(df.index)
+    return keywords.apply(lambda v: v if isinstance(v, list) else [])
+
+def transform_faqs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column-wise transform of raw FAQ rows into FAQ documents, plus the text_en/text_hi
+    columns that are embedded. Rows with no text in either language are dropped.
+    """
+    faqs = pd.DataFrame({
+        "question_id": df['ID'].astype(str),
+        "category": _text_column(df, 'category'),
+        "question": _text_column(df, 'Question'),
+        "answer_en": _text_column(df, 'answer_en'),
+        "answer_hi": _text_column(df, 'answer_hi'),
+        "keywords_en": _keywords_column(df, 'keywords_en'),
+        "keywords_hi": _keywords_column(df, 'keywords_hi'),
+        "topic": _text_column(df, 'category'),
+    }, index=df.index)
+    faqs["text_en"] = (faqs["question"] + " " + faqs["answer_en"] + " " + faqs["keywords_en"].str.join(" ")).str.strip()
+    faqs["text_hi"] = (faqs["question"] + " " + faqs["answer_hi"] + " " + faqs["keywords_hi"].str.join(" ")).str.strip()
+
+    empty = (faqs["text_en"] == "") & (faqs["text_hi"] == "")
+    if empty.any():
+        logger.warning(f"Skipping {int(empty.sum())} FAQs due to missing text for embedding: {faqs.loc[empty, 'question_id'].tolist()[:10]}")
+    return faqs[~empty]
+
+def embed_column(model: SentenceTransformer, texts: pd.Series) -> pd.Series:
+    """
+    Encodes a whole text column in one batched call; empty texts get an empty embedding.
+    Texts already in the shared embedding cache are not re-encoded.
+    """
+    non_empty = texts[texts != ""]
+    vectors = {}
+    if len(non_empty):
+        encoded = get_embedding_cache().encode(
+            NLP_MODEL_NAME,
+            non_empty.tolist(),
+            lambda missing: model.encode(missing, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True)
+        )
+        vectors = dict(zip(non_empty.index, encoded))
+    return pd.Series([vectors.get(idx, []) for idx in texts.index], index=texts.index, dtype=object)
+
+def load_faqs(faqs_collection, faqs: pd.DataFrame) -> Tuple[int, int]:
+    """
+    Upserts the FAQ documents keyed on question_id with a single unordered bulk_write.
+    Returns (FAQs written, FAQs that failed to write); one bad document doesn't fail the rest.
+    """
+    docs = faqs.drop(columns=["text_en", "text_hi"]).to_dict("records")
+    if not docs:
+        return 0, 0
+    ops = [UpdateOne({"question_id": doc["question_id"]}, {"$set": doc}, upsert=True) for doc in docs]
+    try:
+        result = faqs_collection.bulk_write(ops, ordered=False)
+        return result.upserted_count + result.matched_count, 0
+    except BulkWriteError as e:
+        details = e.details
+        errors = details.get("writeErrors", [])
+        logger.error(f"{len(errors)} FAQs failed to write: {errors[:3]}")
+        return details.get("nUpserted", 0) + details.get("nMatched", 0), len(errors)
+
+def run_etl(faq_data_path: str, chunksize: Optional[int] = CSV_CHUNKSIZE):
+    """
+    Runs the FAQ ETL. With chunksize set, the CSV is read and loaded chunksize rows at a time,
+    so large FAQ dumps never need to fit in memory at once.
+    """
     logger.info("Starting ETL pipeline...")
     client = None
     model = None
+    start_time = time.perf_counter()
+    total_rows = 0
+    total_loaded = 0
+    total_failed = 0
     try:
         logger.info("Connecting to MongoDB for ETL...")
         client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
@@ -29,44 +128,24 @@ def run_etl(faq_data_path: str):
         logger.info(f"Loading NLP model: {NLP_MODEL_NAME}")
         model = SentenceTransformer(NLP_MODEL_NAME)
         logger.info("NLP model loaded.")
-        logger.info(f"Reading data from {faq_data_path}")
-        df = pd.read_csv(faq_data_path, keep_default_na=False)
-        logger.info(f"Loaded {len(df)} rows from CSV.")
-        processed_faqs = []
-        for _, row in df.iterrows():
-            faq_doc: Dict[str, Any] = {
-                "question_id": str(row['ID']),
-                "category": str(row['category']).strip(),
-                "question": str(row.get('Question', '')).strip(),
-                "answer_en": str(row['answer_en']).strip(),
-                "answer_hi": str(row['answer_hi']).strip(),
-                "keywords_en": [k.strip() for k in str(row['keywords_en']).split(',') if k.strip()],
-                "keywords_hi": [k.strip() for k in str(row['keywords_hi']).split(',') if k.strip()],
-                "embedding_en": [],
-                "embedding_hi": [],
-                "topic": str(row.get('category', '')).strip()
-            }
-            text_en = " ".join([faq_doc['question'], faq_doc['answer_en'], " ".join(faq_doc['keywords_en'])]).strip()
-            text_hi = " ".join([faq_doc['question'], faq_doc['answer_hi'], " ".join(faq_doc['keywords_hi'])]).strip()
-            if not text_en and not text_hi:
-                logger.warning(f"Skipping FAQ ID {faq_doc['question_id']} due to missing text for embedding.")
-                continue
-            if text_en:
-                faq_doc['embedding_en'] = model.encode(text_en, convert_to_tensor=False).tolist()
-            if text_hi:
-                faq_doc['embedding_hi'] = model.encode(text_hi, convert_to_tensor=False).tolist()
-            processed_faqs.append(faq_doc)
-        logger.info(f"Transformed {len(processed_faqs)} FAQs with embeddings.")
-
-        # --- 5. Load Data: Upsert (Insert or Update) ---
-        if processed_faqs:
-            for faq_doc in processed_faqs:
-                faqs_collection.update_one(
-                    {"question_id": faq_doc["question_id"]},
-                    {"$set": faq_doc},
-                    upsert=True  # Insert if not found
-                )
-            logger.info(f"Successfully upserted {len(processed_faqs)} FAQs into MongoDB (DB={DB_NAME}, collection={FAQ_COLLECTION}).")
+        logger.info(f"Reading data from {faq_data_path}" + (f" in chunks of {chunksize} rows" if chunksize else ""))
+        reader = pd.read_csv(faq_data_path, keep_default_na=False, chunksize=chunksize)
+        frames = reader if chunksize else [reader]
+        for df in frames:
+            total_rows += len(df)
+            faqs = transform_faqs(df)
+            faqs["embedding_en"] = embed_column(model, faqs["text_en"])
+            faqs["embedding_hi"] = embed_column(model, faqs["text_hi"])
+            logger.info(f"Transformed {len(faqs)} of {len(df)} FAQs with embeddings.")
+
+            # --- Load Data: Upsert (Insert or Update) ---
+            loaded, failed = load_faqs(faqs_collection, faqs)
+            total_loaded += loaded
+            total_failed += failed
+
+        if total_loaded:
+            logger.info(f"Successfully upserted {total_loaded} FAQs into MongoDB (DB={DB_NAME}, collection={FAQ_COLLECTION}).")
+            bump_corpus_version(db, f"ingest_faq: {total_loaded} FAQs")
         else:
             logger.warning("No FAQs to load after processing.")
 
@@ -80,6 +159,12 @@ def run_etl(faq_data_path: str):
         if client:
             client.close()
             logger.info("MongoDB connection closed for ETL.")
+        elapsed = time.perf_counter() - start_time
+        rate = total_loaded / elapsed if elapsed > 0 else 0.0
+        peak = peak_memory_mb()
+        peak_str = f"{peak:.1f} MB" if peak is not None else "n/a"
+        logger.info(f"ETL run: {total_rows} rows read, {total_loaded} FAQs loaded, {total_failed} failed in {elapsed:.2f}s "
+                    f"({rate:.1f} FAQs/sec), peak memory {peak_str}.")
 
 if __name__ == "__main__":
     faq_data_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'faqs_raw.csv')
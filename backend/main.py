@@ -5,7 +5,7 @@ import jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from passlib.context import CryptContext
 from jwt import exceptions as jwt_exceptions
@@ -16,8 +16,13 @@ from fastapi.security import OAuth2PasswordBearer
 from backend.routes import chat_routes, admin_routes, register_routes, otp_routes
 from backend.routes.login import router as login_router
 from backend.apk_router import router as apk_router
-from backend.db.mongo_utils import connect_to_mongo, client
+from backend.db.mongo_utils import connect_to_mongo, close_mongo_connection, log_sink
+from backend.db.log_rollups import log_rollups
 from backend.nlp.model_loader import load_nlp_model
+from backend.nlp.query_clustering import query_clusterer
+from backend.nlp.warm_answers import warm_answer_store
+from backend.services.tts_service import ensure_handle_index, start_tts_pool, shutdown_tts_pool
+from backend.services.metrics import render_metrics
 from backend.db.mongo_utils import get_admin_user # <-- NEW: Import get_admin_user from where it's defined
 
 # --- Load Environment Variables ---
@@ -77,8 +82,13 @@ async def lifespan(app: FastAPI):
         # connect_to_mongo now handles all database connections internally
         await connect_to_mongo(MONGO_URI)
         logger.info("MongoDB connected.")
+        await log_sink.start()
+        await log_rollups.start()
         load_nlp_model(NLP_MODEL_NAME)
         logger.info("NLP model loaded.")
+        start_tts_pool()
+        await ensure_handle_index()
+        await query_clusterer.start()
     except Exception as e:
         logger.error(f"Startup failed: {str(e)}", exc_info=True)
         # It's better to raise an exception for a hard failure
@@ -88,8 +98,13 @@ async def lifespan(app: FastAPI):
 
     # --- Shutdown Logic ---
     logger.info("Shutting down backend...")
-    if client: # use the global client variable directly
-        client.close()
+    await log_rollups.stop()
+    await query_clusterer.stop()
+    await warm_answer_store.flush_hits()
+    await log_sink.stop()
+    logger.info("Chat logs flushed.")
+    shutdown_tts_pool()
+    await close_mongo_connection()
     logger.info("MongoDB connection closed.")
 
 # --- FastAPI App ---
@@ -108,7 +123,8 @@ app.add_middleware(
     allow_origins=["*"],  # Allow all origins for development/debugging
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]  # log listings return the next page's cursor in this header
 )
 
 # --- Routers ---
@@ -122,4 +138,11 @@ app.include_router(apk_router, prefix="/app", tags=["APK Download"])
 # --- Root ---
 @app.get("/")
 async def read_root():
-    return {"message": "Shramik Saathi Chatbot Backend is running!"}
\ No newline at end of file
+    return {"message": "Shramik Saathi Chatbot Backend is running!"}
+
+# --- Metrics ---
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text format; component counters are only read here, at scrape time.
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # --- Request Models ---
 class ChatQuery(BaseModel):
@@ -25,6 +25,8 @@ class LogEntry(BaseModel):
     status: str = Field(..., description="Status of the interaction (e.g., 'answered', 'unanswered', 'error').")
     language: str = Field(..., description="Language of the interaction.")
     similarity_score: Optional[float] = Field(None, description="Similarity score of the match, if applicable.")
+    answer_source: Optional[str] = Field(None, description="Where the answer came from ('admin' tier or 'rag').")
+    triage: Optional[str] = Field(None, description="Admin triage state ('unanswered', 'marked', 'answered'); derived from status if not set.")
 
 # --- Admin Models ---
 class AdminUser(BaseModel):
@@ -34,4 +36,19 @@ class AdminUser(BaseModel):
 
 class AdminLogin(BaseModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+# --- Bulk Triage Models ---
+class BulkMarkItem(BaseModel):
+    query_id: str
+    status: Literal["Irrelevant", "Answerable", "Pending"]
+
+class BulkMarkRequest(BaseModel):
+    items: List[BulkMarkItem] = Field(..., min_length=1, max_length=1000)
+
+class BulkAnswerItem(BaseModel):
+    query_id: str
+    answer: str = Field(..., min_length=1)
+
+class BulkAnswerRequest(BaseModel):
+    items: List[BulkAnswerItem] = Field(..., min_length=1, max_length=1000)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from backend.db.mongo_utils import (
+    get_admin_db,
+    get_async_admin_db,
+    get_async_chatbot_db,
+    LOGS_COLLECTION,
+    ADMIN_ANSWERS_COLLECTION,
+)
+from backend.nlp.similarity import get_query_embeddings
+from backend.nlp.warm_answers import warm_answer_store
+from backend.services.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Matching knobs, overridable from the environment.
+ADMIN_ANSWER_THRESHOLD = float(os.getenv("ADMIN_ANSWER_THRESHOLD", "0.9"))  # min cosine similarity to reuse an answer
+ADMIN_ANSWER_REFRESH = float(os.getenv("ADMIN_ANSWER_REFRESH", "60"))  # seconds before picking up other workers' answers
+
+
+class AdminAnswerTier:
+    '''
+    First retrieval tier: questions answered by admins, matched by question embedding before
+    the corpus search and the LLM. An answer is only served in the language it was written
+    for. The question vectors are held in memory as one normalized matrix per language,
+    reloaded from admin_answers when answers are added or after ADMIN_ANSWER_REFRESH.
+    '''
+
+    def __init__(self, threshold: float = ADMIN_ANSWER_THRESHOLD, refresh_interval: float = ADMIN_ANSWER_REFRESH):
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # language -> (normalized question matrix, entries in matrix row order)
+        self._indexes: Dict[Optional[str], Tuple[np.ndarray, List[Dict[str, Any]]]] = {}
+        self._loaded_at = 0.0
+        self._loading = False
+        # Bumped by invalidate(), so a load that started before it doesn't count as fresh.
+        self._generation = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = 0.0
+            self._generation += 1
+
+    def _load(self) -> Dict[Optional[str], Tuple[np.ndarray, List[Dict[str, Any]]]]:
+        docs = list(get_admin_db()[ADMIN_ANSWERS_COLLECTION].find(
+            {"embedding": {"$exists": True}, "answer": {"$nin": [None, ""]}},
+            {"question": 1, "answer": 1, "language": 1, "embedding": 1}
+        ))
+        by_language: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for d in docs:
+            by_language.setdefault(d.get("language"), []).append(d)
+        indexes = {}
+        for language, group in by_language.items():
+            matrix = np.asarray([d["embedding"] for d in group], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            entries = [{"_id": d["_id"], "question": d.get("question"), "answer": d["answer"], "language": language} for d in group]
+            indexes[language] = (matrix / norms, entries)
+        logger.info(f"Admin answer tier loaded {len(docs)} answers.")
+        return indexes
+
+    def _refresh(self, generation: int) -> None:
+        '''Reloads the indexes without holding the lock, then swaps them in.'''
+        try:
+            indexes = self._load()
+        except Exception as e:
+            logger.error(f"Could not load admin answers: {e}")
+            indexes = None
+        with self._lock:
+            self._loading = False
+            if indexes is not None:
+                self._indexes = indexes
+                if generation == self._generation:
+                    self._loaded_at = time.monotonic()
+
+    @stage_timer("admin_tier").time()
+    def match(self, query_embedding: List[float], language: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        '''
+        Best admin answer in language for a query embedding if it clears the threshold, else None.
+        Sync (RAG thread).
+        '''
+        with self._lock:
+            # One thread reloads stale indexes; the others keep matching against the current ones.
+            refresh = not self._loading and time.monotonic() - self._loaded_at > self.refresh_interval
+            if refresh:
+                self._loading = True
+            generation = self._generation
+        if refresh:
+            self._refresh(generation)
+        with self._lock:
+            index = self._indexes.get(language)
+        if index is None:
+            self.misses += 1
+            return None
+        matrix, entries = index
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+        scores = matrix @ (query / query_norm)
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {**entries[best], "score": float(scores[best])}
+
+    async def add_answers(self, log_ids: List[str]) -> int:
+        '''
+        Indexes admin answers of the given logs (question text, embedding, answer) into admin_answers.
+        Keyed by log id, so re-answering a query replaces its entry. Returns the number indexed.
+        '''
+        ids = []
+        for log_id in log_ids:
+            try:
+                ids.append(ObjectId(log_id))
+            except (InvalidId, TypeError):
+                continue
+        if not ids:
+            return 0
+        logs = await get_async_chatbot_db()[LOGS_COLLECTION].find(
+            {"_id": {"$in": ids}, "answer": {"$nin": [None, ""]}},
+            {"query_text": 1, "answer": 1, "language": 1, "answered_by": 1, "answered_at": 1}
+        ).to_list(None)
+        logs = [log for log in logs if (log.get("query_text") or "").strip()]
+        if not logs:
+            return 0
+        embeddings = await asyncio.to_thread(get_query_embeddings, [log["query_text"] for log in logs])
+        await get_async_admin_db()[ADMIN_ANSWERS_COLLECTION].bulk_write([
+            UpdateOne({"_id": log["_id"]}, {"$set": {
+                "question": log["query_text"],
+                "answer": log["answer"],
+                "language": log.get("language"),
+                "answered_by": log.get("answered_by"),
+                "answered_at": log.get("answered_at"),
+                "embedding": list(map(float, embedding)),
+            }}, upsert=True)
+            for log, embedding in zip(logs, embeddings)
+        ], ordered=False)
+        self.invalidate()
+        # Precomputed answers for these questions would shadow the admin answer.
+        await warm_answer_store.invalidate_questions([log["query_text"] for log in logs])
+        logger.info(f"Indexed {len(logs)} admin answers.")
+        return len(logs)
+
+
+admin_answer_tier = AdminAnswerTier()
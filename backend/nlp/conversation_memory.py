@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set, Tuple
+from backend.nlp.rag import summarize_conversation
+from backend.nlp.tokens import count_tokens, truncate_to_tokens
+from backend.services.admission import shared_llm_slots
+from backend.services.metrics import LLM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Conversation memory limits.
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "1800"))  # seconds a silent session is kept
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))  # sessions kept in memory (LRU)
+CONVERSATION_KEEP_TURNS = int(os.getenv("CONVERSATION_KEEP_TURNS", "3"))  # recent turns kept verbatim
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "600"))  # max tokens of history in a prompt
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))  # max tokens of the rolling summary
+CONVERSATION_TURN_TOKENS = int(os.getenv("CONVERSATION_TURN_TOKENS", "150"))  # max tokens stored per bot reply
+
+
+class _Session:
+    __slots__ = ("summary", "turns", "pending", "history_tokens", "updated", "lock", "folding")
+
+    def __init__(self):
+        self.summary = ""
+        self.turns: deque = deque()  # (user, bot), oldest first
+        self.pending: List[Tuple[str, str]] = []  # older turns, verbatim until folded into the summary
+        self.history_tokens = 0  # tokens of the pending and recent turns
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.folding = False  # one summarization at a time per session
+
+
+class ConversationMemory:
+    '''
+    Server-side conversation history, keyed by user and session. Turns are kept verbatim
+    until the history outgrows token_budget tokens; then every turn but the last keep_turns is
+    folded into a rolling summary in one background LLM call (within the shared LLM slots),
+    so a follow-up question gets context while the history in the prompt stays bounded and
+    summaries cost one LLM call per several turns. Sessions expire after ttl seconds of
+    silence and at most max_sessions are kept (least recently used are evicted).
+    '''
+
+    def __init__(
+        self,
+        ttl: float = CONVERSATION_TTL,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        keep_turns: int = CONVERSATION_KEEP_TURNS,
+        token_budget: int = CONVERSATION_TOKEN_BUDGET,
+        summary_tokens: int = CONVERSATION_SUMMARY_TOKENS,
+        turn_tokens: int = CONVERSATION_TURN_TOKENS,
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.turn_tokens = turn_tokens
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._folds: Set[asyncio.Task] = set()
+        self.metrics: Dict[str, int] = {"expired": 0, "evicted": 0, "summaries": 0, "summary_failures": 0}
+
+    @staticmethod
+    def session_key(user_id: str, session_id: Optional[str] = None) -> str:
+        return f"{user_id}:{session_id or 'default'}"
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.metrics, "sessions": len(self._sessions)}
+
+    def _expire(self) -> None:
+        # Sessions are ordered by last use, so expired ones are at the front.
+        now = time.monotonic()
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.updated <= self.ttl:
+                break
+            del self._sessions[key]
+            self.metrics["expired"] += 1
+
+    def _get(self, key: str, create: bool = False) -> Optional[_Session]:
+        self._expire()
+        session = self._sessions.get(key)
+        if session is None and create:
+            session = self._sessions[key] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.metrics["evicted"] += 1
+        if session is not None:
+            self._sessions.move_to_end(key)
+        return session
+
+    @staticmethod
+    def _format_turn(user: str, bot: str) -> str:
+        return f"User: {user}\nBot: {bot}"
+
+    def _clean_reply(self, text: str) -> str:
+        # Reference links and long explanations add little to later turns.
+        text = re.sub(r'Reference Links:.*', '', text or '', flags=re.DOTALL).strip()
+        return truncate_to_tokens(text, self.turn_tokens)
+
+    def seed(self, key: str, chat_history: List[Dict[str, str]]) -> None:
+        '''
+        Starts a session from client-sent history (older clients send it with every request).
+        Ignored once the server holds the session.
+        '''
+        if not chat_history or self._get(key) is not None:
+            return
+        session = self._get(key, create=True)
+        user_text = None
+        for msg in chat_history:
+            if msg.get("sender") == "user":
+                user_text = msg.get("text", "")
+            elif user_text is not None:
+                turn = (user_text, self._clean_reply(msg.get("text", "")))
+                session.turns.append(turn)
+                session.history_tokens += count_tokens(self._format_turn(*turn))
+                user_text = None
+        while len(session.turns) > self.keep_turns:
+            session.pending.append(session.turns.popleft())
+
+    def get_context(self, key: str) -> str:
+        '''History for the prompt: the rolling summary plus the most recent turns that fit the token budget.'''
+        session = self._get(key)
+        if session is None:
+            return ""
+        with session.lock:
+            summary = truncate_to_tokens(session.summary, min(self.summary_tokens, self.token_budget))
+            turns = list(session.pending) + list(session.turns)
+        budget = self.token_budget - count_tokens(summary)
+        lines: List[str] = []
+        for user, bot in reversed(turns):
+            turn = self._format_turn(user, bot)
+            cost = count_tokens(turn)
+            if cost > budget:
+                break
+            lines.insert(0, turn)
+            budget -= cost
+        if summary:
+            lines.insert(0, f"Summary of the earlier conversation: {summary}")
+        return "\n".join(lines)
+
+    def add_turn(self, key: str, user_text: str, bot_text: str) -> None:
+        '''Records a turn; once the history outgrows the token budget, older turns are summarized in the background.'''
+        session = self._get(key, create=True)
+        session.updated = time.monotonic()
+        with session.lock:
+            turn = (user_text, self._clean_reply(bot_text))
+            session.turns.append(turn)
+            session.history_tokens += count_tokens(self._format_turn(*turn))
+            while len(session.turns) > self.keep_turns:
+                session.pending.append(session.turns.popleft())
+            should_fold = (
+                bool(session.pending)
+                and not session.folding
+                and session.history_tokens + count_tokens(session.summary) > self.token_budget
+            )
+        if should_fold:
+            task = asyncio.get_running_loop().create_task(self._fold(session))
+            self._folds.add(task)
+            task.add_done_callback(self._folds.discard)
+
+    async def _fold(self, session: _Session) -> None:
+        '''Folds all pending turns into the summary with one LLM call.'''
+        with session.lock:
+            if session.folding or not session.pending:
+                return
+            session.folding = True
+            pending, summary = list(session.pending), session.summary
+        try:
+            try:
+                async with shared_llm_slots:
+                    new_summary = await asyncio.to_thread(summarize_conversation, summary, pending, self.summary_tokens)
+                self.metrics["summaries"] += 1
+            except Exception as e:
+                logger.warning(f"Could not summarize conversation, keeping a truncated transcript instead: {e}")
+                self.metrics["summary_failures"] += 1
+                LLM_ERRORS.labels("summary").inc()
+                transcript = " ".join(f"User: {user} Bot: {bot}" for user, bot in pending)
+                new_summary = f"{summary} {transcript}".strip()
+            folded_tokens = sum(count_tokens(self._format_turn(*turn)) for turn in pending)
+            with session.lock:
+                session.summary = truncate_to_tokens(new_summary, self.summary_tokens)
+                # Turns that arrived while summarizing stay pending for the next fold.
+                session.pending = session.pending[len(pending):]
+                session.history_tokens -= folded_tokens
+        finally:
+            session.folding = False
+
+
+conversation_memory = ConversationMemory()
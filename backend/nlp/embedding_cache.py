@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "embeddings.sqlite3"))
+)
+DEFAULT_MAX_BYTES = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024)
+# Evict down to this fraction of the cap so we don't evict on every insert once full.
+EVICT_TO_FRACTION = 0.9
+# SQLite limits the number of bound parameters per statement.
+_SQL_BATCH = 500
+# A hit only refreshes last_used (a disk write) when the stored value is older than this;
+# LRU eviction does not need finer resolution. Refreshes are buffered and written in batches.
+TOUCH_INTERVAL = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL", "3600"))  # seconds
+_TOUCH_FLUSH_SIZE = 256
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    '''Normalization applied before hashing: NFC unicode and collapsed whitespace.'''
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    '''Content address of an embedding: (model name, SHA-256 of the normalized text).'''
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    '''
+    Content-addressed, size-capped on-disk embedding cache shared by the ETL scripts,
+    the indexer and the RAG lazy-embedding path. Vectors are stored as packed float32.
+    Safe to use from several threads and several processes (SQLite WAL mode).
+    '''
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_touches: Dict[str, float] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        # Running total of the stored vector sizes, kept by triggers in the writing transaction
+        # (so every process sharing the file sees it) instead of summing the table on each put.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN"
+            " UPDATE cache_meta SET value = value + NEW.size WHERE name = 'total_bytes'; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_size_update AFTER UPDATE OF size ON embeddings BEGIN"
+            " UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes'; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN"
+            " UPDATE cache_meta SET value = value - OLD.size WHERE name = 'total_bytes'; END"
+        )
+        # Caches written before the total existed are summed once.
+        self._conn.execute(
+            "INSERT OR IGNORE INTO cache_meta (name, value)"
+            " SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM embeddings"
+        )
+        self._conn.commit()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        '''Batched lookup. Returns one vector (or None on a miss) per input text.'''
+        keys = [cache_key(model_name, text) for text in texts]
+        found: Dict[str, bytes] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique_keys), _SQL_BATCH):
+                batch = unique_keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector, last_used in rows:
+                    found[key] = vector
+                    if now - last_used > TOUCH_INTERVAL:
+                        self._pending_touches[key] = now
+            if len(self._pending_touches) >= _TOUCH_FLUSH_SIZE:
+                self._flush_touches_locked()
+
+        results = [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+        hits = sum(1 for r in results if r is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        '''Batched insert of vectors for texts, followed by eviction if the cap is exceeded.'''
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((cache_key(model_name, text), blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: replacing deletes without firing the size trigger.
+            self._conn.executemany(
+                "INSERT INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET vector = excluded.vector, size = excluded.size,"
+                " last_used = excluded.last_used",
+                rows
+            )
+            self._flush_touches_locked(commit=False)
+            self._conn.commit()
+            self._evict_locked()
+
+    def flush(self) -> None:
+        '''Writes buffered last_used refreshes.'''
+        with self._lock:
+            self._flush_touches_locked()
+
+    def _flush_touches_locked(self, commit: bool = True) -> None:
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+            [(used, key) for key, used in self._pending_touches.items()]
+        )
+        self._pending_touches.clear()
+        if commit:
+            self._conn.commit()
+
+    def encode(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        encode_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        '''
+        Returns embeddings for texts, consulting the cache first and calling
+        encode_fn(list_of_texts) once, in a batch, for the misses only.
+        '''
+        texts = list(texts)
+        results = self.get_many(model_name, texts)
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            # Encode each distinct missing text once, even if it repeats in the batch.
+            by_key = {}
+            for i in missing:
+                by_key.setdefault(cache_key(model_name, texts[i]), texts[i])
+            to_encode = list(by_key.values())
+            encoded = [list(map(float, v)) for v in encode_fn(to_encode)]
+            self.put_many(model_name, to_encode, encoded)
+            vectors = dict(zip(by_key.keys(), encoded))
+            for i in missing:
+                results[i] = vectors[cache_key(model_name, texts[i])]
+        return results
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes_locked()
+
+    def _total_bytes_locked(self) -> int:
+        return self._conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _evict_locked(self) -> None:
+        '''Least-recently-used eviction down to EVICT_TO_FRACTION of the size cap.'''
+        if self.max_bytes <= 0:
+            return
+        total = self._total_bytes_locked()
+        if total <= self.max_bytes:
+            return
+        self._flush_touches_locked()
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        cursor = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC")
+        evict = []
+        for key, size in cursor:
+            if total <= target:
+                break
+            evict.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evict)
+        self._conn.commit()
+        logger.info(f"Embedding cache evicted {len(evict)} vectors to stay under {self.max_bytes} bytes.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches_locked()
+            self._conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_pid: Optional[int] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    '''
+    Returns the process-wide cache at EMBEDDING_CACHE_PATH, opening it on first use.
+    A forked child (e.g. an ingestion pool worker) gets its own connection.
+    '''
+    global _default_cache, _default_cache_pid
+    with _default_cache_lock:
+        if _default_cache is None or _default_cache_pid != os.getpid():
+            _default_cache = EmbeddingCache()
+            _default_cache_pid = os.getpid()
+        return _default_cache
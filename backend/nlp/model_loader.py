@@ -6,12 +6,13 @@ logger = logging.getLogger(__name__)
 
 # Global variable to hold the loaded model
 _embedding_model: Optional[SentenceTransformer] = None
+_embedding_model_name: Optional[str] = None
 
 def load_nlp_model(model_name: str):
     """
     Loads the NLP model into memory and stores it in a global variable.
     """
-    global _embedding_model
+    global _embedding_model, _embedding_model_name
     if _embedding_model is not None:
         logger.info("NLP model is already loaded.")
         return
@@ -19,6 +20,7 @@ def load_nlp_model(model_name: str):
     try:
         logger.info(f"Loading NLP model: {model_name}")
         _embedding_model = SentenceTransformer(model_name)
+        _embedding_model_name = model_name
         logger.info("NLP model loaded successfully.")
     except Exception as e:
         logger.error(f"Failed to load NLP model: {e}", exc_info=True)
@@ -34,4 +36,13 @@ def get_embedding_model() -> SentenceTransformer:
     if _embedding_model is None:
         logger.error("Attempted to get embedding model before it was loaded.")
         raise RuntimeError("NLP model is not loaded. Please ensure startup has completed.")
-    return _embedding_model
\ No newline at end of file
+    return _embedding_model
+
+def get_embedding_model_name() -> str:
+    """
+    Returns the name of the pre-loaded NLP model (used to key cached embeddings).
+    Raises an error if the model has not been loaded.
+    """
+    if _embedding_model_name is None:
+        raise RuntimeError("NLP model is not loaded. Please ensure startup has completed.")
+    return _embedding_model_name
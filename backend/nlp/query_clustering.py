@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from backend.db.mongo_utils import get_async_chatbot_db, LOGS_COLLECTION, OPEN_TRIAGE_STATES
+from backend.db.leases import Lease
+from backend.nlp.similarity import get_query_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Clustering knobs, overridable from the environment.
+CLUSTER_THRESHOLD = float(os.getenv("QUERY_CLUSTER_THRESHOLD", "0.75"))  # min cosine similarity to join a cluster
+CLUSTER_BATCH_SIZE = int(os.getenv("QUERY_CLUSTER_BATCH_SIZE", "512"))  # new queries embedded per batch
+CLUSTER_INTERVAL = float(os.getenv("QUERY_CLUSTER_INTERVAL", "600"))  # seconds between incremental runs
+CLUSTER_LEASE_SECONDS = float(os.getenv("QUERY_CLUSTER_LEASE_SECONDS", "300"))  # renewed after every batch
+CLUSTERS_COLLECTION = "query_clusters"
+STATE_COLLECTION = "query_cluster_state"
+STATE_ID = "clusterer"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    '''Scales each row to unit length so dot products are cosine similarities.'''
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, threshold: float) -> np.ndarray:
+    '''
+    Index of the most similar centroid for each (unit) vector, or -1 where the best similarity
+    is below threshold. One matrix multiply for the whole batch.
+    '''
+    if len(centroids) == 0 or len(vectors) == 0:
+        return np.full(len(vectors), -1, dtype=int)
+    similarities = vectors @ centroids.T
+    best = similarities.argmax(axis=1)
+    best[similarities[np.arange(len(vectors)), best] < threshold] = -1
+    return best
+
+
+def leader_cluster(vectors: np.ndarray, threshold: float) -> List[np.ndarray]:
+    '''
+    Greedy leader clustering of (unit) vectors: the first unclustered vector opens a cluster
+    with every unclustered vector within threshold of it. Returns the member indexes per cluster.
+    '''
+    similarities = vectors @ vectors.T
+    unclustered = np.ones(len(vectors), dtype=bool)
+    clusters = []
+    for leader in range(len(vectors)):
+        if not unclustered[leader]:
+            continue
+        members = np.flatnonzero(unclustered & (similarities[leader] >= threshold))
+        unclustered[members] = False
+        clusters.append(members)
+    return clusters
+
+
+class QueryClusterer:
+    '''
+    Groups open admin-queue queries by meaning. Each run embeds only the open logs that have no
+    cluster_id yet, assigns them to the nearest existing centroid and leader-clusters the rest
+    into new clusters, updating centroids as running means.
+    A lease on a state document lets only one app worker cluster at a time, so two workers
+    can't open duplicate clusters for the same queries or both move a centroid.
+    '''
+
+    def __init__(self, threshold: float = CLUSTER_THRESHOLD, interval: float = CLUSTER_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self._lease = Lease(STATE_COLLECTION, STATE_ID, CLUSTER_LEASE_SECONDS)
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Query clustering started (interval={self.interval}s, threshold={self.threshold}).")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Query clustering failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> int:
+        '''
+        Clusters every open query that has no cluster yet, batch by batch. Returns how many were
+        assigned (0 when another worker holds the lease; it clusters them instead).
+        '''
+        async with self._lock:
+            if await self._lease.acquire() is None:
+                return 0
+            assigned = 0
+            try:
+                while True:
+                    count = await self._cluster_batch()
+                    assigned += count
+                    # Renewing also checks the lease wasn't taken over during a slow batch.
+                    if count < CLUSTER_BATCH_SIZE or await self._lease.acquire() is None:
+                        break
+            finally:
+                await self._lease.release()
+            if assigned:
+                logger.info(f"Clustered {assigned} new unanswered queries.")
+            return assigned
+
+    async def _load_centroids(self) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        clusters = await get_async_chatbot_db()[CLUSTERS_COLLECTION].find(
+            {}, {"centroid": 1, "count": 1}
+        ).to_list(None)
+        if not clusters:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return clusters, normalize_rows(np.asarray([c["centroid"] for c in clusters], dtype=np.float32))
+
+    async def _cluster_batch(self) -> int:
+        db = get_async_chatbot_db()
+        logs = await db[LOGS_COLLECTION].find(
+            {"triage": {"$in": OPEN_TRIAGE_STATES}, "cluster_id": {"$exists": False}},
+            {"query_text": 1}
+        ).limit(CLUSTER_BATCH_SIZE).to_list(CLUSTER_BATCH_SIZE)
+        if not logs:
+            return 0
+        texts = [log.get("query_text") or "" for log in logs]
+        vectors = normalize_rows(np.asarray(await asyncio.to_thread(get_query_embeddings, texts), dtype=np.float32))
+
+        clusters, centroids = await self._load_centroids()
+        assignment = assign_to_centroids(vectors, centroids, self.threshold)
+        now = datetime.utcnow()
+        log_updates, cluster_updates = [], []
+
+        for index in np.unique(assignment[assignment >= 0]):
+            members = np.flatnonzero(assignment == index)
+            cluster = clusters[index]
+            count = cluster.get("count", 0)
+            centroid = (centroids[index] * count + vectors[members].sum(axis=0)) / (count + len(members))
+            cluster_updates.append(UpdateOne(
+                {"_id": cluster["_id"]},
+                {"$set": {"centroid": centroid.tolist(), "updated_at": now}, "$inc": {"count": len(members)}}
+            ))
+            log_updates += [(logs[i]["_id"], cluster["_id"]) for i in members]
+
+        unassigned = np.flatnonzero(assignment < 0)
+        for group in leader_cluster(vectors[unassigned], self.threshold):
+            members = unassigned[group]
+            centroid = vectors[members].mean(axis=0)
+            # The member closest to the centroid represents the cluster.
+            representative = members[int((vectors[members] @ centroid).argmax())]
+            cluster_id = ObjectId()
+            cluster_updates.append(UpdateOne(
+                {"_id": cluster_id},
+                {"$set": {
+                    "centroid": centroid.tolist(),
+                    "count": len(members),
+                    "representative": texts[representative],
+                    "representative_id": logs[representative]["_id"],
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True
+            ))
+            log_updates += [(logs[i]["_id"], cluster_id) for i in members]
+
+        if cluster_updates:
+            await db[CLUSTERS_COLLECTION].bulk_write(cluster_updates, ordered=False)
+        await db[LOGS_COLLECTION].bulk_write([
+            UpdateOne({"_id": log_id, "cluster_id": {"$exists": False}}, {"$set": {"cluster_id": cluster_id}})
+            for log_id, cluster_id in log_updates
+        ], ordered=False)
+        return len(logs)
+
+    async def get_clusters(self, limit: int = 50, samples: int = 5, max_ids: int = 200) -> Dict[str, Any]:
+        '''
+        Clusters of the open admin queue, largest first, with the representative question,
+        open/total counts, a few sample questions and the open query ids (for bulk triage),
+        plus the number of open queries not clustered yet.
+        '''
+        db = get_async_chatbot_db()
+        groups = await (await db[LOGS_COLLECTION].aggregate([
+            {"$match": {"triage": {"$in": OPEN_TRIAGE_STATES}, "cluster_id": {"$exists": True}}},
+            {"$group": {
+                "_id": "$cluster_id",
+                "open_count": {"$sum": 1},
+                "latest": {"$topN": {
+                    "n": max_ids,
+                    "sortBy": {"timestamp": -1},
+                    "output": {"_id": "$_id", "query_text": "$query_text"},
+                }},
+            }},
+            {"$sort": {"open_count": -1}},
+            {"$limit": limit},
+        ])).to_list(None)
+        clusters = {
+            c["_id"]: c
+            async for c in db[CLUSTERS_COLLECTION].find(
+                {"_id": {"$in": [g["_id"] for g in groups]}},
+                {"representative": 1, "count": 1}
+            )
+        }
+        unclustered = await db[LOGS_COLLECTION].count_documents(
+            {"triage": {"$in": OPEN_TRIAGE_STATES}, "cluster_id": {"$exists": False}}
+        )
+
+        result = []
+        for group in groups:
+            cluster = clusters.get(group["_id"], {})
+            questions = list(dict.fromkeys(item.get("query_text") or "" for item in group["latest"]))
+            result.append({
+                "cluster_id": str(group["_id"]),
+                "representative": cluster.get("representative") or (questions[0] if questions else ""),
+                "open_count": group["open_count"],
+                "total_count": cluster.get("count", group["open_count"]),
+                "sample_questions": questions[:samples],
+                "query_ids": [str(item["_id"]) for item in group["latest"]],
+            })
+        return {"clusters": result, "unclustered": unclustered}
+
+
+query_clusterer = QueryClusterer()
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 import os
 import json
 import logging
@@ -10,6 +10,8 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+from pymongo import UpdateOne
+import numpy as np
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -18,6 +20,11 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+# --- Context packing ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # max tokens of retrieved context in a prompt
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))  # chunks this similar to a kept one are dropped
+CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "64"))  # smaller leftovers are not worth a truncated chunk
+
 # --- Global LLM and embedding model variables ---
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 groq_client = None
@@ -43,206 +50,492 @@ def load_llm_and_models():
 
 # --- Your existing backend functions (no changes here) ---
 # NOTE: These functions must be correctly implemented in your project.
-from backend.nlp.similarity import get_embedding, cosine_similarity
+from backend.nlp.similarity import get_embeddings, get_query_embeddings, cosine_similarity
 from backend.db.mongo_utils import get_legal_db 
+from backend.db.corpus_version import is_content_collection
+from backend.nlp.admin_answers import admin_answer_tier
+from backend.nlp.tokens import count_tokens, truncate_to_tokens
+from backend.services.metrics import stage_timer, LLM_ERRORS
 
 # --- New main function to orchestrate retrieval and generation ---
-def generate_answer_with_rag(query: str, top_k: int = 5) -> str:
+def generate_answer_with_rag(query: str, top_k: int = 5, history: str = "", language: Optional[str] = None) -> str:
     """
     Orchestrates the RAG process: retrieves documents and then generates an answer using Llama 3.
+    history is the (token-bounded) conversation so far, used to resolve follow-up questions;
+    language selects the admin answers that may be reused.
     """
     try:
-        # Step 1: Document Retrieval
-        relevant_chunks = retrieve_relevant_faqs(query, top_k=top_k)
-
-        if not relevant_chunks:
-            logger.error("No relevant answer found for query: %s", query)
-            return "Sorry, I couldn't find any relevant information to answer your question."
-
-        # Step 2: Context Formatting
-        context = format_context_for_generation(relevant_chunks)
-
-        prompt_template = """
-        You are a highly knowledgeable AI legal assistant specializing in Indian labour laws.
-        Your task is to provide accurate and concise answers based ONLY on the following context.
-        If the context does not contain enough information to answer the question, state that you cannot answer the question based on the provided information.
-        Do not make up any information.
-        Your task:
-        - Answer the user's question in a clear non repetative, step-by-step, and detailed manner.
-        - Use only the information in the CONTEXT below.
-        - Do not make up information. If the answer is not present, say so.
-        - At the end, provide a 'Reference Links' section listing each link only once, even if referenced multiple times.
-        - Each source entry in the list should be in the format `[Source]: <unique_link_from_context>`.
-        - Do not repeat the same link as a different source number.
-
-        Context:
-        {context}
-
-        Question: {question}
-
-        Answer:
-
-        """
-
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-
-        # Use LangChain to create a simple pipeline for RAG
-        rag_chain = (
-            {"context": lambda x: context, "question": lambda x: x["question"]}
-            | prompt
-            | groq_client
-            | StrOutputParser()
-        )
+        # Steps 0-1: admin-answered questions first, otherwise document retrieval.
+        prepared = prepare_answer(query, top_k=top_k, language=language)
+        if "answer" in prepared:
+            return prepared["answer"]
 
-        try:
-            answer = rag_chain.invoke({"question": query})
-        except Exception as llm_error:
-            logger.error(f"LLM API call failed: {llm_error}", exc_info=True)
-            if not GROQ_API_KEY:
-                return "LLM API key is missing. Please set GROQ_API_KEY in your environment."
-            return f"An error occurred while calling the LLM API: {llm_error}"
-
-        # --- Post-process: Only include links for sources actually cited in the answer ---
-        import re
-        # Build a mapping from Source number to link
-        from backend.utils.reference_links import get_collection_reference_link
-        context_chunks = []
-        seen_links = set()
-        for chunk in relevant_chunks:
-            ref_link = ''
-            if '_collection' in chunk:
-                ref_link = get_collection_reference_link(chunk['_collection'])
-            if not ref_link:
-                ref_link = 'Not Available'
-            if ref_link not in seen_links:
-                seen_links.add(ref_link)
-                context_chunks.append(ref_link)
-        # Find all [Source X] cited in the answer
-        cited = set(int(m) for m in re.findall(r'\[Source (\d+)\]', answer))
-        # Build the reference section with only cited links
-        ref_lines = []
-        for idx, link in enumerate(context_chunks, 1):
-            if idx in cited:
-                ref_lines.append(f"[Source {idx}]: {link}")
-        # Remove any existing Reference Links section from the answer
-        answer = re.sub(r'Reference Links:.*', '', answer, flags=re.DOTALL)
-        # Append the filtered Reference Links section
-        if ref_lines:
-            answer = answer.rstrip() + "\n\nReference Links:\n" + "\n".join(ref_lines)
-        return answer
+        # Step 2: Generation
+        return generate_answer_from_chunks(query, prepared["chunks"], history)
 
     except Exception as e:
         logger.error(f"Error in generate_answer_with_rag: {e}", exc_info=True)
         return f"An error occurred while trying to generate an answer. Details: {e}"
 
+NO_ANSWER_MESSAGE = "Sorry, I couldn't find any relevant information to answer your question."
+REFERENCE_LINKS_HEADER = "Reference Links:"
+
+def _build_rag_chain(context: str, history: str = ""):
+    prompt_template = """
+    You are a highly knowledgeable AI legal assistant specializing in Indian labour laws.
+    Your task is to provide accurate and concise answers based ONLY on the following context.
+    If the context does not contain enough information to answer the question, state that you cannot answer the question based on the provided information.
+    Do not make up any information.
+    Your task:
+    - Answer the user's question in a clear non repetative, step-by-step, and detailed manner.
+    - Use only the information in the CONTEXT below.
+    - Do not make up information. If the answer is not present, say so.
+    - At the end, provide a 'Reference Links' section listing each link only once, even if referenced multiple times.
+    - Each source entry in the list should be in the format `[Source]: <unique_link_from_context>`.
+    - Do not repeat the same link as a different source number.
+
+    {history_section}Context:
+    {context}
+
+    Question: {question}
+
+    Answer:
+
+    """
+
+    prompt = ChatPromptTemplate.from_template(prompt_template)
+
+    # Use LangChain to create a simple pipeline for RAG
+    return (
+        {
+            "context": lambda x: context,
+            "question": lambda x: x["question"],
+            "history_section": lambda x: (
+                f"Conversation so far (use it only to understand follow-up questions):\n{history}\n\n" if history else ""
+            ),
+        }
+        | prompt
+        | groq_client
+        | StrOutputParser()
+    )
+
+def _llm_error_message(llm_error: Exception) -> str:
+    LLM_ERRORS.labels("answer").inc()
+    logger.error(f"LLM API call failed: {llm_error}", exc_info=True)
+    if not GROQ_API_KEY:
+        return "LLM API key is missing. Please set GROQ_API_KEY in your environment."
+    return f"An error occurred while calling the LLM API: {llm_error}"
+
+@stage_timer("llm_summary").time()
+def summarize_conversation(summary: str, turns: List[Tuple[str, str]], max_tokens: int) -> str:
+    """
+    Folds conversation turns (user, bot) into the rolling summary with the LLM, in at most
+    about max_tokens tokens. Raises if the LLM is not available.
+    """
+    prompt = ChatPromptTemplate.from_template("""
+    Update the summary of a conversation between a worker and a labour-law assistant.
+    Keep the facts that later questions may refer to: the worker's situation, the laws,
+    schemes and amounts discussed, and any open question. Write at most {max_words} words,
+    in the language of the conversation. Reply with the summary only.
+
+    Current summary:
+    {summary}
+
+    New turns:
+    {turns}
+    """)
+    chain = prompt | groq_client | StrOutputParser()
+    return chain.invoke({
+        "summary": summary or "(none)",
+        "turns": "\n".join(f"User: {user}\nBot: {bot}" for user, bot in turns),
+        "max_words": max(20, int(max_tokens * 0.6)),
+    }).strip()
+
+@stage_timer("reference_links").time()
+def cited_reference_links(answer: str, relevant_chunks: List[Dict[str, Any]]) -> List[str]:
+    """The "[Source N]: <link>" lines for the sources the answer actually cites."""
+    # Build a mapping from Source number to link
+    context_chunks = []
+    seen_links = set()
+    for chunk in relevant_chunks:
+        ref_link = _reference_link(chunk)
+        if ref_link not in seen_links:
+            seen_links.add(ref_link)
+            context_chunks.append(ref_link)
+    # Find all [Source X] cited in the answer
+    cited = set(int(m) for m in re.findall(r'\[Source (\d+)\]', answer))
+    # Build the reference section with only cited links
+    ref_lines = []
+    for idx, link in enumerate(context_chunks, 1):
+        if idx in cited:
+            ref_lines.append(f"[Source {idx}]: {link}")
+    return ref_lines
+
+def _with_reference_links(answer: str, ref_lines: List[str]) -> str:
+    # Remove any existing Reference Links section from the answer
+    answer = re.sub(r'Reference Links:.*', '', answer, flags=re.DOTALL)
+    # Append the filtered Reference Links section
+    if ref_lines:
+        answer = answer.rstrip() + "\n\n" + REFERENCE_LINKS_HEADER + "\n" + "\n".join(ref_lines)
+    return answer
+
+def generate_answer_from_chunks(query: str, relevant_chunks: List[Dict[str, Any]], history: str = "") -> str:
+    """
+    Generates the answer for a query from already retrieved chunks with Llama 3,
+    keeping only the reference links the answer actually cites.
+    """
+    if not relevant_chunks:
+        logger.error("No relevant answer found for query: %s", query)
+        return NO_ANSWER_MESSAGE
+
+    # Context Formatting: only the chunks that fit the token budget are cited.
+    context, relevant_chunks = pack_context(relevant_chunks)
+    _log_prompt_stats(query, context, history)
+    rag_chain = _build_rag_chain(context, history)
+
+    try:
+        with stage_timer("llm").time():
+            answer = rag_chain.invoke({"question": query})
+    except Exception as llm_error:
+        return _llm_error_message(llm_error)
+
+    # --- Post-process: Only include links for sources actually cited in the answer ---
+    return _with_reference_links(answer, cited_reference_links(answer, relevant_chunks))
+
+def stream_answer_from_chunks(
+    query: str,
+    relevant_chunks: List[Dict[str, Any]],
+    on_token: Callable[[str], None],
+    history: str = "",
+) -> Tuple[str, List[str]]:
+    """
+    Streaming variant of generate_answer_from_chunks: on_token is called with each piece of
+    answer text as the LLM produces it. The model's own Reference Links section is not
+    streamed; the cited links are returned instead, with the final (post-processed) answer.
+    """
+    if not relevant_chunks:
+        logger.error("No relevant answer found for query: %s", query)
+        return NO_ANSWER_MESSAGE, []
+
+    context, relevant_chunks = pack_context(relevant_chunks)
+    _log_prompt_stats(query, context, history)
+    rag_chain = _build_rag_chain(context, history)
+    raw = ""
+    emitted = 0
+    in_references = False
+    try:
+        with stage_timer("llm").time():
+            for piece in rag_chain.stream({"question": query}):
+                raw += piece
+                if in_references:
+                    continue
+                cut = raw.find(REFERENCE_LINKS_HEADER)
+                if cut >= 0:
+                    visible_end = cut
+                    in_references = True
+                else:
+                    # Hold back a possible partial header at the end of the text so far.
+                    visible_end = len(raw) - (len(REFERENCE_LINKS_HEADER) - 1)
+                if visible_end > emitted:
+                    on_token(raw[emitted:visible_end])
+                    emitted = visible_end
+    except Exception as llm_error:
+        return _llm_error_message(llm_error), []
+    if not in_references and emitted < len(raw):
+        on_token(raw[emitted:])
+
+    ref_lines = cited_reference_links(raw, relevant_chunks)
+    return _with_reference_links(raw, ref_lines), ref_lines
+
+@stage_timer("mongo_chunk_fetch").time()
+def _load_content_chunks(db) -> List[Dict[str, Any]]:
+    """Fetches every chunk of every content collection, tagged with its collection name."""
+    all_db_collections = db.list_collection_names()
+    content_collections = [name for name in all_db_collections if is_content_collection(name)]
+    if not content_collections:
+        logger.warning("No content collections found in the database to search.")
+        return []
+    all_chunks = []
+    for collection_name in content_collections:
+        collection = db[collection_name]
+        chunks = list(collection.find({}, {"_id": 1, "content_en": 1, "content_hi": 1, "embedding_en": 1, "embedding_hi": 1, "source": 1}))
+        for chunk in chunks:
+            chunk["_collection"] = collection_name
+        all_chunks.extend(chunks)
+    if not all_chunks:
+        logger.warning("No documents (chunks) found in any of the content collections.")
+    return all_chunks
+
+def _query_fields(query: str) -> Tuple[str, str]:
+    """(embedding field, content field) to search for a query, by its script."""
+    is_hindi = re.search(r"[\u0900-\u097F]", query)
+    return ("embedding_hi", "content_hi") if is_hindi else ("embedding_en", "content_en")
+
+def _embed_missing_chunks(db, chunks: List[Dict[str, Any]], emb_field: str, content_field: str) -> None:
+    """Embeds chunks that have no stored embedding yet, in one batch through the embedding cache."""
+    missing = []
+    for chunk in chunks:
+        if not chunk.get(emb_field):
+            content = chunk.get(content_field) or chunk.get("content_en") or ""
+            if content:
+                missing.append((chunk, content))
+    if not missing:
+        return
+    try:
+        vectors = get_embeddings([content for _, content in missing])
+        updates = {}
+        for (chunk, _), vector in zip(missing, vectors):
+            chunk[emb_field] = vector
+            updates.setdefault(chunk["_collection"], []).append(
+                UpdateOne({"_id": chunk["_id"]}, {"$set": {emb_field: vector}})
+            )
+        for collection_name, ops in updates.items():
+            db[collection_name].bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.error(f"Could not generate on-the-fly embeddings for {len(missing)} chunks: {e}")
+
+def _to_result(sim: float, chunk: Dict[str, Any], emb_field: str) -> Dict[str, Any]:
+    return {
+        "score": sim,
+        "source": chunk.get("source"),
+        "content_en": chunk.get("content_en"),
+        "content_hi": chunk.get("content_hi"),
+        "_collection": chunk.get("_collection"),
+        "_embedding": chunk.get(emb_field)  # used by the context packer to spot near-duplicates
+    }
+
 # --- Your original retrieval function (modified and simplified) ---
 # NOTE: The complex keyword filtering and score combining logic has been removed.
 # A pure semantic search is more robust and aligns better with LLM generation.
-def retrieve_relevant_faqs(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-    logger = logging.getLogger(__name__)
+def retrieve_relevant_faqs(query: str, top_k: int = 3, query_emb: Optional[List[float]] = None) -> List[Dict[str, Any]]:
     try:
         db = get_legal_db() 
-        # 1. Get all content collection names.
-        all_db_collections = db.list_collection_names()
-        exclude_collections = {
-            'logs', 'users', 'admin_marking', 'admin_answers', 'keywords',
-            'fs.files', 'fs.chunks', 'admin_users', 'system.views',
-            'system.version', 'system.profile'
-        }
-        content_collections = [
-            name for name in all_db_collections 
-            if not name.startswith('system.') and not name.startswith('_') and name not in exclude_collections
-        ]
-        if not content_collections:
-            logger.warning("No content collections found in the database to search.")
-            return []
-        # 2. Fetch all chunks.
-        all_chunks = []
-        for collection_name in content_collections:
-            collection = db[collection_name]
-            chunks = list(collection.find({}, {"_id": 1, "content_en": 1, "content_hi": 1, "embedding_en": 1, "embedding_hi": 1, "source": 1}))
-            for chunk in chunks:
-                chunk["_collection"] = collection_name
-            all_chunks.extend(chunks)
+        # 1-2. Fetch all chunks of all content collections.
+        all_chunks = _load_content_chunks(db)
         if not all_chunks:
-            logger.warning("No documents (chunks) found in any of the content collections.")
             return []
         # 3. Determine query language and get embedding.
-        is_hindi = re.search(r"[\u0900-\u097F]", query)
-        emb_field = "embedding_hi" if is_hindi else "embedding_en"
-        content_field = "content_hi" if is_hindi else "content_en"
-        query_emb = get_embedding(query)
-        # 4. Score each chunk based on cosine similarity.
-        scored_chunks = []
-        for chunk in all_chunks:
-            chunk_emb = chunk.get(emb_field)
-            if not chunk_emb:
-                content = chunk.get(content_field) or chunk.get("content_en") or ""
-                if content:
-                    try:
-                        chunk_emb = get_embedding(content)
-                        db[chunk["_collection"]].update_one(
-                            {"_id": chunk["_id"]},
-                            {"$set": {emb_field: chunk_emb.tolist()}}
-                        )
-                    except Exception as e:
-                        logger.error(f"Could not generate on-the-fly embedding for chunk {chunk.get('_id')}: {e}")
-                        continue
-                else:
+        emb_field, content_field = _query_fields(query)
+        if query_emb is None:
+            query_emb = get_query_embeddings([query])[0]
+        # 4. Embed chunks that have no stored embedding yet.
+        _embed_missing_chunks(db, all_chunks, emb_field, content_field)
+        # 5. Score each chunk based on cosine similarity.
+        with stage_timer("scoring").time():
+            scored_chunks = []
+            for chunk in all_chunks:
+                chunk_emb = chunk.get(emb_field)
+                if not chunk_emb:
                     continue
-            try:
-                sim = cosine_similarity(query_emb, chunk_emb)
-                scored_chunks.append((sim, chunk))
-            except Exception as e:
-                logger.warning(f"Could not calculate similarity for chunk {chunk.get('_id')}: {e}")
+                try:
+                    sim = cosine_similarity(query_emb, chunk_emb)
+                    scored_chunks.append((sim, chunk))
+                except Exception as e:
+                    logger.warning(f"Could not calculate similarity for chunk {chunk.get('_id')}: {e}")
         if not scored_chunks:
             logger.info("No chunks were scored successfully.")
             return []
-        # 5. Sort by semantic similarity and return top results.
+        # 6. Sort by semantic similarity and return top results.
         scored_chunks.sort(reverse=True, key=lambda x: x[0])
-        top_results = []
-        for sim, chunk in scored_chunks[:top_k]:
-            result = {
-                "score": sim,
-                "source": chunk.get("source"),
-                "content_en": chunk.get("content_en"),
-                "content_hi": chunk.get("content_hi"),
-                "_collection": chunk.get("_collection")
-            }
-            top_results.append(result)
+        top_results = [_to_result(sim, chunk, emb_field) for sim, chunk in scored_chunks[:top_k]]
         logger.info(f"Top {len(top_results)} matches retrieved.")
         return top_results
     except Exception as e:
         logger.error(f"Error in retrieve_relevant_faqs: {e}", exc_info=True)
         return []
 
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def retrieve_relevant_faqs_batch(
+    queries: List[str],
+    top_k: int = 5,
+    query_embs: Optional[List[List[float]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Retrieval for many queries at once: the corpus is loaded once and, per language field,
+    all queries are scored against all chunks with a single matrix multiply.
+    Returns the top_k results for each query, in input order.
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if not queries:
+        return results
+    db = get_legal_db()
+    all_chunks = _load_content_chunks(db)
+    if not all_chunks:
+        return results
+    if query_embs is None:
+        query_embs = get_query_embeddings(queries)
+
+    by_field: Dict[Tuple[str, str], List[int]] = {}
+    for i, query in enumerate(queries):
+        by_field.setdefault(_query_fields(query), []).append(i)
+    for (emb_field, content_field), indexes in by_field.items():
+        _embed_missing_chunks(db, all_chunks, emb_field, content_field)
+        dim = len(query_embs[indexes[0]])
+        candidates = [c for c in all_chunks if c.get(emb_field) and len(c[emb_field]) == dim]
+        if not candidates:
+            continue
+        with stage_timer("scoring").time():
+            chunk_matrix = _normalize_rows(np.asarray([c[emb_field] for c in candidates], dtype=np.float32))
+            query_matrix = _normalize_rows(np.asarray([query_embs[i] for i in indexes], dtype=np.float32))
+            scores = query_matrix @ chunk_matrix.T
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, i in enumerate(indexes):
+            order = top[row][np.argsort(-scores[row, top[row]])]
+            results[i] = [_to_result(float(scores[row, j]), candidates[j], emb_field) for j in order]
+    logger.info(f"Batch retrieval for {len(queries)} queries over {len(all_chunks)} chunks.")
+    return results
+
+def _admin_answer(admin_match: Dict[str, Any]) -> Dict[str, Any]:
+    return {"answer": admin_match["answer"], "source": "admin"}
+
+def match_admin_answers(queries: List[str], language: Optional[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    The admin-tier answer ({"answer", "source": "admin"}) for each query in language, or None.
+    Routes call this before the warm answer store, so an admin answer always takes precedence.
+    """
+    matches = [admin_answer_tier.match(query_emb, language) for query_emb in get_query_embeddings(queries)]
+    return [_admin_answer(match) if match else None for match in matches]
+
+def prepare_answer(query: str, top_k: int = 5, language: Optional[str] = None, check_admin: bool = True) -> Dict[str, Any]:
+    """
+    The LLM-free part of answering a query: the admin-answer tier (answers in language, unless
+    check_admin is False because the caller already checked it), then retrieval. Returns either
+    {"answer": final text, "source": "admin"} or {"chunks": retrieved chunks for
+    generate/stream_answer_from_chunks}.
+    """
+    # Admin-answered questions come first; a close match skips retrieval and the LLM.
+    query_emb = get_query_embeddings([query])[0]
+    admin_match = admin_answer_tier.match(query_emb, language) if check_admin else None
+    if admin_match:
+        logger.info(f"Answered from the admin tier (score={admin_match['score']:.3f}).")
+        return _admin_answer(admin_match)
+    return {"chunks": retrieve_relevant_faqs(query, top_k=top_k, query_emb=query_emb)}
+
+def prepare_batch_answers(
+    queries: List[str], top_k: int = 5, language: Optional[str] = None, check_admin: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    The LLM-free part of answering many queries: one batched embedding call, the admin-answer
+    tier (see prepare_answer), then batched retrieval for the rest. Each item is shaped like
+    prepare_answer's result.
+    """
+    query_embs = get_query_embeddings(queries)
+    prepared: List[Dict[str, Any]] = []
+    pending = []
+    for i, (query, query_emb) in enumerate(zip(queries, query_embs)):
+        admin_match = admin_answer_tier.match(query_emb, language) if check_admin else None
+        if admin_match:
+            prepared.append(_admin_answer(admin_match))
+        else:
+            prepared.append({"chunks": []})
+            pending.append(i)
+    if pending:
+        retrieved = retrieve_relevant_faqs_batch(
+            [queries[i] for i in pending], top_k, [query_embs[i] for i in pending]
+        )
+        for i, chunks in zip(pending, retrieved):
+            prepared[i]["chunks"] = chunks
+    return prepared
+
+def _reference_link(chunk: Dict[str, Any]) -> str:
+    from backend.utils.reference_links import get_collection_reference_link
+    ref_link = ''
+    if '_collection' in chunk:
+        ref_link = get_collection_reference_link(chunk['_collection'])
+    return ref_link or 'Not Available'
+
+def _format_source(i: int, chunk: Dict[str, Any], text: str) -> str:
+    topic = chunk.get('topic', '')
+    if not topic and '_collection' in chunk:
+        topic = chunk['_collection'].replace('_', ' ').title()
+    ref_str = f"Reference Link: {chunk.get('__ref_link', 'Not Available')}"
+    return f"Source {i} (Topic: {topic}):\n{text}\n{ref_str}\n"
+
+def _is_near_duplicate(embedding: Optional[List[float]], kept: List[np.ndarray], threshold: float) -> bool:
+    if embedding is None or not kept:
+        return False
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return False
+    vector = vector / norm
+    return any(len(other) == len(vector) and float(other @ vector) >= threshold for other in kept)
+
+@stage_timer("context_packing").time()
+def pack_context(
+    faqs: List[Dict[str, Any]],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Builds the LLM context from retrieved chunks (best first) within token_budget tokens:
+    one chunk per reference link, near-duplicates (by embedding) dropped, the last chunk that
+    fits truncated on a token boundary. Returns the context and the chunks it cites, in Source
+    order; pass those to cited_reference_links so the numbering matches the context.
+    """
+    kept_embeddings: List[np.ndarray] = []
+    seen_links = set()
+    packed: List[Dict[str, Any]] = []
+    lines: List[str] = []
+    used = 0
+    stats = {"candidates": len(faqs), "same_link": 0, "near_duplicate": 0, "truncated": 0, "over_budget": 0}
+    for chunk in faqs:
+        ref_link = _reference_link(chunk)
+        if ref_link in seen_links:
+            stats["same_link"] += 1
+            continue
+        if _is_near_duplicate(chunk.get('_embedding'), kept_embeddings, duplicate_threshold):
+            stats["near_duplicate"] += 1
+            continue
+        if used >= token_budget:
+            stats["over_budget"] += 1
+            continue
+        # A copy: the caller's chunks (possibly cached retrieval results) are left untouched.
+        chunk = {**chunk, '__ref_link': ref_link}
+        text = chunk.get('content_en', chunk.get('content_hi', '')) or ''
+        entry = _format_source(len(packed) + 1, chunk, text)
+        cost = count_tokens(entry)
+        if used + cost > token_budget:
+            overhead = count_tokens(_format_source(len(packed) + 1, chunk, ""))
+            room = token_budget - used - overhead
+            # The best chunk is always included, truncated if it has to be.
+            if room < CONTEXT_MIN_CHUNK_TOKENS and packed:
+                stats["over_budget"] += 1
+                continue
+            entry = _format_source(len(packed) + 1, chunk, truncate_to_tokens(text, max(room, 1)))
+            cost = count_tokens(entry)
+            stats["truncated"] += 1
+        seen_links.add(ref_link)
+        if chunk.get('_embedding') is not None:
+            vector = np.asarray(chunk['_embedding'], dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                kept_embeddings.append(vector / norm)
+        packed.append(chunk)
+        lines.append(entry)
+        used += cost
+    logger.info(f"Context packed: {len(packed)} sources, {used}/{token_budget} tokens, dropped/trimmed {stats}.")
+    return "\n".join(lines), packed
+
 # --- Your original formatting function (modified for simplicity) ---
 # NOTE: Removed the unused `language` parameter to simplify.
 def format_context_for_generation(faqs: List[Dict[str, Any]]) -> str:
     """
     Formats the retrieved chunks into a string for the LLM, including reference links for each chunk.
+    Token-budgeted and deduplicated; see pack_context.
     """
-    from backend.utils.reference_links import get_collection_reference_link
-    # Deduplicate by reference link
-    seen_links = set()
-    unique_chunks = []
-    for chunk in faqs:
-        ref_link = ''
-        if '_collection' in chunk:
-            ref_link = get_collection_reference_link(chunk['_collection'])
-        if not ref_link:
-            ref_link = 'Not Available'
-        if ref_link not in seen_links:
-            seen_links.add(ref_link)
-            chunk['__ref_link'] = ref_link
-            unique_chunks.append(chunk)
-    lines = []
-    for i, chunk in enumerate(unique_chunks, 1):
-        text = chunk.get('content_en', chunk.get('content_hi', ''))
-        topic = chunk.get('topic', '')
-        if not topic and '_collection' in chunk:
-            topic = chunk['_collection'].replace('_', ' ').title()
-        ref_link = chunk.get('__ref_link', 'Not Available')
-        ref_str = f"Reference Link: {ref_link}"
-        lines.append(f"Source {i} (Topic: {topic}):\n{text}\n{ref_str}\n")
-    return "\n".join(lines)
\ No newline at end of file
+    return pack_context(faqs)[0]
+
+def _log_prompt_stats(query: str, context: str, history: str) -> None:
+    context_tokens = count_tokens(context)
+    history_tokens = count_tokens(history)
+    question_tokens = count_tokens(query)
+    logger.info(
+        f"Prompt tokens: context={context_tokens} history={history_tokens} question={question_tokens} "
+        f"total={context_tokens + history_tokens + question_tokens} (excluding the instructions)."
+    )
@@ -1,13 +1,19 @@
 from typing import List
 from numpy import dot
 from numpy.linalg import norm
+from collections import OrderedDict
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
-from backend.nlp.model_loader import get_embedding_model
+from backend.nlp.model_loader import get_embedding_model, get_embedding_model_name
+from backend.nlp.embedding_cache import get_embedding_cache, cache_key
+from backend.services.metrics import stage_timer
 
 
+@stage_timer("embedding").time()
 def get_embedding(text: str) -> List[float]:
     try:
         model = get_embedding_model()
@@ -23,6 +29,91 @@ def get_embedding(text: str) -> List[float]:
         logger.error(f"Error generating embedding for text '{text}': {e}", exc_info=True)
         raise
 
+@stage_timer("embedding").time()
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Batched embeddings for several texts, served from the shared embedding cache
+    where possible; only the misses are encoded, in a single call.
+    """
+    if not texts:
+        return []
+    try:
+        model = get_embedding_model()
+        return get_embedding_cache().encode(
+            get_embedding_model_name(),
+            texts,
+            lambda missing: model.encode(missing, convert_to_numpy=True)
+        )
+    except RuntimeError as e:
+        logger.error(f"NLP model error during embedding generation: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Error generating embeddings for {len(texts)} texts: {e}", exc_info=True)
+        raise
+
+class QueryEmbeddingCache:
+    '''
+    Small in-process LRU for user-query embeddings. Queries are mostly one-off, so they stay
+    out of the persistent (corpus) embedding cache and never cost a disk write.
+    '''
+
+    def __init__(self, max_items: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, model_name: str, texts: List[str], encode_fn) -> List[List[float]]:
+        keys = [cache_key(model_name, text) for text in texts]
+        results = []
+        with self._lock:
+            for key in keys:
+                vector = self._items.get(key)
+                if vector is not None:
+                    self._items.move_to_end(key)
+                results.append(vector)
+        missing = {}
+        for i, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        self.hits += len(results) - sum(1 for r in results if r is None)
+        self.misses += sum(1 for r in results if r is None)
+        if missing:
+            encoded = dict(zip(missing, ([float(x) for x in v] for v in encode_fn(list(missing.values())))))
+            with self._lock:
+                for key, vector in encoded.items():
+                    self._items[key] = vector
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+            results = [vector if vector is not None else encoded[key] for key, vector in zip(keys, results)]
+        return results
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+@stage_timer("embedding").time()
+def get_query_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Embeddings for user queries (chat, clustering, admin-answer matching): in-memory LRU only,
+    misses encoded in a single call. Corpus text goes through get_embeddings instead.
+    """
+    if not texts:
+        return []
+    try:
+        model = get_embedding_model()
+        return query_embedding_cache.encode(
+            get_embedding_model_name(),
+            texts,
+            lambda missing: model.encode(missing, convert_to_numpy=True)
+        )
+    except RuntimeError as e:
+        logger.error(f"NLP model error during embedding generation: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Error generating query embeddings for {len(texts)} texts: {e}", exc_info=True)
+        raise
+
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """
     Calculate the cosine similarity between two vectors.
@@ -0,0 +1,48 @@
+import logging
+import math
+import os
+from backend.nlp.model_loader import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Used when the embedding model (and so its tokenizer) is not loaded, e.g. in scripts.
+CHARS_PER_TOKEN = 3
+# Counts come from the embedding model's tokenizer, not the LLM's (llama-3.1, which splits
+# Hindi into more pieces); they are scaled up by this factor so prompt budgets err on the safe side.
+LLM_TOKEN_MARGIN = float(os.getenv("LLM_TOKEN_MARGIN", "1.3"))
+
+
+def _tokenizer():
+    try:
+        return get_embedding_model().tokenizer
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    '''
+    Estimated LLM token count of text: the embedding model's (multilingual subword) tokenizer
+    count, times LLM_TOKEN_MARGIN.
+    '''
+    if not text:
+        return 0
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        pieces = math.ceil(len(text) / CHARS_PER_TOKEN)
+    else:
+        pieces = len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+    return math.ceil(pieces * LLM_TOKEN_MARGIN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    '''The longest prefix of text whose count_tokens fits in max_tokens (cut on a token boundary).'''
+    pieces = int(max_tokens / LLM_TOKEN_MARGIN)
+    if not text or pieces <= 0:
+        return ""
+    tokenizer = _tokenizer()
+    if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+        return text[:pieces * CHARS_PER_TOKEN]
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+    if len(offsets) <= pieces:
+        return text
+    return text[:offsets[pieces - 1][1]]
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from backend.db.mongo_utils import get_async_chatbot_db, get_legal_db
+from backend.db.corpus_version import get_corpus_version
+from backend.nlp.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Store location and refresh knobs, overridable from the environment.
+WARM_ANSWERS_COLLECTION = os.getenv("WARM_ANSWERS_COLLECTION", "warm_answers")
+WARM_VERSION_TTL = float(os.getenv("WARM_VERSION_TTL", "300"))  # seconds the corpus version is cached for
+WARM_HITS_FLUSH_INTERVAL = float(os.getenv("WARM_HITS_FLUSH_INTERVAL", "60"))  # seconds hit counts are buffered
+
+
+def normalize_query(query: str) -> str:
+    '''Normalization shared by the precompute job and the lookup: NFC, collapsed whitespace, casefolded.'''
+    return normalize_text(query).casefold()
+
+
+def query_key(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def warm_answer_id(query: str, language: str) -> str:
+    return f"{language}:{query_key(query)}"
+
+
+class WarmAnswerStore:
+    '''
+    Precomputed answers for frequent questions (filled by backend/scripts/precompute_answers.py),
+    keyed by language and normalized query. An entry is served only while its corpus_version
+    matches the current corpus, so content updates invalidate the whole store at once.
+    Lookups are reads only: per-entry hit counts are buffered and written in one bulk update
+    at most every hits_flush_interval seconds.
+    '''
+
+    def __init__(self, version_ttl: float = WARM_VERSION_TTL, hits_flush_interval: float = WARM_HITS_FLUSH_INTERVAL):
+        self.version_ttl = version_ttl
+        self.hits_flush_interval = hits_flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+        self._pending_hits: Dict[str, int] = {}
+        self._hits_flushed = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def current_version(self) -> Optional[str]:
+        if self._version is None or time.monotonic() - self._version_checked > self.version_ttl:
+            try:
+                self._version = await asyncio.to_thread(get_corpus_version, get_legal_db())
+            except Exception as e:
+                logger.error(f"Could not read the corpus version: {e}")
+                return None
+            self._version_checked = time.monotonic()
+        return self._version
+
+    async def lookup(self, query: str, language: str) -> Optional[Dict[str, Any]]:
+        '''Precomputed answer for query in language, or None.'''
+        version = await self.current_version()
+        if version is None:
+            return None
+        entry = await get_async_chatbot_db()[WARM_ANSWERS_COLLECTION].find_one(
+            {"_id": warm_answer_id(query, language), "corpus_version": version},
+            {"answer": 1},
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._count_hits([entry["_id"]])
+        return entry
+
+    async def lookup_many(self, queries: List[str], language: str) -> List[Optional[Dict[str, Any]]]:
+        '''lookup() for a batch of queries with one round trip; results are in input order.'''
+        version = await self.current_version()
+        if version is None:
+            return [None] * len(queries)
+        ids = [warm_answer_id(query, language) for query in queries]
+        collection = get_async_chatbot_db()[WARM_ANSWERS_COLLECTION]
+        entries = {
+            doc["_id"]: doc
+            async for doc in collection.find({"_id": {"$in": list(set(ids))}, "corpus_version": version}, {"answer": 1})
+        }
+        found = [entries.get(answer_id) for answer_id in ids]
+        hits = [entry["_id"] for entry in found if entry is not None]
+        self.hits += len(hits)
+        self.misses += len(found) - len(hits)
+        self._count_hits(hits)
+        return found
+
+    def _count_hits(self, ids: List[str]) -> None:
+        for answer_id in ids:
+            self._pending_hits[answer_id] = self._pending_hits.get(answer_id, 0) + 1
+        due = time.monotonic() - self._hits_flushed >= self.hits_flush_interval
+        if self._pending_hits and due and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush_hits())
+
+    async def flush_hits(self) -> None:
+        '''Writes the buffered hit counts (also called on shutdown). Failures only log.'''
+        pending, self._pending_hits = self._pending_hits, {}
+        self._hits_flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            await get_async_chatbot_db()[WARM_ANSWERS_COLLECTION].bulk_write(
+                [UpdateOne({"_id": answer_id}, {"$inc": {"hits": count}}) for answer_id, count in pending.items()],
+                ordered=False,
+            )
+        except Exception as e:
+            logger.warning(f"Could not record {sum(pending.values())} warm answer hits: {e}")
+
+    async def invalidate_questions(self, questions: List[str]) -> int:
+        '''Drops the entries of these questions in every language (e.g. after an admin answers them).'''
+        keys = list({query_key(q) for q in questions if q})
+        if not keys:
+            return 0
+        result = await get_async_chatbot_db()[WARM_ANSWERS_COLLECTION].delete_many({"query_key": {"$in": keys}})
+        return result.deleted_count
+
+
+warm_answer_store = WarmAnswerStore()
@@ -1,26 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from bson import ObjectId 
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import json
 import logging
 import os
 import jwt
-from backend.models.chat_model import AdminLogin
+from backend.models.chat_model import AdminLogin, BulkMarkRequest, BulkAnswerRequest
 from passlib.context import CryptContext
 
 # Import the correct database utility functions
 from backend.db.mongo_utils import (
     get_chatbot_db,
     get_admin_db,
+    get_async_admin_db,
     get_unanswered_logs,
-    get_all_logs_entries,
+    build_logs_query,
+    build_logs_projection,
+    get_logs_page,
+    stream_logs,
     get_admin_user,
     create_admin_user,
     insert_admin_marking,
-    insert_admin_answer
+    insert_admin_answer,
+    bulk_mark_logs,
+    bulk_answer_logs,
+    log_sink
 )
 
+from backend.db.log_rollups import log_rollups
+from backend.db.log_export import resolve_columns, build_export_query, iter_export_bytes
+from backend.nlp.query_clustering import query_clusterer
+from backend.nlp.admin_answers import admin_answer_tier
+from backend.services.admission import chat_admission
+from backend.nlp.conversation_memory import conversation_memory
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -65,11 +81,71 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- Log listing: keyset pagination, filters, projection, NDJSON export ---
+class LogListParams:
+    '''
+    Query parameters shared by the log listing endpoints. Pages are newest first; the cursor
+    for the next page is returned in the X-Next-Cursor header so the body stays a plain list.
+    '''
+    def __init__(
+        self,
+        limit: int = Query(100, ge=1, le=1000, description="Page size."),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page."),
+        status: Optional[str] = Query(None, description="Filter by log status (answered, unanswered, error)."),
+        triage: Optional[str] = Query(None, pattern="^(unanswered|marked|answered)$", description="Filter by admin triage state."),
+        language: Optional[str] = Query(None, description="Filter by language."),
+        start: Optional[datetime] = Query(None, description="Only logs at or after this time."),
+        end: Optional[datetime] = Query(None, description="Only logs before this time."),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return (_id and timestamp are always included)."),
+        format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams every matching log, ignoring limit/cursor."),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.status = status
+        self.triage = triage
+        self.language = language
+        self.start = start
+        self.end = end
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.format = format
+
+async def _ndjson_lines(query: Dict[str, Any], fields: Optional[List[str]]):
+    async for log in stream_logs(query, fields):
+        yield json.dumps(log, default=str, ensure_ascii=False) + "\n"
+
+async def list_logs(params: LogListParams, response: Response, unanswered: bool = False):
+    query = build_logs_query(
+        params.status, params.language, params.start, params.end,
+        unanswered=unanswered, triage=params.triage
+    )
+    try:
+        if params.format == "ndjson":
+            # Validate the projection before the response starts streaming.
+            build_logs_projection(params.fields)
+            return StreamingResponse(
+                _ndjson_lines(query, params.fields),
+                media_type="application/x-ndjson",
+                headers={"Content-Disposition": "attachment; filename=logs.ndjson"},
+            )
+        logs, next_cursor = await get_logs_page(query, params.limit, params.cursor, params.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
+
+async def _index_admin_answers(query_ids: List[str]) -> None:
+    '''Makes new admin answers available to the chat's admin-answer tier; failures only log.'''
+    try:
+        await admin_answer_tier.add_answers(query_ids)
+    except Exception as e:
+        logger.error(f"Failed to index admin answers for {len(query_ids)} queries: {e}", exc_info=True)
+
 # --- New: Mail Unanswered Queries Endpoint ---
 @router.post("/mail_unanswered")
 async def mail_unanswered_queries(current_user: dict = Depends(get_current_admin_user)):
     try:
-        unanswered = get_unanswered_logs()
+        unanswered = await get_unanswered_logs()
         if not unanswered:
             return {"message": "No unanswered queries found."}
         # Format email body
@@ -103,19 +179,29 @@ async def force_add_admin():
     return {"message": f"Admin {email} created with password '{password}'"}
 
 @router.get("/unanswered_logs", response_model=List[Dict[str, Any]])
-async def get_unanswered_logs_api(current_user: dict = Depends(get_current_admin_user)):
+async def get_unanswered_logs_api(
+    response: Response,
+    params: LogListParams = Depends(),
+    current_user: dict = Depends(get_current_admin_user),
+):
     try:
-        logs = get_unanswered_logs()
-        return logs
+        return await list_logs(params, response, unanswered=True)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching unanswered logs: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch unanswered logs")
 
 @router.get("/all_logs", response_model=List[Dict[str, Any]])
-async def get_all_logs_api(current_user: dict = Depends(get_current_admin_user)):
+async def get_all_logs_api(
+    response: Response,
+    params: LogListParams = Depends(),
+    current_user: dict = Depends(get_current_admin_user),
+):
     try:
-        logs = get_all_logs_entries()
-        return logs
+        return await list_logs(params, response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching all logs: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch all logs")
@@ -151,27 +237,121 @@ async def register_admin_user(user_data: AdminLogin):
         raise HTTPException(status_code=500, detail="Failed to register admin user.")
 
 @router.get("/unanswered_queries", response_model=List[Dict[str, Any]])
-async def get_admin_unanswered_queries(current_user: Dict[str, Any] = Depends(get_current_admin_user)):
+async def get_admin_unanswered_queries(
+    response: Response,
+    params: LogListParams = Depends(),
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
     if current_user["role"] not in ["admin", "viewer"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
     try:
-        queries = get_unanswered_logs()
-        return queries
+        return await list_logs(params, response, unanswered=True)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to retrieve unanswered queries for admin: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve data.")
 
 @router.get("/logs", response_model=List[Dict[str, Any]])
-async def get_admin_all_logs(current_user: Dict[str, Any] = Depends(get_current_admin_user)):
+async def get_admin_all_logs(
+    response: Response,
+    params: LogListParams = Depends(),
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
     if current_user["role"] not in ["admin", "viewer"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
     try:
-        logs = get_all_logs_entries()
-        return logs
+        return await list_logs(params, response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to retrieve all logs for admin: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve data.")
 
+@router.get("/stats")
+async def get_dashboard_stats(
+    start: Optional[datetime] = Query(None, description="Start of the range (default: 30 days / 48 hours ago)."),
+    end: Optional[datetime] = Query(None, description="End of the range (exclusive)."),
+    granularity: str = Query("day", pattern="^(day|hour)$"),
+    top: int = Query(10, ge=1, le=100, description="Number of top questions to return."),
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
+    """
+    Volume, answered ratio, language mix and top questions, read from the log rollups only.
+    """
+    if current_user["role"] not in ["admin", "viewer"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
+    try:
+        return await log_rollups.get_stats(start, end, granularity, top)
+    except Exception as e:
+        logger.error(f"Failed to retrieve dashboard stats: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve stats.")
+
+@router.get("/load_stats")
+async def get_load_stats(current_user: Dict[str, Any] = Depends(get_current_admin_user)):
+    """
+    Live load counters: chat admission (in flight, queue depth, rate-limited and shed requests)
+    the chat log writer queue and server-side conversation sessions.
+    """
+    if current_user["role"] not in ["admin", "viewer"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
+    return {
+        "admission": chat_admission.stats(),
+        "log_sink": log_sink.stats(),
+        "conversations": conversation_memory.stats(),
+    }
+
+@router.get("/unanswered_clusters")
+async def get_unanswered_clusters(
+    limit: int = Query(50, ge=1, le=500, description="Number of clusters to return."),
+    samples: int = Query(5, ge=1, le=50, description="Sample questions per cluster."),
+    refresh: bool = Query(False, description="Cluster queries that arrived since the last run first."),
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
+    """
+    Open queries grouped by meaning, largest cluster first, so each missing topic is answered once.
+    """
+    if current_user["role"] not in ["admin", "viewer"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
+    try:
+        if refresh:
+            await query_clusterer.refresh()
+        return await query_clusterer.get_clusters(limit=limit, samples=samples)
+    except Exception as e:
+        logger.error(f"Failed to retrieve unanswered query clusters: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve clusters.")
+
+@router.get("/export/logs")
+async def export_logs(
+    columns: Optional[str] = Query(None, description="Comma-separated columns (default: all log columns)."),
+    start: Optional[datetime] = Query(None, description="Only logs at or after this time."),
+    end: Optional[datetime] = Query(None, description="Only logs before this time."),
+    include_admin: bool = Query(False, description="Add the admin marking and answer columns."),
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
+    """
+    Columnar export of the chat logs, streamed from a Mongo cursor in row-group batches.
+    """
+    if current_user["role"] not in ["admin", "viewer"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this resource.")
+    try:
+        selected = resolve_columns(
+            [c.strip() for c in columns.split(",") if c.strip()] if columns else None, include_admin
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension, media_type = (
+        ("parquet", "application/vnd.apache.parquet") if format == "parquet"
+        else ("arrows", "application/vnd.apache.arrow.stream")
+    )
+    # A sync generator over the sync client: Starlette iterates it in the threadpool.
+    return StreamingResponse(
+        iter_export_bytes(get_chatbot_db(), selected, build_export_query(start, end), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=logs.{extension}"},
+    )
+
 @router.post("/add_faq")
 async def add_faq_entry(faq_data: Dict[str, Any], current_user: Dict[str, Any] = Depends(get_current_admin_user)):
     if current_user["role"] != "admin":
@@ -195,9 +375,10 @@ async def submit_answer(
     
     # Correctly call the database utility functions
     try:
-        success = await insert_admin_answer(query_id, answer_text)
+        success = await insert_admin_answer(query_id, answer_text, current_user["email"])
         if not success:
             raise HTTPException(status_code=404, detail="Query not found or already answered")
+        await _index_admin_answers([query_id])
         return {"message": "Answer submitted successfully"}
     except Exception as e:
         logger.error(f"Error submitting answer: {e}", exc_info=True)
@@ -253,9 +434,10 @@ async def answer_query(
         
     # Correctly call the database utility function
     try:
-        success = await insert_admin_answer(query_id, answer_text)
+        success = await insert_admin_answer(query_id, answer_text, current_user["email"])
         if not success:
              return {"message": "Answer already submitted or query not found."}
+        await _index_admin_answers([query_id])
         
         logger.info(f"Answer inserted for query {query_id}")
         return {"message": "Answer submitted and logged successfully"}
@@ -263,10 +445,59 @@ async def answer_query(
         logger.error(f"Error submitting admin answer: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to submit admin answer")
 
+def _bulk_summary(results: List[Dict[str, str]]) -> Dict[str, int]:
+    summary: Dict[str, int] = {}
+    for item in results:
+        summary[item["result"]] = summary.get(item["result"], 0) + 1
+    return summary
+
+@router.post("/mark_queries")
+async def mark_queries_bulk(
+    request: BulkMarkRequest,
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
+    """
+    Mark many queries in one request. Returns a result per item (marked, not_found, not_open, invalid_id, duplicate, error).
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can mark queries")
+    try:
+        results = await bulk_mark_logs(
+            [(item.query_id, item.status) for item in request.items], current_user["email"]
+        )
+    except Exception as e:
+        logger.error(f"Error bulk marking queries: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to mark queries")
+    logger.info(f"Bulk marking by {current_user['email']}: {_bulk_summary(results)}")
+    return {"results": results, "summary": _bulk_summary(results)}
+
+@router.post("/answer_queries")
+async def answer_queries_bulk(
+    request: BulkAnswerRequest,
+    current_user: Dict[str, Any] = Depends(get_current_admin_user),
+):
+    """
+    Answer many queries in one request. Returns a result per item (answered, not_found, invalid_id, duplicate, error).
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can answer queries")
+    if any(not item.answer.strip() for item in request.items):
+        raise HTTPException(status_code=400, detail="Answers cannot be empty")
+    try:
+        results = await bulk_answer_logs(
+            [(item.query_id, item.answer.strip()) for item in request.items], current_user["email"]
+        )
+    except Exception as e:
+        logger.error(f"Error bulk answering queries: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to answer queries")
+    logger.info(f"Bulk answers by {current_user['email']}: {_bulk_summary(results)}")
+    await _index_admin_answers([item["query_id"] for item in results if item["result"] == "answered"])
+    return {"results": results, "summary": _bulk_summary(results)}
+
 @router.get("/marked_queries", response_model=List[Dict[str, Any]])
 async def get_marked_queries(current_user: Dict[str, Any] = Depends(get_current_admin_user)):
-    admin_db = get_admin_db()
-    marked_raw = list(admin_db["admin_marking"].find({}, {"_id": 0, "query_id": 1, "query_log": 1}))
+    admin_db = get_async_admin_db()
+    marked_raw = await admin_db["admin_marking"].find({}, {"_id": 0, "query_id": 1, "query_log": 1}).to_list(None)
     marked = []
     for m in marked_raw:
         marked.append({
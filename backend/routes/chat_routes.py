@@ -1,18 +1,33 @@
 from backend.utils.reference_links import get_collection_reference_link
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from backend.models.chat_model import ChatQuery, ChatResponse, LogEntry
-from backend.db.mongo_utils import get_legal_db, get_chatbot_db, insert_log_entry
-from backend.nlp.rag import generate_answer_with_rag, load_llm_and_models
+from backend.db.mongo_utils import get_legal_db, get_async_chatbot_db, insert_log_entry
+from backend.nlp.rag import (
+    generate_answer_from_chunks,
+    stream_answer_from_chunks,
+    prepare_answer,
+    prepare_batch_answers,
+    match_admin_answers,
+    load_llm_and_models
+)
+from backend.nlp.warm_answers import warm_answer_store
 from backend.nlp.model_loader import get_embedding_model
+from backend.services.tts_service import TTSBusyError, schedule_synthesis, get_audio, audio_exists, sniff_media_type
+from backend.services.admission import chat_admission, shared_llm_slots
+from backend.nlp.conversation_memory import conversation_memory
+from backend.services.metrics import stage_timer, CHAT_IN_FLIGHT, CHAT_ANSWERS
+import asyncio
+import json
 import logging
 import os
-import io
-import pyttsx3
-import base64
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 import re
+import threading
 import traceback
 
 
@@ -27,25 +42,35 @@ router = APIRouter()
 
 # Configuration
 CONFIDENCE_THRESHOLD = 0.1  # lowered threshold to increase recall
+AUDIO_CACHE_MAX_AGE = 86400  # audio ids are content-addressed, so responses never change
 KEYWORDS_COLLECTION = os.getenv("KEYWORDS_COLLECTION", "keywords")
+# Batch endpoint limits.
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "50"))  # queries per /chat_batch request
 
-# --- Updated ChatResponse model to include optional audio data ---
+WS_PING_INTERVAL = float(os.getenv("CHAT_WS_PING_INTERVAL", "20"))  # seconds between server keepalive pings
+WS_IDLE_TIMEOUT = float(os.getenv("CHAT_WS_IDLE_TIMEOUT", "90"))  # close sockets silent for this long
+WS_MAX_PENDING = int(os.getenv("CHAT_WS_MAX_PENDING", "4"))  # messages queued per socket while one is answered
+WS_TOKEN_BUFFER = int(os.getenv("CHAT_WS_TOKEN_BUFFER", "64"))  # tokens buffered before the LLM waits for the client
+
+# --- Updated ChatResponse model to include an optional audio handle ---
 class ChatResponse(BaseModel):
     bot_response: str = Field(..., description="The chatbot's response text.")
     status: str = Field(..., description="Status of the query (e.g., 'answered', 'unanswered', 'error').")
     language: str = Field(..., description="Language of the bot's response.")
     query_id: Optional[str] = Field(None, description="Optional ID for the processed query.")
     similarity_score: Optional[float] = Field(None, description="Cosine similarity score if answered by NLP.")
-    audio_data: Optional[str] = Field(None, description="Base64 encoded audio of the bot's response.")
+    audio_id: Optional[str] = Field(None, description="Handle of the bot's response audio, synthesized in the background.")
+    audio_url: Optional[str] = Field(None, description="Path to fetch the response audio from (GET, supports Range).")
+    answer_source: Optional[str] = Field(None, description="'admin' for a vetted admin answer, 'warm' for a precomputed one, 'rag' for a generated one.")
 
 async def get_synonyms_from_db(query_text: str, language: str) -> List[str]:
     '''Fetch synonyms from the chatbot database's keywords collection.'''
     try:
-        db = get_chatbot_db()
+        db = get_async_chatbot_db()
         synonyms_collection = db[KEYWORDS_COLLECTION]
         query_words = [word.strip().lower() for word in query_text.split() if word.strip()]
         search_field = "english_synonyms" if language == 'en' else "hindi_synonyms"
-        synonym_docs = list(synonyms_collection.find({search_field: {"$in": query_words}}))
+        synonym_docs = await synonyms_collection.find({search_field: {"$in": query_words}}).to_list(None)
         
         expanded_keywords = []
         for doc in synonym_docs:
@@ -64,36 +89,36 @@ class ChatRequest(BaseModel):
     user_id: str = Field(...)
     query_text: str = Field(...)
     language: str = Field("en")
-    chat_history: Optional[List[Dict[str, str]]] = None
+    chat_history: Optional[List[Dict[str, str]]] = None  # only used to start a server-side session
+    session_id: Optional[str] = None
 
-def generate_tts_audio(text: str, lang: str) -> Optional[str]:
-    '''Generates a encoded audio string from text using pyttsx3.'''
-    try:
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
-        if lang == 'hi':
-            for voice in voices:
-                if 'hi' in voice.languages or 'Hindi' in voice.name:
-                    engine.setProperty('voice', voice.id)
-                    break
-        else:
-            for voice in voices:
-                if 'en' in voice.languages or 'English' in voice.name:
-                    engine.setProperty('voice', voice.id)
-                    break
-        audio_stream = io.BytesIO()
-        engine.save_to_file(text, 'temp_tts_output.mp3')
-        engine.runAndWait()
-        with open('temp_tts_output.mp3', 'rb') as f:
-            audio_base64 = base64.b64encode(f.read()).decode('utf-8')
-        os.remove('temp_tts_output.mp3')
-        return audio_base64
-    except Exception as e:
-        logger.error(f"Failed to generate TTS audio: {e}", exc_info=True)
-        return None
+class ChatBatchRequest(BaseModel):
+    user_id: str = Field(...)
+    language: str = Field("en")
+    queries: List[str] = Field(..., min_length=1, max_length=CHAT_BATCH_MAX)
+
+def _answer_status(bot_response_text: str) -> str:
+    return "answered" if bot_response_text and "couldn't find" not in bot_response_text.lower() else "unanswered"
+
+async def _prepare(query_text: str, language: str, first_turn: bool = True) -> Dict[str, Any]:
+    '''
+    Answer tiers in order: admin answers, then the precomputed warm store (frequent questions,
+    while current), then retrieval. Shaped like prepare_answer's result, with "source" set on
+    answers ("admin" or "warm"). Warm answers were generated without conversation history, so
+    they are only served on the first turn of a session.
+    '''
+    admin = (await asyncio.to_thread(match_admin_answers, [query_text], language))[0]
+    if admin:
+        return admin
+    if first_turn:
+        with stage_timer("warm_lookup").time():
+            warm = await warm_answer_store.lookup(query_text, language)
+        if warm:
+            return {"answer": warm["answer"], "source": "warm"}
+    return await asyncio.to_thread(prepare_answer, query_text, 5, language, False)
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_bot(request: ChatRequest):
+async def chat_with_bot(request: ChatRequest, http_request: Request):
     user_query_text = request.query_text
     user_id = request.user_id
     language = request.language
@@ -101,23 +126,35 @@ async def chat_with_bot(request: ChatRequest):
 
     logger.info(f"Received chat query from {user_id} ({language}): '{user_query_text}'")
 
-    context_window = 5
-    history_context = ""
-    if chat_history:
-        for msg in chat_history[-context_window:]:
-            prefix = "User:" if msg.get("sender") == "user" else "Bot:"
-            history_context += f"{prefix} {msg.get('text', '')}\n"
-
+    # Rate limit per user_id and bound the pipelines in flight; raises 429/503 with Retry-After.
+    await chat_admission.acquire(user_id)
+    CHAT_IN_FLIGHT.labels("chat").inc()
+    started = time.perf_counter()
+    # Conversation history is kept server-side; client-sent history only seeds a new session.
+    # Only admitted requests touch it, so rejected ones don't create sessions.
+    session_key = conversation_memory.session_key(user_id, request.session_id)
     try:
-        # Use the new RAG+LLM pipeline for answer generation
-        bot_response_text = generate_answer_with_rag(user_query_text)
-        status_text = "answered" if bot_response_text and "couldn't find" not in bot_response_text.lower() else "unanswered"
-        audio_data = generate_tts_audio(bot_response_text, lang=language)
+        conversation_memory.seed(session_key, chat_history)
+        history_context = conversation_memory.get_context(session_key)
+        prepared = await _prepare(user_query_text, language, first_turn=not history_context)
+        if "answer" in prepared:
+            bot_response_text, answer_source = prepared["answer"], prepared["source"]
+        else:
+            # The RAG+LLM pipeline is synchronous (sync DB facade, LLM client), so run it off the event loop.
+            bot_response_text = await asyncio.to_thread(
+                generate_answer_from_chunks, user_query_text, prepared["chunks"], history_context
+            )
+            answer_source = "rag"
+        status_text = _answer_status(bot_response_text)
+        # Audio is synthesized in the background; the client fetches it from audio_url if it wants it.
+        audio_id = await schedule_synthesis(bot_response_text, language)
     except Exception as e:
         logger.error(f"Error processing chat query '{user_query_text}': {e}\n{traceback.format_exc()}")
         bot_response_text = "An internal error occurred while processing your request. Please try again."
         status_text = "error"
-        audio_data = None
+        answer_source = None
+        audio_id = None
+        CHAT_ANSWERS.labels("chat", status_text, "none").inc()
         await insert_log_entry(LogEntry(
             timestamp=datetime.now(),
             user_id=user_id,
@@ -125,11 +162,18 @@ async def chat_with_bot(request: ChatRequest):
             bot_response_text=bot_response_text,
             status=status_text,
             language=language,
-            similarity_score=None
+            similarity_score=None,
+            answer_source=answer_source
         ).dict())
         raise HTTPException(status_code=500, detail="Internal server error.")
+    finally:
+        chat_admission.release()
+        CHAT_IN_FLIGHT.labels("chat").dec()
+        stage_timer("chat_pipeline").observe(time.perf_counter() - started)
 
+    CHAT_ANSWERS.labels("chat", status_text, answer_source).inc()
     if status_text != "error":
+        conversation_memory.add_turn(session_key, user_query_text, bot_response_text)
         await insert_log_entry(LogEntry(
             timestamp=datetime.now(),
             user_id=user_id,
@@ -137,7 +181,8 @@ async def chat_with_bot(request: ChatRequest):
             bot_response_text=bot_response_text,
             status=status_text,
             language=language,
-            similarity_score=None
+            similarity_score=None,
+            answer_source=answer_source
         ).dict())
 
     return ChatResponse(
@@ -145,5 +190,364 @@ async def chat_with_bot(request: ChatRequest):
         status=status_text,
         language=language,
         similarity_score=None,
-        audio_data=audio_data
-    )
\ No newline at end of file
+        audio_id=audio_id,
+        audio_url=http_request.url_for("get_chat_audio", audio_id=audio_id).path if audio_id else None,
+        answer_source=answer_source
+    )
+
+@router.post("/chat_batch")
+async def chat_batch(request: ChatBatchRequest):
+    '''
+    Answers many queries in one request. Warm lookups, embeddings and retrieval are done once for
+    the whole batch; LLM generations run concurrently (bounded by the shared LLM slots).
+    Results are streamed as NDJSON in completion order, each tagged with its input index.
+    '''
+    queries = request.queries
+    language = request.language
+    logger.info(f"Received chat batch of {len(queries)} queries from {request.user_id} ({language}).")
+
+    # A batch takes one admission slot (held until the stream ends); its LLM calls are bounded separately.
+    # Each query counts against the user's rate limit, as if sent to /chat.
+    await chat_admission.acquire(request.user_id, cost=len(queries))
+    CHAT_IN_FLIGHT.labels("chat_batch").inc()
+    released = False
+
+    def release_slot() -> None:
+        # Called from the stream's finally and as the response's background task: the first
+        # frees the slot as soon as the stream ends, the second covers a body that never starts.
+        nonlocal released
+        if not released:
+            released = True
+            chat_admission.release()
+            CHAT_IN_FLIGHT.labels("chat_batch").dec()
+
+    try:
+        # Same tier order as _prepare: admin answers, warm store, retrieval.
+        admin_answers = await asyncio.to_thread(match_admin_answers, queries, language)
+        rest = [i for i, admin in enumerate(admin_answers) if admin is None]
+        with stage_timer("warm_lookup").time():
+            warm_found = await warm_answer_store.lookup_many([queries[i] for i in rest], language) if rest else []
+        warm_entries = dict(zip(rest, warm_found))
+        cold = [i for i in rest if warm_entries[i] is None]
+        prepared = await asyncio.to_thread(prepare_batch_answers, [queries[i] for i in cold], 5, language, False) if cold else []
+    except Exception as e:
+        release_slot()
+        logger.error(f"Error preparing chat batch: {e}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+    prepared_by_index = {i: admin for i, admin in enumerate(admin_answers) if admin is not None}
+    prepared_by_index.update((i, {"answer": warm_entries[i]["answer"], "source": "warm"}) for i in rest if warm_entries[i] is not None)
+    prepared_by_index.update(zip(cold, prepared))
+
+    async def answer(index: int) -> Dict[str, Any]:
+        query_text = queries[index]
+        answer_source = "rag"
+        try:
+            if "answer" in prepared_by_index[index]:
+                bot_response_text = prepared_by_index[index]["answer"]
+                answer_source = prepared_by_index[index]["source"]
+            else:
+                async with shared_llm_slots:
+                    bot_response_text = await asyncio.to_thread(
+                        generate_answer_from_chunks, query_text, prepared_by_index[index]["chunks"]
+                    )
+            status_text = _answer_status(bot_response_text)
+        except Exception as e:
+            logger.error(f"Error processing batch query '{query_text}': {e}\n{traceback.format_exc()}")
+            bot_response_text = "An internal error occurred while processing your request. Please try again."
+            status_text = "error"
+            answer_source = None
+        CHAT_ANSWERS.labels("chat_batch", status_text, answer_source or "none").inc()
+        await insert_log_entry(LogEntry(
+            timestamp=datetime.now(),
+            user_id=request.user_id,
+            query_text=query_text,
+            bot_response_text=bot_response_text,
+            status=status_text,
+            language=language,
+            similarity_score=None,
+            answer_source=answer_source
+        ).dict())
+        return {
+            "index": index,
+            "query_text": query_text,
+            "bot_response": bot_response_text,
+            "status": status_text,
+            "answer_source": answer_source,
+        }
+
+    async def stream():
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(queries))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, ensure_ascii=False) + "\n"
+        finally:
+            # A client that disconnects mid-stream should not keep LLM slots busy.
+            for task in tasks:
+                task.cancel()
+            release_slot()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(release_slot))
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple]:
+    '''Parses a single "bytes=start-end" range. Returns (start, end) inclusive, or None if unsatisfiable.'''
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+    else:  # suffix range: the last N bytes
+        start = max(size - int(match.group(2)), 0)
+        end = size - 1
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        return None
+    return start, end
+
+@router.get("/audio/{audio_id}", name="get_chat_audio")
+async def get_chat_audio(audio_id: str, request: Request):
+    '''Serves the synthesized audio for a chat response, with Range and caching support.'''
+    etag = f'"{audio_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={AUDIO_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        # Only known handles are "not modified"; an unknown id is a 404 whatever the client cached.
+        if not await audio_exists(audio_id):
+            raise HTTPException(status_code=404, detail="Audio not found or could not be generated.")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        audio = await get_audio(audio_id)
+    except TTSBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Audio generation is busy. Please try again shortly.",
+            headers={"Retry-After": "5"},
+        )
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found or could not be generated.")
+    media_type = sniff_media_type(audio)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, len(audio))
+        if byte_range is None:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{len(audio)}"}
+            )
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(audio)}"
+        return Response(
+            content=audio[start:end + 1],
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers
+        )
+    return Response(content=audio, media_type=media_type, headers=headers)
+
+class _GenerationStopped(Exception):
+    '''Raised in the generation thread to end an LLM stream whose client is gone.'''
+
+class ChatSocket:
+    '''
+    One /chat_api/ws connection. Messages are answered one at a time, in order; up to
+    WS_MAX_PENDING more may queue behind the current one, beyond that they are rejected
+    with a "busy" error frame. Answer tokens pass through a bounded buffer, so a slow client
+    slows the LLM stream down instead of growing server memory.
+
+    Client frames (JSON text):
+        {"type": "chat", "id": "<client id>", "query_text": "...", "language": "en"}
+        {"type": "ping"} / {"type": "pong"}
+    Server frames:
+        {"type": "start", "id"}, {"type": "token", "id", "text"}, {"type": "links", "id", "links"},
+        {"type": "end", "id", "bot_response", "status", "answer_source", "audio_id", "audio_url"},
+        {"type": "error", "id", "detail", "retry_after"}, {"type": "ping"} / {"type": "pong"}
+    The end frame's bot_response is the complete answer (with reference links).
+    '''
+
+    def __init__(self, websocket: WebSocket, user_id: str, language: str, session_id: Optional[str] = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.language = language
+        self.session_key = conversation_memory.session_key(user_id, session_id)
+        self.last_seen = time.monotonic()
+        self._inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING)
+        self._send_lock = asyncio.Lock()
+        self._drains: Set[asyncio.Task] = set()
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(frame, ensure_ascii=False))
+
+    async def run(self) -> None:
+        worker = asyncio.create_task(self._answer_loop())
+        keepalive = asyncio.create_task(self._keepalive_loop())
+        try:
+            await self._receive_loop()
+        finally:
+            worker.cancel()
+            keepalive.cancel()
+            await asyncio.gather(worker, keepalive, return_exceptions=True)
+
+    async def _receive_loop(self) -> None:
+        while True:
+            try:
+                message = json.loads(await self.websocket.receive_text())
+            except (WebSocketDisconnect, RuntimeError):
+                # RuntimeError: the keepalive loop already closed an idle socket.
+                return
+            except ValueError:
+                await self.send({"type": "error", "detail": "Frames must be JSON."})
+                continue
+            self.last_seen = time.monotonic()
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "chat" and (message.get("query_text") or "").strip():
+                try:
+                    self._inbox.put_nowait(message)
+                except asyncio.QueueFull:
+                    await self.send({"type": "error", "id": message.get("id"), "detail": "Too many pending messages.", "retry_after": 1})
+            else:
+                await self.send({"type": "error", "id": message.get("id") if isinstance(message, dict) else None, "detail": "Unsupported frame."})
+
+    async def _keepalive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            if time.monotonic() - self.last_seen > WS_IDLE_TIMEOUT:
+                logger.info(f"Closing idle chat socket of {self.user_id}.")
+                await self.websocket.close(code=1001)
+                return
+            await self.send({"type": "ping"})
+
+    async def _answer_loop(self) -> None:
+        while True:
+            message = await self._inbox.get()
+            try:
+                await self._answer(message)
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                logger.error(f"Error answering socket message of {self.user_id}: {e}\n{traceback.format_exc()}")
+                await self.send({"type": "error", "id": message.get("id"), "detail": "Internal server error."})
+
+    async def _answer(self, message: Dict[str, Any]) -> None:
+        message_id = message.get("id")
+        query_text = message["query_text"]
+        language = message.get("language") or self.language
+        try:
+            await chat_admission.acquire(self.user_id)
+        except HTTPException as e:
+            await self.send({
+                "type": "error", "id": message_id, "detail": e.detail,
+                "retry_after": int((e.headers or {}).get("Retry-After", 1)),
+            })
+            return
+        await self.send({"type": "start", "id": message_id})
+        CHAT_IN_FLIGHT.labels("ws").inc()
+        started = time.perf_counter()
+        links: List[str] = []
+        try:
+            history = conversation_memory.get_context(self.session_key)
+            prepared = await _prepare(query_text, language, first_turn=not history)
+            if "answer" in prepared:
+                bot_response_text = prepared["answer"]
+                await self.send({"type": "token", "id": message_id, "text": bot_response_text})
+            else:
+                bot_response_text, links = await self._stream_answer(message_id, query_text, prepared["chunks"], history)
+            status_text = _answer_status(bot_response_text)
+            answer_source = prepared.get("source", "rag")
+        except Exception as e:
+            logger.error(f"Error processing socket query '{query_text}': {e}\n{traceback.format_exc()}")
+            bot_response_text = "An internal error occurred while processing your request. Please try again."
+            status_text = "error"
+            answer_source = None
+        finally:
+            chat_admission.release()
+            CHAT_IN_FLIGHT.labels("ws").dec()
+            stage_timer("chat_pipeline").observe(time.perf_counter() - started)
+
+        CHAT_ANSWERS.labels("ws", status_text, answer_source or "none").inc()
+        if status_text != "error":
+            conversation_memory.add_turn(self.session_key, query_text, bot_response_text)
+        await insert_log_entry(LogEntry(
+            timestamp=datetime.now(),
+            user_id=self.user_id,
+            query_text=query_text,
+            bot_response_text=bot_response_text,
+            status=status_text,
+            language=language,
+            similarity_score=None,
+            answer_source=answer_source
+        ).dict())
+        if links:
+            await self.send({"type": "links", "id": message_id, "links": links})
+        audio_id = await schedule_synthesis(bot_response_text, language) if status_text != "error" else None
+        await self.send({
+            "type": "end",
+            "id": message_id,
+            "bot_response": bot_response_text,
+            "status": status_text,
+            "answer_source": answer_source,
+            "audio_id": audio_id,
+            "audio_url": self.websocket.url_for("get_chat_audio", audio_id=audio_id).path if audio_id else None,
+        })
+
+    async def _stream_answer(self, message_id: Any, query_text: str, chunks: List[Dict[str, Any]], history: str = ""):
+        '''Runs the LLM stream in a thread and forwards its tokens; returns (answer, links).'''
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue(maxsize=WS_TOKEN_BUFFER)
+        done = object()
+        stopped = threading.Event()
+
+        def on_token(text: str) -> None:
+            if stopped.is_set():
+                raise _GenerationStopped()
+            # Blocks the generation thread while the buffer is full (backpressure).
+            asyncio.run_coroutine_threadsafe(tokens.put(text), loop).result()
+
+        def generate():
+            try:
+                return stream_answer_from_chunks(query_text, chunks, on_token, history)
+            finally:
+                asyncio.run_coroutine_threadsafe(tokens.put(done), loop).result()
+
+        generation = asyncio.create_task(asyncio.to_thread(generate))
+        try:
+            while True:
+                text = await tokens.get()
+                if text is done:
+                    break
+                await self.send({"type": "token", "id": message_id, "text": text})
+        finally:
+            if not generation.done():
+                # The client is gone: stop the LLM stream at its next token, and drain the
+                # buffer meanwhile so the generation thread isn't left blocked on it.
+                stopped.set()
+                drain = asyncio.create_task(self._drain_stream(tokens, done, generation))
+                self._drains.add(drain)
+                drain.add_done_callback(self._drains.discard)
+        return await generation
+
+    @staticmethod
+    async def _drain_stream(tokens: asyncio.Queue, done: object, generation: asyncio.Task) -> None:
+        while (await tokens.get()) is not done:
+            pass
+        try:
+            await generation
+        except Exception:
+            pass
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket, user_id: str, language: str = "en", session_id: Optional[str] = None):
+    '''Persistent chat channel: one connection, many messages, answers streamed as tokens (see ChatSocket).'''
+    await websocket.accept()
+    logger.info(f"Chat socket opened by {user_id} ({language}).")
+    await ChatSocket(websocket, user_id, language, session_id).run()
+    logger.info(f"Chat socket of {user_id} closed.")
@@ -0,0 +1,247 @@
+import os
+import gzip
+import json
+import hashlib
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from bson import json_util
+from pymongo import MongoClient, ReplaceOne, ASCENDING
+from dotenv import load_dotenv
+
+# Run from the repository root: python -m backend.scripts.archive_logs
+from ..db.mongo_utils import LOGS_COLLECTION, OPEN_TRIAGE_STATES
+from ..utils.atomic_files import write_json_atomic
+
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env')))
+
+MONGO_URI = os.getenv("MONGO_URI")
+CHATBOT_DB = os.getenv("CHATBOT_DB", "chatbot_db")
+RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv(
+    "LOG_ARCHIVE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'log_archive'))
+)
+BATCH_SIZE = int(os.getenv("LOG_ARCHIVE_BATCH_SIZE", "1000"))
+MANIFEST_NAME = "manifest.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def manifest_path(archive_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(archive_dir, MANIFEST_NAME)
+
+def load_manifest(archive_dir: str = ARCHIVE_DIR) -> dict:
+    """Loads the day -> archive files manifest (empty if there is none yet)."""
+    path = manifest_path(archive_dir)
+    if not os.path.exists(path):
+        return {"days": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, archive_dir: str = ARCHIVE_DIR) -> None:
+    """Writes the manifest atomically."""
+    write_json_atomic(manifest_path(archive_dir), manifest)
+
+def retention_cutoff(retention_days: int = RETENTION_DAYS, now: Optional[datetime] = None) -> datetime:
+    """Midnight of the oldest day that stays in MongoDB, so only whole days are archived."""
+    now = now or datetime.now()
+    return (now - timedelta(days=retention_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def archive_filter(start: Optional[datetime], end: datetime, keep_open: bool = True) -> dict:
+    """Logs in [start, end); open admin-queue items are left in place unless keep_open is False."""
+    window = {"$lt": end}
+    if start is not None:
+        window["$gte"] = start
+    query = {"timestamp": window}
+    if keep_open:
+        query["triage"] = {"$nin": OPEN_TRIAGE_STATES}
+    return query
+
+def _day_file(archive_dir: str, day: str, part: int) -> str:
+    """Date-partitioned location: YYYY/MM/logs-YYYY-MM-DD[.partN].jsonl.gz (relative to archive_dir)."""
+    suffix = "" if part == 0 else f".part{part}"
+    return os.path.join(day[:4], day[5:7], f"logs-{day}{suffix}.jsonl.gz")
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _DayWriter:
+    """
+    Streams one day's logs to a gzip JSONL file. Only the open file, counters and the _ids
+    written (so exactly those logs can be deleted afterwards) are held in memory.
+    """
+
+    def __init__(self, archive_dir: str, day: str, part: int):
+        self.day = day
+        self.relpath = _day_file(archive_dir, day, part)
+        self.path = os.path.join(archive_dir, self.relpath)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.tmp_path = f"{self.path}.tmp"
+        self._file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        self.count = 0
+        self.ids = []
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def write(self, log: dict) -> None:
+        self._file.write(json_util.dumps(log, ensure_ascii=False) + "\n")
+        self.count += 1
+        self.ids.append(log["_id"])
+        self.first_timestamp = self.first_timestamp or log["timestamp"]
+        self.last_timestamp = log["timestamp"]
+
+    def close(self) -> dict:
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return {
+            "file": self.relpath,
+            "count": self.count,
+            "sha256": _file_sha256(self.path),
+            "first_timestamp": self.first_timestamp.isoformat(),
+            "last_timestamp": self.last_timestamp.isoformat(),
+            "archived_at": datetime.utcnow().isoformat(),
+        }
+
+def archive_logs(db, cutoff: datetime, archive_dir: str = ARCHIVE_DIR, keep_open: bool = True, dry_run: bool = False) -> int:
+    """
+    Moves logs older than cutoff to compressed daily archives. Logs are streamed in timestamp
+    order, one day file at a time; a day's logs are deleted from MongoDB only after its file
+    is complete and recorded in the manifest. Returns the number of archived logs.
+    """
+    logs = db[LOGS_COLLECTION]
+    query = archive_filter(None, cutoff, keep_open)
+    if dry_run:
+        count = logs.count_documents(query)
+        logger.info(f"Dry run: {count} log entries older than {cutoff.date()} would be archived.")
+        return count
+
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    archived = 0
+    writer = None
+
+    def finish_day(writer: _DayWriter) -> int:
+        entry = writer.close()
+        day_entry = manifest["days"].setdefault(writer.day, {"files": [], "count": 0})
+        day_entry["files"].append(entry)
+        day_entry["count"] += entry["count"]
+        save_manifest(manifest, archive_dir)
+        # Delete exactly the logs that were written: anything inserted or reopened for that
+        # day since the cursor passed it stays in MongoDB for the next run.
+        deleted = 0
+        for start in range(0, len(writer.ids), BATCH_SIZE):
+            deleted += logs.delete_many({"_id": {"$in": writer.ids[start:start + BATCH_SIZE]}}).deleted_count
+        if deleted != entry["count"]:
+            logger.warning(f"{writer.day}: archived {entry['count']} log entries but deleted {deleted}.")
+        logger.info(f"Archived {entry['count']} log entries for {writer.day} to {entry['file']}.")
+        return entry["count"]
+
+    cursor = logs.find(query).sort([("timestamp", ASCENDING), ("_id", ASCENDING)]).batch_size(BATCH_SIZE)
+    try:
+        for log in cursor:
+            day = log["timestamp"].strftime("%Y-%m-%d")
+            if writer is None or writer.day != day:
+                if writer is not None:
+                    archived += finish_day(writer)
+                # Logs for a day that was archived before (e.g. a later import) go to a new part file.
+                part = len(manifest["days"].get(day, {}).get("files", []))
+                writer = _DayWriter(archive_dir, day, part)
+            writer.write(log)
+        if writer is not None:
+            archived += finish_day(writer)
+            writer = None
+    finally:
+        cursor.close()
+        if writer is not None:
+            # Interrupted mid-day: drop the partial file; the logs are still in MongoDB.
+            writer._file.close()
+            os.remove(writer.tmp_path)
+    logger.info(f"Archived {archived} log entries older than {cutoff.date()}.")
+    return archived
+
+def iter_archived_logs(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       archive_dir: str = ARCHIVE_DIR) -> Iterator[dict]:
+    """Streams archived logs of the days in [start, end) using the manifest, oldest first."""
+    manifest = load_manifest(archive_dir)
+    first_day = start.strftime("%Y-%m-%d") if start else None
+    last_day = end.strftime("%Y-%m-%d") if end else None
+    for day in sorted(manifest["days"]):
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        for entry in manifest["days"][day]["files"]:
+            with gzip.open(os.path.join(archive_dir, entry["file"]), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    log = json_util.loads(line)
+                    if (start and log["timestamp"] < start) or (end and log["timestamp"] >= end):
+                        continue
+                    yield log
+
+def restore_logs(db, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 archive_dir: str = ARCHIVE_DIR) -> int:
+    """Re-imports archived logs into the hot collection. Upserts by _id, so re-running is safe."""
+    logs = db[LOGS_COLLECTION]
+    restored = 0
+    batch = []
+    for log in iter_archived_logs(start, end, archive_dir):
+        batch.append(ReplaceOne({"_id": log["_id"]}, log, upsert=True))
+        if len(batch) >= BATCH_SIZE:
+            logs.bulk_write(batch, ordered=False)
+            restored += len(batch)
+            batch = []
+    if batch:
+        logs.bulk_write(batch, ordered=False)
+        restored += len(batch)
+    logger.info(f"Restored {restored} archived log entries.")
+    return restored
+
+def _parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old chat logs to compressed daily JSONL files, or query/restore archives.")
+    sub = parser.add_subparsers(dest="command")
+    archive = sub.add_parser("archive", help="Move logs older than the retention period to the archive (default).")
+    archive.add_argument("--days", type=int, default=RETENTION_DAYS, help="Retention period in days (default: LOG_RETENTION_DAYS).")
+    archive.add_argument("--include-open", action="store_true", help="Also archive unanswered/marked items still in the admin queue.")
+    archive.add_argument("--dry-run", action="store_true", help="Only count the logs that would be archived.")
+    for name, help_text in (("query", "Print archived logs as JSONL."), ("restore", "Re-import archived logs into MongoDB.")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--start", type=_parse_date, help="Start date/time (inclusive), ISO format.")
+        p.add_argument("--end", type=_parse_date, help="End date/time (exclusive), ISO format.")
+    sub.add_parser("list", help="Show the archived days from the manifest.")
+    args = parser.parse_args()
+    command = args.command or "archive"
+
+    if command == "list":
+        for day, entry in sorted(load_manifest()["days"].items()):
+            print(f"{day}: {entry['count']} logs in {len(entry['files'])} file(s)")
+        return
+    if command == "query":
+        for log in iter_archived_logs(args.start, args.end):
+            print(json_util.dumps(log, ensure_ascii=False))
+        return
+
+    if not MONGO_URI:
+        logger.error("MONGO_URI not found in .env")
+        raise SystemExit(1)
+    with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
+        client.admin.command('ping') # Verify connection
+        db = client[CHATBOT_DB]
+        if command == "restore":
+            restore_logs(db, args.start, args.end)
+        else:
+            days = getattr(args, "days", RETENTION_DAYS)
+            archive_logs(
+                db, retention_cutoff(days),
+                keep_open=not getattr(args, "include_open", False),
+                dry_run=getattr(args, "dry_run", False),
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import argparse
+import logging
+from datetime import datetime
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Run from the repository root: python -m backend.scripts.export_logs
+from ..db.log_export import EXPORT_BATCH_SIZE, resolve_columns, build_export_query, export_to_file
+
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env')))
+
+MONGO_URI = os.getenv("MONGO_URI")
+CHATBOT_DB = os.getenv("CHATBOT_DB", "chatbot_db")
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export chat logs to Parquet or an Arrow IPC stream for offline analysis.")
+    parser.add_argument("output", help="Output file path.")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--columns", help="Comma-separated columns (default: all log columns).")
+    parser.add_argument("--include-admin", action="store_true", help="Add the admin marking and answer columns.")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Start date/time (inclusive), ISO format.")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="End date/time (exclusive), ISO format.")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows per row group.")
+    args = parser.parse_args()
+
+    columns = resolve_columns(args.columns.split(",") if args.columns else None, args.include_admin)
+    if not MONGO_URI:
+        logger.error("MONGO_URI not found in .env")
+        raise SystemExit(1)
+    with MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000) as client:
+        client.admin.command('ping') # Verify connection
+        export_to_file(
+            client[CHATBOT_DB], args.output, columns,
+            build_export_query(args.start, args.end), args.format, args.batch_size
+        )
+    logger.info(f"Export written to {args.output}")
+
+if __name__ == "__main__":
+    main()
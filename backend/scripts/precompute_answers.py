@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, ASCENDING
+from dotenv import load_dotenv
+
+# Run from the repository root: python -m backend.scripts.precompute_answers
+from ..db.mongo_utils import connect_sync_facade, get_chatbot_db, get_legal_db, LOGS_COLLECTION
+from ..db.corpus_version import get_corpus_version
+from ..nlp.rag import load_llm_and_models, prepare_answer, generate_answer_from_chunks
+from ..nlp.warm_answers import WARM_ANSWERS_COLLECTION, warm_answer_id, query_key
+
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env')))
+
+MONGO_URI = os.getenv("MONGO_URI")
+TOP_N = int(os.getenv("WARM_TOP_N", "300"))  # questions per language
+LOOKBACK_DAYS = int(os.getenv("WARM_LOOKBACK_DAYS", "30"))
+MIN_COUNT = int(os.getenv("WARM_MIN_COUNT", "3"))
+LLM_CONCURRENCY = int(os.getenv("WARM_LLM_CONCURRENCY", "4"))
+WRITE_BATCH_SIZE = 200
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def mine_frequent_questions(chatbot_db, since: datetime, top_n: int = TOP_N, min_count: int = MIN_COUNT) -> list:
+    """
+    Most frequent questions per language since the given time, as dicts with
+    _id (warm answer id), query, language and count. Grouping is done in MongoDB on the
+    lowercased text, then merged on the full warm-store normalization.
+    """
+    groups = chatbot_db[LOGS_COLLECTION].aggregate([
+        {"$match": {"timestamp": {"$gte": since}}},
+        {"$group": {
+            "_id": {
+                "language": {"$ifNull": ["$language", "en"]},
+                "q": {"$toLower": {"$trim": {"input": {"$ifNull": ["$query_text", ""]}}}},
+            },
+            "count": {"$sum": 1},
+            "query": {"$first": "$query_text"},
+        }},
+        {"$match": {"_id.q": {"$ne": ""}, "count": {"$gte": min_count}}},
+        {"$group": {
+            "_id": "$_id.language",
+            "top": {"$topN": {"n": top_n * 2, "sortBy": {"count": -1}, "output": {"query": "$query", "count": "$count"}}},
+        }},
+    ], allowDiskUse=True)
+
+    questions = []
+    for group in groups:
+        language = group["_id"]
+        merged = {}
+        for item in group["top"]:
+            entry = merged.setdefault(warm_answer_id(item["query"], language), {
+                "query": item["query"].strip(), "language": language, "count": 0
+            })
+            entry["count"] += item["count"]
+        ranked = sorted(merged.items(), key=lambda kv: kv[1]["count"], reverse=True)[:top_n]
+        questions += [{"_id": answer_id, **entry} for answer_id, entry in ranked]
+    return questions
+
+def is_cacheable(answer: str) -> bool:
+    """Only real answers are kept warm; misses and error messages are left to request time."""
+    lowered = (answer or "").lower()
+    return bool(answer) and "couldn't find" not in lowered and not lowered.startswith(("an error occurred", "llm api key"))
+
+def generate_warm_answer(query: str, language: str):
+    """RAG answer for a frequent question, or None when an admin answer covers it (the chat serves those first)."""
+    prepared = prepare_answer(query, 5, language)
+    if "answer" in prepared:
+        return None
+    return generate_answer_from_chunks(query, prepared["chunks"])
+
+def precompute(questions: list, corpus_version: str, run_id: str, concurrency: int = LLM_CONCURRENCY, force: bool = False) -> dict:
+    """Generates answers with at most `concurrency` RAG/LLM calls in flight and loads them into the warm store."""
+    if not questions:
+        # Nothing mined (empty or unreadable logs): leave the store as it is rather than empty it.
+        logger.warning("No frequent questions mined; the warm answer store is left unchanged.")
+        return {"generated": 0, "reused": 0, "skipped": 0, "admin": 0, "failed": 0, "removed": 0}
+    store = get_chatbot_db()[WARM_ANSWERS_COLLECTION]
+    store.create_index([("query_key", ASCENDING)], name="query_key_warm")
+    current = set()
+    if not force:
+        current = {
+            doc["_id"] for doc in store.find(
+                {"_id": {"$in": [q["_id"] for q in questions]}, "corpus_version": corpus_version}, {"_id": 1}
+            )
+        }
+    stats = {"generated": 0, "reused": len(current), "skipped": 0, "admin": 0, "failed": 0}
+    ops = [
+        UpdateOne({"_id": q["_id"]}, {"$set": {"frequency": q["count"], "run_id": run_id}})
+        for q in questions if q["_id"] in current
+    ]
+
+    def keep_current(q):
+        # A failed regeneration (e.g. with --force) keeps the entry if it is still valid for this corpus.
+        ops.append(UpdateOne(
+            {"_id": q["_id"], "corpus_version": corpus_version},
+            {"$set": {"frequency": q["count"], "run_id": run_id}},
+        ))
+
+    def flush():
+        if ops:
+            store.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    pending = [q for q in questions if q["_id"] not in current]
+    logger.info(f"{len(pending)} answers to generate, {len(current)} still current (corpus {corpus_version}).")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(generate_warm_answer, q["query"], q["language"]): q for q in pending}
+        for future in as_completed(futures):
+            q = futures[future]
+            try:
+                answer = future.result()
+            except Exception as e:
+                logger.error(f"Failed to precompute an answer for '{q['query']}': {e}")
+                stats["failed"] += 1
+                keep_current(q)
+                continue
+            if answer is None:
+                stats["admin"] += 1
+                continue
+            if not is_cacheable(answer):
+                stats["skipped"] += 1
+                keep_current(q)
+                continue
+            ops.append(UpdateOne({"_id": q["_id"]}, {"$set": {
+                "query": q["query"],
+                "language": q["language"],
+                "query_key": query_key(q["query"]),
+                "answer": answer,
+                "frequency": q["count"],
+                "corpus_version": corpus_version,
+                "run_id": run_id,
+                "computed_at": datetime.utcnow(),
+            }, "$setOnInsert": {"hits": 0}}, upsert=True))
+            stats["generated"] += 1
+            if len(ops) >= WRITE_BATCH_SIZE:
+                flush()
+    flush()
+    # Entries that fell out of the top questions (or were built for an old corpus) are dropped.
+    stats["removed"] = store.delete_many({"run_id": {"$ne": run_id}}).deleted_count
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for the most frequent questions into the warm answer store (run nightly).")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Questions per language.")
+    parser.add_argument("--days", type=int, default=LOOKBACK_DAYS, help="How many days of logs to mine.")
+    parser.add_argument("--min-count", type=int, default=MIN_COUNT, help="Minimum times a question must have been asked.")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY, help="Concurrent RAG/LLM calls.")
+    parser.add_argument("--force", action="store_true", help="Regenerate answers that are still current.")
+    args = parser.parse_args()
+
+    if not MONGO_URI:
+        logger.error("MONGO_URI not found in .env")
+        raise SystemExit(1)
+    start_time = time.perf_counter()
+    connect_sync_facade(MONGO_URI)
+    load_llm_and_models()
+    corpus_version = get_corpus_version(get_legal_db())
+    questions = mine_frequent_questions(
+        get_chatbot_db(), datetime.now() - timedelta(days=args.days), args.top, args.min_count
+    )
+    logger.info(f"Mined {len(questions)} frequent questions from the last {args.days} days.")
+    stats = precompute(questions, corpus_version, uuid.uuid4().hex, args.concurrency, args.force)
+    logger.info(f"Warm answer store refreshed in {time.perf_counter() - start_time:.1f}s: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# Chat admission limits.
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "20"))  # sustained chats per user_id
+CHAT_RATE_BURST = float(os.getenv("CHAT_RATE_BURST", "5"))  # chats a user_id may send back to back
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "8"))  # concurrent RAG pipelines
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))  # requests allowed to wait for a slot
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "2.0"))  # seconds a request may wait for a slot
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "100000"))  # buckets kept in memory (LRU)
+CHAT_BATCH_LLM_CONCURRENCY = int(os.getenv("CHAT_BATCH_LLM_CONCURRENCY", "4"))  # LLM calls in flight across batches and summaries
+
+
+class RateLimiter:
+    '''
+    Per-key token buckets: each key refills at rate_per_minute up to burst tokens.
+    Buckets live in memory, least recently used first out once max_keys is reached;
+    an evicted key simply starts again with a full bucket.
+    '''
+
+    def __init__(self, rate_per_minute: float = CHAT_RATE_PER_MINUTE, burst: float = CHAT_RATE_BURST, max_keys: int = RATE_LIMIT_MAX_USERS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> float:
+        '''
+        Takes cost tokens from key's bucket. Returns 0 if allowed, else seconds until it would be.
+        A cost above the burst is allowed on a full bucket and leaves it in debt, so it is still
+        paid for in full before the key is allowed again.
+        '''
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        needed = min(cost, self.burst)
+        retry_after = 0.0
+        if tokens >= needed:
+            tokens -= cost
+        else:
+            retry_after = (needed - tokens) / self.rate if self.rate > 0 else float("inf")
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    '''
+    Admission for the chat pipeline: a per-user_id rate limit, then at most max_in_flight
+    requests running the pipeline at once. Up to max_queue requests wait (at most
+    queue_timeout seconds) for a slot; beyond that requests are shed immediately, so under
+    overload latency stays bounded instead of every request timing out.
+    Rejections are HTTP 429 (rate limit) or 503 (overloaded), both with Retry-After.
+    '''
+
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_in_flight: int = CHAT_MAX_IN_FLIGHT,
+        max_queue: int = CHAT_MAX_QUEUE,
+        queue_timeout: float = CHAT_QUEUE_TIMEOUT,
+    ):
+        # An empty RateLimiter is falsy (it defines __len__), so test for None explicitly.
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self.metrics: Dict[str, float] = {
+            "admitted": 0,
+            "queued": 0,
+            "rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+            "max_queue_wait_seconds": 0.0,
+        }
+
+    def stats(self) -> Dict[str, float]:
+        '''Snapshot of the admission counters plus current in-flight and queue depth.'''
+        return {
+            **self.metrics,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "tracked_users": len(self.rate_limiter),
+        }
+
+    def _reject(self, status_code: int, detail: str, retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def acquire(self, user_id: str, cost: float = 1.0) -> None:
+        '''
+        Admits one request for user_id or raises a 429/503 HTTPException. Pair with release().
+        cost is what the request takes from the user's rate limit (e.g. one per query in a batch).
+        '''
+        retry_after = self.rate_limiter.try_acquire(user_id, cost)
+        if retry_after > 0:
+            self.metrics["rate_limited"] += 1
+            raise self._reject(status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests. Please slow down.", retry_after)
+
+        if self._slots.locked():
+            if self._waiting >= self.max_queue:
+                self.metrics["shed_queue_full"] += 1
+                raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is busy. Please try again shortly.", self.queue_timeout)
+            self.metrics["queued"] += 1
+            self._waiting += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.metrics["shed_timeout"] += 1
+                raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is busy. Please try again shortly.", self.queue_timeout)
+            finally:
+                self._waiting -= 1
+                waited = time.monotonic() - started
+                self.metrics["max_queue_wait_seconds"] = max(self.metrics["max_queue_wait_seconds"], waited)
+        else:
+            await self._slots.acquire()
+        self._in_flight += 1
+        self.metrics["admitted"] += 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, cost: float = 1.0):
+        '''async with admission.admit(user_id): ... runs the body inside an admitted slot.'''
+        await self.acquire(user_id, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+chat_admission = AdmissionController()
+
+# LLM calls that run outside a request's own admission slot (batch generations, conversation
+# summaries) share these slots, so together they cannot flood the LLM API.
+shared_llm_slots = asyncio.Semaphore(CHAT_BATCH_LLM_CONCURRENCY)
@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, Iterable
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Stage latencies range from sub-millisecond (scoring, cache hits) to tens of seconds (LLM, TTS).
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "kamgar_stage_seconds",
+    "Time spent per pipeline stage.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_ERRORS = Counter("kamgar_llm_errors_total", "Failed LLM calls (answer generation and summaries).", ["call"])
+CHAT_IN_FLIGHT = Gauge("kamgar_chat_in_flight", "Chat requests being processed.", ["endpoint"])
+CHAT_ANSWERS = Counter("kamgar_chat_answers_total", "Chat answers by endpoint, status and source.", ["endpoint", "status", "source"])
+
+_stage_timers: Dict[str, Histogram] = {}
+
+
+def stage_timer(stage: str) -> Histogram:
+    '''
+    Histogram child for a stage; use as `with stage_timer("llm").time():` or as a decorator
+    `@stage_timer("embedding").time()`. Children are cached, so the hot path skips label lookup.
+    '''
+    timer = _stage_timers.get(stage)
+    if timer is None:
+        timer = _stage_timers[stage] = STAGE_SECONDS.labels(stage)
+    return timer
+
+
+class _ComponentStatsCollector:
+    '''
+    Exports the counters the components already keep (admission, log sink, caches, answer
+    tiers, conversation memory). They are read only when /metrics is scraped.
+    '''
+
+    def describe(self) -> Iterable:
+        return []
+
+    def collect(self) -> Iterable:
+        # Imported lazily: these modules import this one to record stage timings.
+        from backend.services.admission import chat_admission
+        from backend.db.mongo_utils import log_sink
+        from backend.nlp.embedding_cache import get_embedding_cache
+        from backend.nlp.similarity import query_embedding_cache
+        from backend.services.tts_service import audio_cache
+        from backend.nlp.admin_answers import admin_answer_tier
+        from backend.nlp.warm_answers import warm_answer_store
+        from backend.nlp.conversation_memory import conversation_memory
+
+        hits = CounterMetricFamily("kamgar_cache_hits", "Cache and answer-tier hits.", labels=["cache"])
+        misses = CounterMetricFamily("kamgar_cache_misses", "Cache and answer-tier misses.", labels=["cache"])
+        embedding_cache = get_embedding_cache()
+        for name, cache in (
+            ("embedding", embedding_cache),
+            ("query_embedding", query_embedding_cache),
+            ("tts_audio", audio_cache),
+            ("admin_answers", admin_answer_tier),
+            ("warm_answers", warm_answer_store),
+        ):
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+        gauges = ("in_flight", "queue_depth", "max_in_flight", "max_queue", "tracked_users", "max_queue_wait_seconds")
+        admission = chat_admission.stats()
+        for key, value in admission.items():
+            if key in gauges:
+                yield GaugeMetricFamily(f"kamgar_admission_{key}", f"Chat admission {key.replace('_', ' ')}.", value=value)
+            else:
+                yield CounterMetricFamily(f"kamgar_admission_{key}", f"Chat admission {key.replace('_', ' ')}.", value=value)
+
+        for key, value in log_sink.stats().items():
+            if key in ("queue_depth", "max_delay_seconds"):
+                yield GaugeMetricFamily(f"kamgar_log_sink_{key}", f"Chat log writer {key.replace('_', ' ')}.", value=value)
+            else:
+                yield CounterMetricFamily(f"kamgar_log_sink_{key}", f"Chat log writer {key.replace('_', ' ')}.", value=value)
+
+        for key, value in conversation_memory.stats().items():
+            if key == "sessions":
+                yield GaugeMetricFamily("kamgar_conversation_sessions", "Conversation sessions held in memory.", value=value)
+            else:
+                yield CounterMetricFamily(f"kamgar_conversation_{key}", f"Conversation memory {key.replace('_', ' ')}.", value=value)
+
+        yield GaugeMetricFamily("kamgar_tts_cache_bytes", "Bytes of synthesized audio cached.", value=audio_cache.total_bytes)
+
+
+REGISTRY.register(_ComponentStatsCollector())
+
+
+def render_metrics() -> tuple:
+    '''(body, content type) of the Prometheus text exposition for the default registry.'''
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
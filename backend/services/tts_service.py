@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from pymongo import ASCENDING
+from backend.db.mongo_utils import get_async_chatbot_db
+from backend.services.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))
+TTS_MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", "16"))  # syntheses queued or running; more are refused
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTS_VOICE = os.getenv("TTS_VOICE")  # optional pyttsx3 voice id; otherwise picked by language
+TTS_MAX_HANDLES = int(os.getenv("TTS_MAX_HANDLES", "4096"))  # handles remembered in this process
+TTS_HANDLES_COLLECTION = os.getenv("TTS_HANDLES_COLLECTION", "tts_handles")  # handles shared by all workers
+TTS_HANDLE_TTL = int(os.getenv("TTS_HANDLE_TTL", "86400"))  # seconds a handle stays resolvable after it was issued
+
+CacheKey = Tuple[str, str, str]
+
+
+class TTSBusyError(Exception):
+    '''Raised instead of queueing a synthesis when TTS_MAX_PENDING jobs are already pending.'''
+
+
+def _select_voice(engine, lang: str, voice: Optional[str]) -> None:
+    '''Applies an explicit voice id, or the first installed voice matching the language.'''
+    if voice:
+        engine.setProperty('voice', voice)
+        return
+    lang_code, lang_name = ('hi', 'Hindi') if lang == 'hi' else ('en', 'English')
+    for v in engine.getProperty('voices'):
+        languages = [l.decode() if isinstance(l, bytes) else str(l) for l in (v.languages or [])]
+        if any(lang_code in l for l in languages) or lang_name in (v.name or ''):
+            engine.setProperty('voice', v.id)
+            return
+
+
+def _synthesize_in_worker(text: str, lang: str, voice: Optional[str]) -> bytes:
+    '''
+    Runs inside a pool process. pyttsx3 can only write to a file, so each call
+    gets its own unique temp file, which is read back and removed.
+    '''
+    import pyttsx3
+
+    fd, path = tempfile.mkstemp(prefix="tts_", suffix=".mp3")
+    os.close(fd)
+    try:
+        engine = pyttsx3.init()
+        _select_voice(engine, lang, voice)
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class AudioCache:
+    '''Size-bounded LRU store of synthesized audio keyed by (text hash, language, voice).'''
+
+    def __init__(self, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            audio = self._items.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def __contains__(self, key: CacheKey) -> bool:
+        '''Membership test that neither counts as a hit/miss nor refreshes the entry.'''
+        with self._lock:
+            return key in self._items
+
+    def put(self, key: CacheKey, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._items[key] = audio
+            self.total_bytes += len(audio)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+def cache_key(text: str, lang: str, voice: Optional[str] = None) -> CacheKey:
+    '''Cache key for an utterance: (SHA-256 of the text, language, voice).'''
+    return hashlib.sha256(text.encode('utf-8')).hexdigest(), lang, voice or TTS_VOICE or "auto"
+
+
+def audio_id_for(text: str, lang: str, voice: Optional[str] = None) -> str:
+    '''Content-addressed handle for an utterance, safe to use in URLs and as an ETag.'''
+    return hashlib.sha256("\x1f".join(cache_key(text, lang, voice)).encode('utf-8')).hexdigest()
+
+
+def sniff_media_type(audio: bytes) -> str:
+    '''Media type of synthesized audio (pyttsx3 drivers emit WAV regardless of file suffix).'''
+    if audio[:4] == b'RIFF':
+        return 'audio/wav'
+    if audio[:3] == b'ID3' or audio[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'audio/mpeg'
+    if audio[:4] == b'OggS':
+        return 'audio/ogg'
+    return 'application/octet-stream'
+
+
+audio_cache = AudioCache()
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_in_flight: Dict[CacheKey, "asyncio.Future[Optional[bytes]]"] = {}
+# audio id -> (text, lang, voice) for handles given out to clients, bounded LRU. Handles are
+# also stored in TTS_HANDLES_COLLECTION, so a GET routed to another worker can resolve them.
+_handles: "OrderedDict[str, Tuple[str, str, Optional[str]]]" = OrderedDict()
+_background_tasks = set()
+
+
+def start_tts_pool() -> None:
+    '''
+    Starts the TTS worker processes. Call on application startup: workers are spawned (not
+    forked), so they don't inherit the event loop, Mongo clients or the loaded models.
+    '''
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=TTS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    if _pool is None:
+        start_tts_pool()
+    return _pool
+
+
+async def ensure_handle_index() -> None:
+    '''TTL index that expires stored audio handles. Call on application startup.'''
+    await get_async_chatbot_db()[TTS_HANDLES_COLLECTION].create_index(
+        [("issued_at", ASCENDING)], expireAfterSeconds=TTS_HANDLE_TTL, name="issued_at_ttl"
+    )
+
+
+def _remember_handle(audio_id: str, request: Tuple[str, str, Optional[str]]) -> None:
+    _handles[audio_id] = request
+    _handles.move_to_end(audio_id)
+    while len(_handles) > TTS_MAX_HANDLES:
+        _handles.popitem(last=False)
+
+
+def tts_busy() -> bool:
+    '''True when a new synthesis would be refused with TTSBusyError.'''
+    return _pending >= TTS_MAX_PENDING
+
+
+async def synthesize(text: str, lang: str, voice: Optional[str] = None) -> Optional[bytes]:
+    '''
+    Returns the audio for text, from the cache when possible. Otherwise it is synthesized
+    off the event loop in the TTS process pool. Concurrent requests for the same utterance
+    share one synthesis. Raises TTSBusyError when TTS_MAX_PENDING jobs are already pending;
+    returns None if synthesis fails.
+    '''
+    global _pending
+    if not text:
+        return None
+    key = cache_key(text, lang, voice)
+    in_flight = _in_flight.get(key)
+    if in_flight is not None:
+        return await asyncio.shield(in_flight)
+
+    audio = audio_cache.get(key)
+    if audio is not None:
+        return audio
+
+    if tts_busy():
+        raise TTSBusyError(f"{_pending} TTS jobs pending")
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _in_flight[key] = future
+    _pending += 1
+    audio = None
+    try:
+        with stage_timer("tts_synthesis").time():
+            audio = await loop.run_in_executor(_get_pool(), _synthesize_in_worker, text, lang, voice or TTS_VOICE)
+        audio_cache.put(key, audio)
+    except Exception as e:
+        logger.error(f"Failed to generate TTS audio: {e}", exc_info=True)
+    finally:
+        _pending -= 1
+        _in_flight.pop(key, None)
+        future.set_result(audio)
+    return audio
+
+
+async def schedule_synthesis(text: str, lang: str, voice: Optional[str] = None) -> Optional[str]:
+    '''
+    Registers an audio handle for text (in this process and in Mongo) and starts synthesizing
+    it in the background. Returns the handle (None for empty text) without waiting for the
+    audio; fetch it with get_audio(), from any worker.
+    '''
+    if not text:
+        return None
+    audio_id = audio_id_for(text, lang, voice)
+    _remember_handle(audio_id, (text, lang, voice))
+    try:
+        await get_async_chatbot_db()[TTS_HANDLES_COLLECTION].update_one(
+            {"_id": audio_id},
+            {
+                "$setOnInsert": {"text": text, "lang": lang, "voice": voice},
+                "$set": {"issued_at": datetime.now(timezone.utc)},
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        # Still resolvable by this worker.
+        logger.warning(f"Could not store audio handle {audio_id}: {e}")
+
+    key = cache_key(text, lang, voice)
+    if key not in audio_cache and key not in _in_flight and not tts_busy():
+        # When busy the audio is synthesized on the first GET instead (or that GET gets a 503).
+        task = asyncio.get_running_loop().create_task(synthesize(text, lang, voice))
+        # Keep a reference so the task isn't garbage collected before it finishes.
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return audio_id
+
+
+async def get_audio(audio_id: str) -> Optional[bytes]:
+    '''
+    Audio for a handle from schedule_synthesis(): served from the cache, awaits the
+    in-flight synthesis, or synthesizes it (evicted, or the handle was issued by another
+    worker). None for unknown handles; TTSBusyError if it has to be synthesized while the
+    pool is saturated.
+    '''
+    request = await _resolve_handle(audio_id)
+    if request is None:
+        return None
+    return await synthesize(*request)
+
+
+async def audio_exists(audio_id: str) -> bool:
+    '''Whether a handle was issued by schedule_synthesis() (on any worker), without synthesizing it.'''
+    return await _resolve_handle(audio_id) is not None
+
+
+async def _resolve_handle(audio_id: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    request = _handles.get(audio_id)
+    if request is None:
+        doc = await get_async_chatbot_db()[TTS_HANDLES_COLLECTION].find_one({"_id": audio_id})
+        if doc is None:
+            return None
+        request = (doc["text"], doc["lang"], doc.get("voice"))
+        _remember_handle(audio_id, request)
+    return request
+
+
+def shutdown_tts_pool() -> None:
+    '''Stops the TTS worker processes. Call on application shutdown.'''
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
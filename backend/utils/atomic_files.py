@@ -0,0 +1,13 @@
+import json
+import os
+
+
+def write_json_atomic(path, data):
+    """
+    Writes data as JSON to path through a temporary file and a rename, so an interrupted
+    run leaves either the previous file or the new one, never a half-written one.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -1,12 +1,19 @@
 import os
+import hashlib
+import queue
+import threading
+import uuid
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from bson import json_util
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
 from tqdm import tqdm
 
+# Run from the repository root: python -m backend_app.indexing
+from backend.nlp.embedding_cache import get_embedding_cache
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -16,6 +23,23 @@ DB_NAME = "legal_db"
 VECTOR_COLLECTION_NAME = "legal_vectors"
 LINKS_COLLECTION_NAME = "links"
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = int(os.getenv("INDEX_EMBED_BATCH_SIZE", "256"))
+QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", "4"))
+CURSOR_BATCH_SIZE = 500
+CHECKPOINT_PATH = os.getenv(
+    "INDEX_CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".indexing_checkpoint.json"),
+)
+
+# Sentinel marking the end of a stage's stream.
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception raised inside a pipeline thread back to the consumer."""
+    def __init__(self, error: Exception):
+        self.error = error
+
 
 def get_links_map(db_client):
     """Fetches all links and maps them by their source collection name."""
@@ -27,19 +51,226 @@ def get_links_map(db_client):
         collection_name = link_doc.get("collection")
         link_url = link_doc.get("reference_link")
         # --- END MODIFICATION ---
-        
+
         if collection_name and link_url:
             links_map[collection_name] = link_url
     print(f"🔗 Loaded {len(links_map)} links. Verifying a sample: {list(links_map.items())[:2]}")
     return links_map
 
-def load_and_chunk_documents(db_client, text_splitter, links_map):
+
+def compute_chunk_id(coll_name: str, original_id: str, text: str, model_name: str = EMBEDDING_MODEL_NAME) -> str:
     """
-    Loads documents from all collections, cleans content, adds source links,
-    and splits them into chunks.
+    Stable id for a chunk: derived from (collection, original_id, chunk hash, embedding model).
+    Unchanged chunks keep their id across runs, so they never need to be re-embedded.
     """
-    db = db_client[DB_NAME]
-    all_chunks = []
+    chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    key = "\x1f".join([coll_name, original_id, chunk_hash, model_name])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def to_vector_doc(chunk_id: str, chunk: Document, embedding, run_id: str) -> dict:
+    """Builds a legal_vectors document in the same layout MongoDBAtlasVectorSearch writes."""
+    return {
+        "_id": chunk_id,
+        "text": chunk.page_content,
+        "embedding": list(embedding),
+        "index_run": run_id,
+        **chunk.metadata,
+    }
+
+
+# --- Checkpointing ---
+
+def load_checkpoint(path: str = CHECKPOINT_PATH):
+    """Returns the checkpoint of an interrupted run, or None if there is nothing to resume."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json_util.loads(f.read())
+    if checkpoint.get("model") != EMBEDDING_MODEL_NAME:
+        print("⚠️ Checkpoint was written for a different embedding model. Starting a fresh run.")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: dict, path: str = CHECKPOINT_PATH):
+    """Atomically writes the checkpoint (json_util keeps ObjectId cursors resumable)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+# --- Pipeline stages ---
+
+def clean_document_text(doc) -> str:
+    """Combines the English and Hindi content of a source document into one text."""
+    content_en = doc.get("content_en", "")
+    content_hi = doc.get("content_hi", "")
+
+    if not isinstance(content_en, str): content_en = ""
+    if not isinstance(content_hi, str): content_hi = ""
+
+    combined_text = []
+    if content_en.strip():
+        combined_text.append(f"English Content:\n{content_en.strip()}")
+    if content_hi.strip():
+        combined_text.append(f"Hindi Content:\n{content_hi.strip()}")
+
+    return "\n\n---\n\n".join(combined_text)
+
+
+def iter_source_documents(db, collections, checkpoint):
+    """
+    Streams (collection, _id, text) for every source document, in _id order so a run can
+    resume from the checkpoint. Emits (collection, None, None) once a collection is exhausted.
+    """
+    for coll_name in collections:
+        if coll_name in checkpoint["completed"]:
+            continue
+        query = {}
+        if checkpoint.get("collection") == coll_name and checkpoint.get("last_id") is not None:
+            query = {"_id": {"$gt": checkpoint["last_id"]}}
+        cursor = (
+            db[coll_name]
+            .find(query, {"content_en": 1, "content_hi": 1})
+            .sort("_id", 1)
+            .batch_size(CURSOR_BATCH_SIZE)
+        )
+        for doc in cursor:
+            yield coll_name, doc["_id"], clean_document_text(doc)
+        yield coll_name, None, None
+
+
+def iter_chunk_batches(documents, text_splitter, links_map, batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Splits streamed documents into chunks and groups them into batches of roughly batch_size.
+    Batches never span documents or collections, so each one carries a valid resume point.
+    """
+    batch = {"collection": None, "last_id": None, "chunks": [], "collection_done": False}
+    for coll_name, doc_id, text in documents:
+        if batch["collection"] not in (None, coll_name):
+            yield batch
+            batch = {"collection": None, "last_id": None, "chunks": [], "collection_done": False}
+        batch["collection"] = coll_name
+
+        if doc_id is None:
+            batch["collection_done"] = True
+            yield batch
+            batch = {"collection": None, "last_id": None, "chunks": [], "collection_done": False}
+            continue
+
+        batch["last_id"] = doc_id
+        if text:
+            metadata = {
+                "source_collection": coll_name,
+                "original_id": str(doc_id),
+                "source_link": links_map.get(coll_name)
+            }
+            batch["chunks"].extend(text_splitter.split_documents([Document(page_content=text, metadata=metadata)]))
+
+        if len(batch["chunks"]) >= batch_size:
+            yield batch
+            batch = {"collection": None, "last_id": None, "chunks": [], "collection_done": False}
+
+    if batch["collection"] is not None:
+        yield batch
+
+
+def embed_batch(batch, vector_collection, embeddings, run_id: str):
+    """
+    Assigns stable ids to a batch of chunks and embeds only those not already in the
+    vector collection, going through the shared embedding cache.
+    Returns the batch with 'new_docs' and 'unchanged_ids' filled in.
+    """
+    ids = []
+    for chunk in batch["chunks"]:
+        chunk_id = compute_chunk_id(
+            chunk.metadata["source_collection"], chunk.metadata["original_id"], chunk.page_content
+        )
+        chunk.metadata["chunk_id"] = chunk_id
+        ids.append(chunk_id)
+
+    existing = set()
+    if ids:
+        existing = {doc["_id"] for doc in vector_collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+
+    pending = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, batch["chunks"]) if chunk_id not in existing]
+    vectors = []
+    if pending:
+        vectors = get_embedding_cache().encode(
+            EMBEDDING_MODEL_NAME, [chunk.page_content for _, chunk in pending], embeddings.embed_documents
+        )
+
+    batch["new_docs"] = [to_vector_doc(chunk_id, chunk, vector, run_id) for (chunk_id, chunk), vector in zip(pending, vectors)]
+    batch["unchanged_ids"] = list(existing)
+    batch["chunks"] = None  # release the raw chunks before the batch waits in the write queue
+    return batch
+
+
+def iter_in_thread(iterable, maxsize: int = QUEUE_SIZE):
+    """Runs a producer in a background thread behind a bounded queue, e.g. to overlap DB reads with encoding."""
+    items = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as e:
+            items.put(_StageError(e))
+        finally:
+            items.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def drain_in_thread(iterable, handle, maxsize: int = QUEUE_SIZE):
+    """Feeds items to handle() in a background thread behind a bounded queue, e.g. to overlap encoding with writes."""
+    items = queue.Queue(maxsize=maxsize)
+    errors = []
+
+    def consume():
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if errors:
+                continue
+            try:
+                handle(item)
+            except Exception as e:
+                errors.append(e)
+
+    worker = threading.Thread(target=consume, daemon=True)
+    worker.start()
+    try:
+        for item in iterable:
+            if errors:
+                break
+            items.put(item)
+    finally:
+        items.put(_DONE)
+        worker.join()
+    if errors:
+        raise errors[0]
+
+
+def run_pipeline(client, text_splitter, links_map, embeddings, checkpoint):
+    """
+    cursor -> clean -> split -> batch embed -> bulk write, with bounded queues between
+    the stages. Memory stays proportional to QUEUE_SIZE * EMBED_BATCH_SIZE, not to the corpus.
+    """
+    db = client[DB_NAME]
+    vector_collection = db[VECTOR_COLLECTION_NAME]
+    run_id = checkpoint["run_id"]
+    stats = {"upserted": 0, "unchanged": 0}
 
     collections_to_process = [
         name for name in db.list_collection_names()
@@ -47,41 +278,69 @@ def load_and_chunk_documents(db_client, text_splitter, links_map):
     ]
     print(f"Discovered {len(collections_to_process)} content collections to process.")
 
-    for coll_name in tqdm(collections_to_process, desc="Processing Collections"):
-        collection = db[coll_name]
-        
-        for doc in collection.find():
-            content_en = doc.get("content_en", "")
-            content_hi = doc.get("content_hi", "")
-
-            if not isinstance(content_en, str): content_en = ""
-            if not isinstance(content_hi, str): content_hi = ""
-
-            combined_text = []
-            if content_en.strip():
-                combined_text.append(f"English Content:\n{content_en.strip()}")
-            if content_hi.strip():
-                combined_text.append(f"Hindi Content:\n{content_hi.strip()}")
-            
-            final_text = "\n\n---\n\n".join(combined_text)
-
-            if final_text:
-                metadata = {
-                    "source_collection": coll_name,
-                    "original_id": str(doc.get("_id", "")),
-                    "source_link": links_map.get(coll_name)
-                }
-                
-                langchain_doc = Document(page_content=final_text, metadata=metadata)
-                chunks = text_splitter.split_documents([langchain_doc])
-                all_chunks.extend(chunks)
-
-    return all_chunks
+    documents = iter_in_thread(iter_source_documents(db, collections_to_process, checkpoint))
+    batches = iter_chunk_batches(documents, text_splitter, links_map)
+    embedded = (embed_batch(batch, vector_collection, embeddings, run_id) for batch in batches)
+    progress = tqdm(desc="Indexed Chunks", unit="chunk")
+
+    def write_batch(batch):
+        if batch["new_docs"]:
+            ops = [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in batch["new_docs"]]
+            vector_collection.bulk_write(ops, ordered=False)
+        if batch["unchanged_ids"]:
+            # Unchanged chunks are only re-stamped with this run's id, so they survive the stale sweep.
+            vector_collection.update_many({"_id": {"$in": batch["unchanged_ids"]}}, {"$set": {"index_run": run_id}})
+        stats["upserted"] += len(batch["new_docs"])
+        stats["unchanged"] += len(batch["unchanged_ids"])
+        # Per-collection chunk counts live in the checkpoint, so a resumed run still knows
+        # which collections were indexed before the interruption.
+        indexed = checkpoint.setdefault("indexed", {})
+        indexed[batch["collection"]] = indexed.get(batch["collection"], 0) + len(batch["new_docs"]) + len(batch["unchanged_ids"])
+        progress.update(len(batch["new_docs"]) + len(batch["unchanged_ids"]))
+
+        if batch["collection_done"]:
+            checkpoint["completed"].append(batch["collection"])
+            checkpoint["collection"], checkpoint["last_id"] = None, None
+        elif batch["last_id"] is not None:
+            checkpoint["collection"], checkpoint["last_id"] = batch["collection"], batch["last_id"]
+        save_checkpoint(checkpoint)
+
+    try:
+        drain_in_thread(embedded, write_batch)
+    finally:
+        progress.close()
+
+    return stats["upserted"], stats["unchanged"], sweep_stale_chunks(vector_collection, collections_to_process, checkpoint)
+
+
+def sweep_stale_chunks(vector_collection, collections, checkpoint) -> int:
+    """
+    Removes chunks not re-stamped by this run. Only called after the pipeline finished
+    cleanly, so searches never see an empty or half-built index. The sweep is per source
+    collection and skips collections that yielded no chunks this run (empty or unreadable
+    source): their existing chunks are kept rather than wiped.
+    """
+    run_id = checkpoint["run_id"]
+    indexed = checkpoint.get("indexed", {})
+    deleted = 0
+    for coll_name in collections:
+        if not indexed.get(coll_name):
+            print(f"⚠️ No documents found in '{coll_name}'; keeping its existing chunks.")
+            continue
+        deleted += vector_collection.delete_many(
+            {"source_collection": coll_name, "index_run": {"$ne": run_id}}
+        ).deleted_count
+    if sum(indexed.values()) > 0:
+        # Chunks of source collections that no longer exist.
+        deleted += vector_collection.delete_many(
+            {"source_collection": {"$nin": collections}, "index_run": {"$ne": run_id}}
+        ).deleted_count
+    return deleted
 
 
 def main():
-    """Main function to run the indexing process."""
-    print("--- Starting the indexing process with correct link schema ---")
+    """Main function to run the streaming, incremental indexing process."""
+    print("--- Starting the incremental indexing process ---")
 
     try:
         client = MongoClient(MONGO_URI)
@@ -92,38 +351,38 @@ def main():
         return
 
     links_map = get_links_map(client)
-    
+
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
 
-    print("📚 Loading and chunking documents...")
-    all_document_chunks = load_and_chunk_documents(client, text_splitter, links_map)
-    if not all_document_chunks:
-        print("⚠️ No documents found to index. Exiting.")
-        return
-    print(f"✅ Created {len(all_document_chunks)} document chunks.")
+    checkpoint = load_checkpoint()
+    if checkpoint:
+        print(f"⏯️ Resuming run {checkpoint['run_id']} ({len(checkpoint['completed'])} collections already done).")
+    else:
+        checkpoint = {
+            "run_id": uuid.uuid4().hex,
+            "model": EMBEDDING_MODEL_NAME,
+            "completed": [],
+            "collection": None,
+            "last_id": None,
+        }
 
     print("🧠 Initializing embedding model...")
     embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
     print("✅ Embedding model loaded.")
 
-    db = client[DB_NAME]
-    vector_collection = db[VECTOR_COLLECTION_NAME]
+    print(f"🚀 Streaming chunks into '{VECTOR_COLLECTION_NAME}' (batch size {EMBED_BATCH_SIZE})...")
+    try:
+        upserted, unchanged, deleted = run_pipeline(client, text_splitter, links_map, embeddings, checkpoint)
+    except Exception as e:
+        print(f"❌ Indexing interrupted: {e}. Re-run the script to resume from the last checkpoint.")
+        client.close()
+        return
 
-    print(f"🗑️ Deleting all existing documents from '{VECTOR_COLLECTION_NAME}'...")
-    delete_result = vector_collection.delete_many({})
-    print(f"✅ Deleted {delete_result.deleted_count} documents.")
-
-    print(f"🚀 Adding {len(all_document_chunks)} chunks to Atlas Vector Search...")
-    MongoDBAtlasVectorSearch.from_documents(
-        documents=all_document_chunks,
-        embedding=embeddings,
-        collection=vector_collection,
-        index_name="vector_index",
-    )
-    print("✅ All documents have been successfully indexed with correct links.")
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+    print(f"✅ Upserted {upserted} chunks, kept {unchanged} unchanged, deleted {deleted} stale chunks.")
     print("--- Indexing process complete! ---")
     client.close()
 
 if __name__ == "__main__":
     main()
-
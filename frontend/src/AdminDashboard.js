@@ -3,6 +3,9 @@ import React, { useEffect, useState } from 'react';
 const AdminDashboard = () => {
   const [unansweredLogs, setUnansweredLogs] = useState([]);
   const [allLogs, setAllLogs] = useState([]);
+  // Cursors for the next page of each list (the API pages logs, newest first); null on the last page.
+  const [unansweredCursor, setUnansweredCursor] = useState(null);
+  const [allCursor, setAllCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -11,6 +14,27 @@ const AdminDashboard = () => {
 
   // If no token, show error and do not fetch
   const isAuthenticated = !!adminToken;
+  const backendApiUrl = process.env.REACT_APP_BACKEND_API_URL || 'http://127.0.0.1:8000';
+
+  const fetchLogPage = async (path, cursor) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const res = await fetch(`${backendApiUrl}/admin_api/${path}${query}`, {
+      headers: { Authorization: `Bearer ${adminToken}` }
+    });
+    if (res.status === 401) throw new Error('Unauthorized. Please log in as admin.');
+    if (!res.ok) throw new Error('Failed to fetch logs');
+    return { items: await res.json(), next: res.headers.get('X-Next-Cursor') };
+  };
+
+  const loadMore = async (path, cursor, setLogs, setCursor) => {
+    try {
+      const page = await fetchLogPage(path, cursor);
+      setLogs(logs => [...logs, ...page.items]);
+      setCursor(page.next);
+    } catch (err) {
+      setError(err.message);
+    }
+  };
 
   useEffect(() => {
     if (!isAuthenticated) {
@@ -22,19 +46,14 @@ const AdminDashboard = () => {
       setLoading(true);
       setError(null);
       try {
-        const backendApiUrl = process.env.REACT_APP_BACKEND_API_URL || 'http://127.0.0.1:8000';
-        const unansweredRes = await fetch(`${backendApiUrl}/admin_api/unanswered_logs`, {
-          headers: { Authorization: `Bearer ${adminToken}` }
-        });
-        const allRes = await fetch(`${backendApiUrl}/admin_api/all_logs`, {
-          headers: { Authorization: `Bearer ${adminToken}` }
-        });
-        if (unansweredRes.status === 401 || allRes.status === 401) {
-          throw new Error('Unauthorized. Please log in as admin.');
-        }
-        if (!unansweredRes.ok || !allRes.ok) throw new Error('Failed to fetch logs');
-        setUnansweredLogs(await unansweredRes.json());
-        setAllLogs(await allRes.json());
+        const [unanswered, all] = await Promise.all([
+          fetchLogPage('unanswered_logs'),
+          fetchLogPage('all_logs')
+        ]);
+        setUnansweredLogs(unanswered.items);
+        setUnansweredCursor(unanswered.next);
+        setAllLogs(all.items);
+        setAllCursor(all.next);
       } catch (err) {
         setError(err.message);
       } finally {
@@ -42,6 +61,7 @@ const AdminDashboard = () => {
       }
     };
     fetchLogs();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [adminToken, isAuthenticated]);
 
   return (
@@ -63,6 +83,11 @@ const AdminDashboard = () => {
                   ))}
                 </ul>
               )}
+              {unansweredCursor && (
+                <button className="mt-2 text-blue-600" onClick={() => loadMore('unanswered_logs', unansweredCursor, setUnansweredLogs, setUnansweredCursor)}>
+                  Load more
+                </button>
+              )}
             </div>
           </section>
           <section>
@@ -81,6 +106,11 @@ const AdminDashboard = () => {
                   ))}
                 </ul>
               )}
+              {allCursor && (
+                <button className="mt-2 text-blue-600" onClick={() => loadMore('all_logs', allCursor, setAllLogs, setAllCursor)}>
+                  Load more
+                </button>
+              )}
             </div>
           </section>
         </>
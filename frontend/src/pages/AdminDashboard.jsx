@@ -6,6 +6,9 @@ const API_BASE = "http://localhost:8000/admin_api"; // Change if needed
 const AdminDashboard = () => {
   const [unanswered, setUnanswered] = useState([]);
   const [logs, setLogs] = useState([]);
+  // Cursors for the next page of each list (the API pages logs, newest first); null on the last page.
+  const [unansweredCursor, setUnansweredCursor] = useState(null);
+  const [logsCursor, setLogsCursor] = useState(null);
   const [activeRow, setActiveRow] = useState(null);
   const [chooseAction, setChooseAction] = useState(""); // "mark" or "answer"
   const [markStatus, setMarkStatus] = useState("");
@@ -17,21 +20,49 @@ const AdminDashboard = () => {
   // Fetch unanswered queries and logs
   const [markedQueries, setMarkedQueries] = useState([]);
 
+  // One page of a log listing and the cursor of the next one
+  const fetchLogPage = async (path, cursor) => {
+    const res = await axios.get(`${API_BASE}/${path}`, {
+      headers: { Authorization: `Bearer ${getToken()}` },
+      params: cursor ? { cursor } : {},
+    });
+    return { items: res.data, next: res.headers['x-next-cursor'] || null };
+  };
+
+  // Only show queries with status 'unanswered'
+  const onlyUnanswered = (items) => items.filter(q => (q.status === 'unanswered' || !q.status));
+
+  const loadMoreUnanswered = async () => {
+    try {
+      const page = await fetchLogPage('unanswered_queries', unansweredCursor);
+      setUnanswered(prev => [...prev, ...onlyUnanswered(page.items)]);
+      setUnansweredCursor(page.next);
+    } catch (err) {
+      console.error("Error fetching data", err);
+    }
+  };
+
+  const loadMoreLogs = async () => {
+    try {
+      const page = await fetchLogPage('logs', logsCursor);
+      setLogs(prev => [...prev, ...page.items]);
+      setLogsCursor(page.next);
+    } catch (err) {
+      console.error("Error fetching data", err);
+    }
+  };
+
   useEffect(() => {
     const fetchData = async () => {
       try {
         const token = getToken();
-        const unansweredRes = await axios.get(`${API_BASE}/unanswered_queries`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-  // Only show queries with status 'unanswered'
-  const filtered = unansweredRes.data.filter(q => (q.status === 'unanswered' || !q.status));
-  setUnanswered(filtered);
+        const unansweredPage = await fetchLogPage('unanswered_queries');
+        setUnanswered(onlyUnanswered(unansweredPage.items));
+        setUnansweredCursor(unansweredPage.next);
 
-        const logsRes = await axios.get(`${API_BASE}/logs`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setLogs(logsRes.data);
+        const logsPage = await fetchLogPage('logs');
+        setLogs(logsPage.items);
+        setLogsCursor(logsPage.next);
 
         // Fetch marked queries from admin_marking
         const markedRes = await axios.get(`${API_BASE}/marked_queries`, {
@@ -181,6 +212,7 @@ const AdminDashboard = () => {
             </table>
           )}
         </div>
+        {unansweredCursor && <button onClick={loadMoreUnanswered}>Load more</button>}
       </div>
       <div style={{ flex: 1 }}>
         <h2>Chatbot Logs</h2>
@@ -214,6 +246,7 @@ const AdminDashboard = () => {
             </table>
           )}
         </div>
+        {logsCursor && <button onClick={loadMoreLogs}>Load more</button>}
       </div>
     </div>
   );
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+# Tests that need MongoDB run against MONGO_TEST_URI (a local mongod by default), or against
+# an in-memory stand-in when it is not reachable. Tests marked `mongod` use server features the
+# stand-in lacks and are skipped without a server.
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017")
+
+
+def run(coro):
+    '''Runs a coroutine on a fresh event loop (keeps the suite free of async test plugins).'''
+    return asyncio.run(coro)
+
+
+class _RenamingClient:
+    '''Maps the database names mongo_utils uses to per-test names on a real client.'''
+
+    def __init__(self, client, names):
+        self._client = client
+        self._names = names
+
+    def __getitem__(self, name):
+        return self._client[self._names.get(name, name)]
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+@asynccontextmanager
+async def _connected(uri):
+    from pymongo import AsyncMongoClient, MongoClient
+    from backend.db import mongo_utils
+
+    if uri is None:
+        from tests import inmemory_mongo
+        async_client, sync_client = inmemory_mongo.clients()
+        names = {}
+    else:
+        suffix = uuid.uuid4().hex[:8]
+        names = {name: f"test_{name}_{suffix}" for name in ("legal_db", "chatbot_db", "admin_db", "links_db")}
+        async_client = _RenamingClient(AsyncMongoClient(uri), names)
+        sync_client = _RenamingClient(MongoClient(uri), names)
+    # Clients are injected through connect_to_mongo's hooks, created inside the test's loop.
+    await mongo_utils.connect_to_mongo(uri, async_client, sync_client)
+    try:
+        yield mongo_utils
+    finally:
+        await mongo_utils.close_mongo_connection()
+        if names:
+            admin_client = MongoClient(uri)
+            for name in names.values():
+                admin_client.drop_database(name)
+            admin_client.close()
+        mongo_utils.chatbot_db = mongo_utils.admin_db = mongo_utils.legal_db = mongo_utils.links_db = None
+        mongo_utils.sync_chatbot_db = mongo_utils.sync_admin_db = None
+        mongo_utils.sync_legal_db = mongo_utils.sync_links_db = None
+
+
+@pytest.fixture(scope="session")
+def mongo_server():
+    '''Whether a MongoDB server answers at MONGO_TEST_URI (checked once per run).'''
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception:
+        return False
+    finally:
+        client.close()
+
+
+@pytest.fixture
+def sync_mongo_client(mongo_server):
+    '''A sync client on MONGO_TEST_URI, or on a fresh in-memory stand-in.'''
+    if mongo_server:
+        from pymongo import MongoClient
+        client = MongoClient(MONGO_TEST_URI)
+    else:
+        pytest.importorskip("mongomock")
+        from tests import inmemory_mongo
+        _, client = inmemory_mongo.clients()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mongo(request, mongo_server, monkeypatch):
+    '''
+    Factory for `async with mongo() as mongo_utils:` - backend.db.mongo_utils connected (async
+    handles and sync facade) to throwaway databases on MONGO_TEST_URI, dropped afterwards, or to
+    a fresh in-memory stand-in when no server is reachable.
+    '''
+    if mongo_server:
+        return lambda: _connected(MONGO_TEST_URI)
+    if request.node.get_closest_marker("mongod"):
+        pytest.skip(f"Needs a MongoDB server at {MONGO_TEST_URI}")
+    mongomock = pytest.importorskip("mongomock")
+    from tests import inmemory_mongo
+    monkeypatch.setattr(mongomock.Collection, "bulk_write", inmemory_mongo.bulk_write)
+    monkeypatch.setattr(mongomock.Collection, "insert_many", inmemory_mongo.insert_many)
+    return lambda: _connected(None)
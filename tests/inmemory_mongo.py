@@ -0,0 +1,148 @@
+'''
+In-memory stand-in for MongoDB: mongomock behind the small slice of PyMongo's async API the
+backend uses. Sync and async clients built from the same store see the same data, like the
+two clients connect_to_mongo opens against one server.
+'''
+import mongomock
+from mongomock.store import ServerStore
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, InsertManyResult
+
+
+def bulk_write(collection, requests, ordered=True, **kwargs):
+    '''
+    Collection.bulk_write for mongomock, which can't build the operations of current PyMongo
+    releases. Runs each operation on its own and reports like the server: a BulkWriteError
+    with writeErrors/nInserted, stopping at the first error only when ordered.
+    '''
+    counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0}
+    upserted, errors = [], []
+    for index, op in enumerate(requests):
+        try:
+            if isinstance(op, InsertOne):
+                collection.insert_one(op._doc)
+                counts["nInserted"] += 1
+            elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                if isinstance(op, ReplaceOne):
+                    result = collection.replace_one(op._filter, op._doc, upsert=bool(op._upsert))
+                elif isinstance(op, UpdateOne):
+                    result = collection.update_one(op._filter, op._doc, upsert=bool(op._upsert))
+                else:
+                    result = collection.update_many(op._filter, op._doc, upsert=bool(op._upsert))
+                counts["nMatched"] += result.matched_count
+                counts["nModified"] += result.modified_count
+                if result.upserted_id is not None:
+                    counts["nUpserted"] += 1
+                    upserted.append({"index": index, "_id": result.upserted_id})
+            elif isinstance(op, (DeleteOne, DeleteMany)):
+                delete = collection.delete_one if isinstance(op, DeleteOne) else collection.delete_many
+                counts["nRemoved"] += delete(op._filter).deleted_count
+            else:
+                raise TypeError(f"Unsupported bulk operation: {op!r}")
+        except DuplicateKeyError as e:
+            errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": op})
+            if ordered:
+                break
+    details = {**counts, "upserted": upserted, "writeErrors": errors, "writeConcernErrors": []}
+    if errors:
+        raise BulkWriteError(details)
+    return BulkWriteResult(details, True)
+
+
+def insert_many(collection, documents, ordered=True, **kwargs):
+    '''insert_many through bulk_write, so duplicate keys surface as a BulkWriteError as on a server.'''
+    documents = list(documents)
+    bulk_write(collection, [InsertOne(doc) for doc in documents], ordered=ordered)
+    return InsertManyResult([doc["_id"] for doc in documents], True)
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        items = list(self._cursor)
+        return items if length is None else items[:length]
+
+    async def close(self):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _awaitable(method):
+    async def call(*args, **kwargs):
+        return method(*args, **kwargs)
+    return call
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(self._collection.aggregate(pipeline))
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        return _awaitable(attr) if callable(attr) else attr
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._database[name])
+
+    def __getattr__(self, name):
+        attr = getattr(self._database, name)
+        if isinstance(attr, mongomock.Collection):
+            return AsyncCollection(attr)
+        return _awaitable(attr) if callable(attr) else attr
+
+
+class AsyncMongoMockClient:
+    def __init__(self, store):
+        self._client = mongomock.MongoClient(_store=store)
+
+    def __getitem__(self, name):
+        return AsyncDatabase(self._client[name])
+
+    def __getattr__(self, name):
+        return AsyncDatabase(self._client[name])
+
+    async def close(self):
+        self._client.close()
+
+
+def clients():
+    '''(async client, sync client) over one fresh in-memory server.'''
+    store = ServerStore()
+    return AsyncMongoMockClient(store), mongomock.MongoClient(_store=store)
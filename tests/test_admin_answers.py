@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("sentence_transformers")
+from backend.nlp.admin_answers import AdminAnswerTier
+from tests.conftest import run
+
+
+def test_match_only_serves_answers_in_the_query_language(mongo):
+    async def scenario():
+        async with mongo() as db:
+            await db.get_async_admin_db()[db.ADMIN_ANSWERS_COLLECTION].insert_many([
+                {"question": "minimum wage", "answer": "Rs 400", "language": "en", "embedding": [1.0, 0.0]},
+                {"question": "nyuntam vetan", "answer": "400 rupaye", "language": "hi", "embedding": [1.0, 0.0]},
+                {"question": "leave", "answer": "12 days", "language": "en", "embedding": [0.0, 1.0]},
+            ])
+            tier = AdminAnswerTier(threshold=0.9)
+            assert tier.match([1.0, 0.05], "en")["answer"] == "Rs 400"
+            assert tier.match([1.0, 0.05], "hi")["answer"] == "400 rupaye"
+            assert tier.match([1.0, 0.05], "ta") is None
+            assert tier.match([0.7, 0.7], "en") is None  # below the threshold
+            assert (tier.hits, tier.misses) == (2, 2)
+
+    run(scenario())
+
+
+def test_prepare_answer_flags_admin_answers(monkeypatch):
+    pytest.importorskip("langchain_groq")
+    from backend.nlp import rag
+
+    monkeypatch.setattr(rag, "get_query_embeddings", lambda texts: [[1.0, 0.0] for _ in texts])
+    monkeypatch.setattr(rag.admin_answer_tier, "match", lambda emb, language=None: (
+        {"answer": "Rs 400", "score": 0.95} if language == "en" else None
+    ))
+    monkeypatch.setattr(rag, "retrieve_relevant_faqs", lambda query, top_k=5, query_emb=None: [{"answer": "chunk"}])
+
+    admin = rag.prepare_answer("minimum wage?", language="en")
+    assert admin["source"] == "admin" and admin["answer"] == "Rs 400"
+    assert rag.prepare_answer("minimum wage?", language="hi") == {"chunks": [{"answer": "chunk"}]}
+
+
+def test_matches_are_not_held_up_by_a_reload(monkeypatch):
+    from backend.nlp import admin_answers
+
+    released = threading.Event()
+    answers = [{"_id": 1, "question": "minimum wage", "answer": "Rs 400", "language": "en", "embedding": [1.0, 0.0]}]
+
+    class SlowAnswers:
+        def find(self, *args, **kwargs):
+            if not released.is_set() and len(answers) > 1:
+                released.wait(5)
+            return list(answers)
+
+    monkeypatch.setattr(admin_answers, "get_admin_db", lambda: {admin_answers.ADMIN_ANSWERS_COLLECTION: SlowAnswers()})
+    tier = AdminAnswerTier(threshold=0.9)
+    assert tier.match([1.0, 0.0], "en")["answer"] == "Rs 400"
+
+    answers.append({"_id": 2, "question": "leave", "answer": "12 days", "language": "en", "embedding": [0.0, 1.0]})
+    tier.invalidate()
+    reload = threading.Thread(target=tier.match, args=([1.0, 0.0], "en"))
+    reload.start()
+    time.sleep(0.05)
+    # The reload is waiting on the database: other matches use the answers already loaded.
+    assert tier.match([0.0, 1.0], "en") is None
+    assert tier.match([1.0, 0.0], "en")["answer"] == "Rs 400"
+    released.set()
+    reload.join(5)
+    assert tier.match([0.0, 1.0], "en")["answer"] == "12 days"
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi import HTTPException
+from backend.services import admission
+from backend.services.admission import AdmissionController, RateLimiter
+from tests.conftest import run
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_rate_limiter_allows_burst_then_refills(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.try_acquire("u1") == 0
+    assert limiter.try_acquire("u1") == 0
+    assert limiter.try_acquire("u1") == pytest.approx(1.0)
+    assert limiter.try_acquire("u2") == 0  # buckets are per key
+    clock.now += 1.0
+    assert limiter.try_acquire("u1") == 0
+
+
+def test_rate_limiter_evicts_least_recently_used(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=1, max_keys=2)
+    limiter.try_acquire("a")
+    limiter.try_acquire("b")
+    limiter.try_acquire("a")
+    limiter.try_acquire("c")
+    assert len(limiter) == 2
+    # "b" was evicted, so it starts again with a full bucket; "a" is still empty.
+    assert limiter.try_acquire("a") > 0
+    assert limiter.try_acquire("b") == 0
+
+
+def test_rate_limited_requests_get_429():
+    async def scenario():
+        controller = AdmissionController(RateLimiter(rate_per_minute=60, burst=1))
+        await controller.acquire("u1")
+        controller.release()
+        with pytest.raises(HTTPException) as excinfo:
+            await controller.acquire("u1")
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.headers["Retry-After"] == "1"
+        assert controller.stats()["rate_limited"] == 1
+
+    run(scenario())
+
+
+def test_overload_is_shed_with_503():
+    async def scenario():
+        controller = AdmissionController(RateLimiter(burst=10), max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        await controller.acquire("u1")
+        # One request may wait for the slot; it times out while the slot stays taken.
+        waiter = asyncio.create_task(controller.acquire("u2"))
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+        # The queue is full, so the next request is shed without waiting.
+        with pytest.raises(HTTPException) as excinfo:
+            await controller.acquire("u3")
+        assert excinfo.value.status_code == 503
+        with pytest.raises(HTTPException) as excinfo:
+            await waiter
+        assert excinfo.value.status_code == 503
+
+        stats = controller.stats()
+        assert (stats["in_flight"], stats["queue_depth"]) == (1, 0)
+        assert (stats["shed_queue_full"], stats["shed_timeout"], stats["queued"]) == (1, 1, 1)
+
+    run(scenario())
+
+
+def test_queued_request_gets_the_released_slot():
+    async def scenario():
+        controller = AdmissionController(RateLimiter(burst=10), max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        async with controller.admit("u1"):
+            waiter = asyncio.create_task(controller.acquire("u2"))
+            await asyncio.sleep(0)
+        await waiter
+        assert controller.stats()["in_flight"] == 1
+        controller.release()
+        assert controller.stats()["in_flight"] == 0
+        assert controller.stats()["admitted"] == 2
+
+    run(scenario())
+
+
+def test_cost_above_the_burst_needs_a_full_bucket_and_leaves_debt(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=5)
+    assert limiter.try_acquire("u1", cost=8) == 0
+    # 3 tokens in debt: a single request waits for the bucket to climb back to 1.
+    assert limiter.try_acquire("u1") == pytest.approx(4.0)
+    clock.now += 4.0
+    assert limiter.try_acquire("u1") == 0
+    clock.now += 1.0
+    assert limiter.try_acquire("u2", cost=2) == 0
+    assert limiter.try_acquire("u2", cost=8) == pytest.approx(2.0)  # needs the full burst first
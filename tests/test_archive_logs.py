@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("dotenv")
+from backend.scripts import archive_logs
+from tests.conftest import run
+
+
+def test_archive_deletes_only_what_was_written(mongo, tmp_path, monkeypatch):
+    day = datetime(2024, 3, 1, 10)
+    save_manifest = archive_logs.save_manifest
+
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_chatbot_db()[db.LOGS_COLLECTION]
+            logs.insert_many([
+                {"timestamp": day, "triage": "answered", "n": 1},
+                {"timestamp": day, "triage": "answered", "n": 2},
+                {"timestamp": day, "triage": "unanswered", "n": 3},  # still in the admin queue
+            ])
+
+            def save_and_race(manifest, archive_dir):
+                save_manifest(manifest, archive_dir)
+                # Arrives for the same day after the cursor passed it (e.g. a restore).
+                logs.insert_one({"timestamp": day, "triage": "answered", "n": 4})
+
+            monkeypatch.setattr(archive_logs, "save_manifest", save_and_race)
+            archived = archive_logs.archive_logs(db.get_chatbot_db(), datetime(2024, 4, 1), archive_dir=str(tmp_path))
+            assert archived == 2
+            assert sorted(log["n"] for log in logs.find()) == [3, 4]
+            assert sorted(log["n"] for log in archive_logs.iter_archived_logs(archive_dir=str(tmp_path))) == [1, 2]
+
+    run(scenario())
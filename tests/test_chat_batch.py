@@ -0,0 +1,79 @@
+import importlib
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("sentence_transformers")
+from fastapi import HTTPException
+from backend.nlp import rag
+from backend.services.admission import AdmissionController, RateLimiter
+from tests.conftest import run
+
+
+@pytest.fixture
+def chat_routes(monkeypatch):
+    # Importing the routes loads the LLM and embedding model; batches answered from the
+    # admin tier need neither.
+    monkeypatch.setattr(rag, "load_llm_and_models", lambda: None)
+    module = importlib.import_module("backend.routes.chat_routes")
+
+    async def insert_log_entry(entry):
+        pass
+
+    monkeypatch.setattr(module, "match_admin_answers", lambda queries, language: [{"answer": "admin", "source": "admin"}] * len(queries))
+    monkeypatch.setattr(module, "insert_log_entry", insert_log_entry)
+    return module
+
+
+def _batch(chat_routes, monkeypatch):
+    admission = AdmissionController(RateLimiter(burst=10), max_in_flight=2, max_queue=0)
+    monkeypatch.setattr(chat_routes, "chat_admission", admission)
+    request = chat_routes.ChatBatchRequest(user_id="u1", queries=["a", "b"])
+    return admission, request
+
+
+def test_slot_released_when_the_body_is_never_sent(chat_routes, monkeypatch):
+    async def scenario():
+        admission, request = _batch(chat_routes, monkeypatch)
+        response = await chat_routes.chat_batch(request)
+        assert admission.stats()["in_flight"] == 1
+        # The client went away before the body started: only the background task runs.
+        await response.background()
+        assert admission.stats()["in_flight"] == 0
+
+    run(scenario())
+
+
+def test_slot_released_once_after_streaming(chat_routes, monkeypatch):
+    async def scenario():
+        admission, request = _batch(chat_routes, monkeypatch)
+        response = await chat_routes.chat_batch(request)
+        lines = [line async for line in response.body_iterator]
+        assert len(lines) == 2
+        assert admission.stats()["in_flight"] == 0
+        await response.background()
+        assert admission.stats()["in_flight"] == 0
+        # Exactly the two slots are free again: the release didn't run twice.
+        await admission.acquire("u2")
+        await admission.acquire("u3")
+        with pytest.raises(HTTPException) as excinfo:
+            await admission.acquire("u4")
+        assert excinfo.value.status_code == 503
+
+    run(scenario())
+
+
+def test_batch_queries_count_against_the_rate_limit(chat_routes, monkeypatch):
+    async def scenario():
+        admission = AdmissionController(RateLimiter(rate_per_minute=1, burst=3))
+        monkeypatch.setattr(chat_routes, "chat_admission", admission)
+        response = await chat_routes.chat_batch(chat_routes.ChatBatchRequest(user_id="u1", queries=["a", "b", "c"]))
+        await response.background()
+        # The three queries used up the bucket, so a single /chat is refused.
+        with pytest.raises(HTTPException) as excinfo:
+            await admission.acquire("u1")
+        assert excinfo.value.status_code == 429
+        await admission.acquire("u2")
+
+    run(scenario())
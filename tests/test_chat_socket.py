@@ -0,0 +1,197 @@
+import asyncio
+import importlib
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("sentence_transformers")
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from backend.nlp import rag
+from backend.nlp.conversation_memory import ConversationMemory
+from backend.services.admission import AdmissionController, RateLimiter
+from tests.conftest import run
+
+
+class _WarmAnswers:
+    def __init__(self):
+        self.answers = {}
+
+    async def lookup(self, query, language):
+        return self.answers.get(query)
+
+
+@pytest.fixture
+def chat_routes(monkeypatch):
+    # Importing the routes loads the LLM and embedding model; the socket tests stub both out.
+    monkeypatch.setattr(rag, "load_llm_and_models", lambda: None)
+    module = importlib.import_module("backend.routes.chat_routes")
+
+    async def insert_log_entry(entry):
+        pass
+
+    async def schedule_synthesis(text, language):
+        return None
+
+    monkeypatch.setattr(module, "match_admin_answers", lambda queries, language: [None] * len(queries))
+    monkeypatch.setattr(module, "warm_answer_store", _WarmAnswers())
+    monkeypatch.setattr(module, "prepare_answer", lambda query_text, *args: {"chunks": [{"content_en": query_text}]})
+    monkeypatch.setattr(module, "insert_log_entry", insert_log_entry)
+    monkeypatch.setattr(module, "schedule_synthesis", schedule_synthesis)
+    monkeypatch.setattr(module, "chat_admission", AdmissionController(RateLimiter(burst=100)))
+    monkeypatch.setattr(module, "conversation_memory", ConversationMemory())
+    return module
+
+
+@pytest.fixture
+def client(chat_routes):
+    app = FastAPI()
+    app.include_router(chat_routes.router, prefix="/chat_api")
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _stream(*pieces, gate=None):
+    '''stream_answer_from_chunks stand-in emitting the given pieces, optionally held at gate after the first.'''
+    def stream(query, chunks, on_token, history=""):
+        for i, piece in enumerate(pieces):
+            on_token(piece)
+            if gate is not None and i == 0:
+                gate.wait(5)
+        return "".join(pieces), ["https://example.org/act"]
+    return stream
+
+
+def _chat(message_id, text="Minimum wage?"):
+    return {"type": "chat", "id": message_id, "query_text": text}
+
+
+def test_answer_is_streamed_as_frames(chat_routes, client, monkeypatch):
+    monkeypatch.setattr(chat_routes, "stream_answer_from_chunks", _stream("Wages are ", "fixed by the state."))
+    with client.websocket_connect("/chat_api/ws?user_id=u1") as ws:
+        ws.send_json(_chat("m1"))
+        frames = [ws.receive_json() for _ in range(5)]
+    assert [f["type"] for f in frames] == ["start", "token", "token", "links", "end"]
+    assert "".join(f["text"] for f in frames if f["type"] == "token") == "Wages are fixed by the state."
+    assert frames[3]["links"] == ["https://example.org/act"]
+    assert frames[4]["id"] == "m1" and frames[4]["bot_response"] == "Wages are fixed by the state."
+
+
+def test_warm_answers_are_only_served_on_the_first_turn(chat_routes, client, monkeypatch):
+    chat_routes.warm_answer_store.answers["Minimum wage?"] = {"answer": "Rs 400"}
+    monkeypatch.setattr(chat_routes, "stream_answer_from_chunks", _stream("It depends on the state."))
+
+    def answer(ws, message_id):
+        ws.send_json(_chat(message_id))
+        while True:
+            frame = ws.receive_json()
+            if frame["type"] == "end":
+                return frame["answer_source"], frame["bot_response"]
+
+    with client.websocket_connect("/chat_api/ws?user_id=u1") as ws:
+        assert answer(ws, "m1") == ("warm", "Rs 400")
+        # Precomputed answers ignore the conversation so far, so a follow-up is generated.
+        assert answer(ws, "m2") == ("rag", "It depends on the state.")
+
+
+def test_messages_beyond_the_pending_limit_get_a_busy_error(chat_routes, client, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(chat_routes, "WS_MAX_PENDING", 1)
+    monkeypatch.setattr(chat_routes, "stream_answer_from_chunks", _stream("first", " answer", gate=gate))
+    with client.websocket_connect("/chat_api/ws?user_id=u1") as ws:
+        ws.send_json(_chat("m1"))
+        assert [ws.receive_json()["type"] for _ in range(2)] == ["start", "token"]
+        # m1 is being answered and m2 fills the queue, so m3 is turned away.
+        ws.send_json(_chat("m2"))
+        ws.send_json(_chat("m3"))
+        busy = ws.receive_json()
+        assert busy["type"] == "error" and busy["id"] == "m3" and busy["retry_after"] == 1
+        gate.set()
+        ends = []
+        while len(ends) < 2:
+            frame = ws.receive_json()
+            if frame["type"] == "end":
+                ends.append(frame["id"])
+    assert ends == ["m1", "m2"]
+
+
+def test_keepalive_pings_and_closes_idle_sockets(chat_routes, client, monkeypatch):
+    monkeypatch.setattr(chat_routes, "WS_PING_INTERVAL", 0.05)
+    with client.websocket_connect("/chat_api/ws?user_id=u1") as ws:
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+        assert ws.receive_json() == {"type": "ping"}
+
+    monkeypatch.setattr(chat_routes, "WS_IDLE_TIMEOUT", 0.1)
+    with client.websocket_connect("/chat_api/ws?user_id=u1") as ws:
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            while True:
+                ws.receive_json()
+        assert excinfo.value.code == 1001
+
+
+class _SlowSocket:
+    '''WebSocket stand-in whose sends wait until released, like a client that stopped reading.'''
+
+    def __init__(self, fail_after=None):
+        self.sent = []
+        self.released = asyncio.Event()
+        self.fail_after = fail_after
+
+    async def send_text(self, text):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise WebSocketDisconnect(1006)
+        await self.released.wait()
+        self.sent.append(text)
+
+
+def _counting_stream(emitted, count):
+    def stream(query, chunks, on_token, history=""):
+        for i in range(count):
+            on_token(f"t{i} ")
+            emitted.append(i)
+        return "".join(f"t{i} " for i in range(count)), []
+    return stream
+
+
+def test_a_slow_client_holds_the_llm_stream_back(chat_routes, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(chat_routes, "WS_TOKEN_BUFFER", 2)
+    monkeypatch.setattr(chat_routes, "stream_answer_from_chunks", _counting_stream(emitted, 50))
+
+    async def scenario():
+        websocket = _SlowSocket()
+        socket = chat_routes.ChatSocket(websocket, "u1", "en")
+        answer = asyncio.create_task(socket._stream_answer("m1", "q", []))
+        await asyncio.sleep(0.2)
+        # One token is being sent, two are buffered and one waits to be buffered.
+        assert len(emitted) <= 4
+        websocket.released.set()
+        text, _ = await answer
+        assert len(websocket.sent) == 50 and text.startswith("t0 t1 ")
+
+    run(scenario())
+
+
+def test_generation_stops_when_the_client_disconnects(chat_routes, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(chat_routes, "WS_TOKEN_BUFFER", 2)
+    monkeypatch.setattr(chat_routes, "stream_answer_from_chunks", _counting_stream(emitted, 10000))
+
+    async def scenario():
+        websocket = _SlowSocket(fail_after=1)
+        websocket.released.set()
+        socket = chat_routes.ChatSocket(websocket, "u1", "en")
+        with pytest.raises(WebSocketDisconnect):
+            await socket._stream_answer("m1", "q", [])
+        deadline = time.monotonic() + 5
+        while socket._drains and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert not socket._drains
+        assert len(emitted) < 10
+
+    run(scenario())
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("sentence_transformers")
+from backend.nlp import conversation_memory as memory_module
+from backend.nlp.conversation_memory import ConversationMemory
+from backend.nlp.tokens import count_tokens
+from tests.conftest import run
+
+TURN_TOKENS = count_tokens("User: question 0\nBot: answer 0")
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    calls = []
+
+    def summarize(summary, turns, max_tokens):
+        calls.append([user for user, _ in turns])
+        return f"summary of {len(calls)} folds"
+
+    monkeypatch.setattr(memory_module, "summarize_conversation", summarize)
+    monkeypatch.setattr(memory_module, "shared_llm_slots", asyncio.Semaphore(1))
+    return calls
+
+
+async def _until(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_history_within_budget_is_not_summarized(summaries):
+    async def scenario():
+        memory = ConversationMemory(keep_turns=1, token_budget=100 * TURN_TOKENS)
+        for i in range(6):
+            memory.add_turn("u:s", f"question {i}", f"answer {i}")
+        await asyncio.sleep(0.05)
+        return memory.get_context("u:s")
+
+    context = run(scenario())
+    assert summaries == []
+    assert context.count("User: question") == 6
+
+
+def test_history_over_budget_is_folded_in_one_call(summaries):
+    async def scenario():
+        memory = ConversationMemory(keep_turns=1, token_budget=int(4.5 * TURN_TOKENS))
+        for i in range(5):
+            memory.add_turn("u:s", f"question {i}", f"answer {i}")
+        await _until(lambda: memory.stats()["summaries"] == 1)
+        context = memory.get_context("u:s")
+        for i in range(5, 8):
+            memory.add_turn("u:s", f"question {i}", f"answer {i}")
+        await asyncio.sleep(0.05)
+        return context
+
+    context = run(scenario())
+    # Each time the history went over the budget, all the older turns were summarized together.
+    assert summaries == [["question 0", "question 1", "question 2", "question 3"], ["question 4", "question 5", "question 6"]]
+    assert context.startswith("Summary of the earlier conversation: summary of 1 folds")
+    assert context.endswith("User: question 4\nBot: answer 4")
+
+
+def test_summaries_wait_for_a_shared_llm_slot(summaries):
+    async def scenario():
+        memory = ConversationMemory(keep_turns=1, token_budget=TURN_TOKENS)
+        async with memory_module.shared_llm_slots:
+            memory.add_turn("u:s", "question 0", "answer 0")
+            memory.add_turn("u:s", "question 1", "answer 1")
+            await asyncio.sleep(0.05)
+            assert summaries == []
+        await _until(lambda: summaries == [["question 0"]])
+
+    run(scenario())
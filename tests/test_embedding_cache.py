@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+from backend.nlp import embedding_cache
+from backend.nlp.embedding_cache import EmbeddingCache, cache_key
+
+
+def _encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+    return encode
+
+
+def _last_used(path, model, text):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_used FROM embeddings WHERE key = ?", (cache_key(model, text),)).fetchone()[0]
+
+
+def test_encode_only_encodes_misses_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+    first = cache.encode("m", ["a", "bb", "a"], _encode(calls))
+    second = cache.encode("m", ["bb", "ccc"], _encode(calls))
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_normalized_text_shares_an_entry(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+    cache.encode("m", ["minimum  wage "], _encode(calls))
+    cache.encode("m", ["minimum wage"], _encode(calls))
+    assert len(calls) == 1
+
+
+def test_hits_do_not_write_until_stale(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    clock = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    cache.put_many("m", ["a"], [[1.0]])
+
+    clock[0] += 10
+    cache.get_many("m", ["a"])
+    cache.flush()
+    assert _last_used(path, "m", "a") == 1000.0  # fresh entry: no write
+
+    clock[0] += embedding_cache.TOUCH_INTERVAL + 1
+    cache.get_many("m", ["a"])
+    assert _last_used(path, "m", "a") == 1000.0  # stale: refresh buffered, not written yet
+    cache.flush()
+    assert _last_used(path, "m", "a") == clock[0]
+
+
+def test_eviction_keeps_recently_used(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_bytes=4 * 4 * 3)  # three 4-float vectors
+    for text in ("a", "b", "c"):
+        clock[0] += embedding_cache.TOUCH_INTERVAL + 1
+        cache.put_many("m", [text], [[0.0] * 4])
+    clock[0] += embedding_cache.TOUCH_INTERVAL + 1
+    cache.get_many("m", ["a"])  # "a" becomes the most recently used
+    cache.put_many("m", ["d"], [[0.0] * 4])
+    a, b, _, d = cache.get_many("m", ["a", "b", "c", "d"])
+    assert a is not None and d is not None
+    assert b is None  # least recently used goes first
+
+
+def test_total_bytes_is_kept_across_puts_and_evictions(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, max_bytes=4 * 4 * 3)
+    cache.put_many("m", ["a", "b"], [[0.0] * 4, [0.0] * 2])
+    assert cache.total_bytes() == 16 + 8
+    cache.put_many("m", ["b"], [[0.0] * 4])  # replaced with a larger vector
+    assert cache.total_bytes() == 32
+    cache.put_many("m", ["c", "d"], [[0.0] * 4, [0.0] * 4])  # over the cap: evicts down to 90%
+    assert cache.total_bytes() == 32
+    cache.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT SUM(size) FROM embeddings").fetchone()[0] == 32
+
+
+def test_total_bytes_of_an_older_cache_is_summed_on_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path).put_many("m", ["a", "b"], [[0.0] * 4, [0.0] * 4])
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE cache_meta")
+    assert EmbeddingCache(path).total_bytes() == 32
@@ -0,0 +1,28 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pymongo")
+pytest.importorskip("sentence_transformers")
+from backend.etl_scripts import ingest_faq
+from tests.conftest import run
+
+
+def _faqs(*question_ids):
+    return pd.DataFrame({
+        "question_id": list(question_ids),
+        "question": [f"question {q}" for q in question_ids],
+        "text_en": ["text"] * len(question_ids),
+        "text_hi": [""] * len(question_ids),
+    })
+
+
+def test_load_faqs_counts_write_failures(mongo):
+    async def scenario():
+        async with mongo() as db:
+            faqs = db.get_legal_db()["faqs"]
+            faqs.create_index("question", unique=True)
+            faqs.insert_one({"question_id": "other", "question": "question 2"})
+            assert ingest_faq.load_faqs(faqs, _faqs("1", "2", "3")) == (2, 1)
+            assert sorted(doc["question_id"] for doc in faqs.find()) == ["1", "3", "other"]
+
+    run(scenario())
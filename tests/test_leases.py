@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+from backend.db.leases import Lease
+from tests.conftest import run
+
+
+def test_lease_excludes_other_workers_until_released(mongo):
+    async def scenario():
+        async with mongo() as db:
+            first, second = Lease("job_state", "job", 60), Lease("job_state", "job", 60)
+            now = datetime(2025, 1, 1)
+            assert (await first.acquire(now))["lease_owner"] == first.owner
+            assert await second.acquire(now) is None
+            assert await first.acquire(now + timedelta(seconds=30)) is not None  # the holder renews
+            await first.release({"high_water_mark": now})
+            state = await second.acquire(now)
+            assert state["lease_owner"] == second.owner and state["high_water_mark"] == now
+
+            # Releasing a lease that was taken over leaves the new holder alone.
+            await first.release({"high_water_mark": None})
+            state = await db.get_async_chatbot_db()["job_state"].find_one({"_id": "job"})
+            assert state["lease_owner"] == second.owner and state["high_water_mark"] == now
+
+    run(scenario())
+
+
+def test_expired_lease_is_taken_over(mongo):
+    async def scenario():
+        async with mongo():
+            first, second = Lease("job_state", "job", 60), Lease("job_state", "job", 60)
+            now = datetime(2025, 1, 1)
+            assert await first.acquire(now) is not None
+            assert await second.acquire(now + timedelta(seconds=61)) is not None
+            assert await first.acquire(now + timedelta(seconds=62)) is None
+
+    run(scenario())
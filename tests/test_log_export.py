@@ -0,0 +1,48 @@
+import io
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("pymongo")
+import pyarrow.parquet as pq
+from backend.db import log_export
+from tests.conftest import run
+
+
+def test_admin_columns_follow_the_log_columns():
+    columns = log_export.resolve_columns(["_id", "status"], include_admin=True)
+    assert columns[:2] == ["_id", "status"]
+    assert columns[-2:] == ["answered_at", "answered_by"]
+    with pytest.raises(ValueError):
+        log_export.resolve_columns(["nope"])
+
+
+def test_export_reads_nested_admin_fields_in_batches(mongo):
+    columns = ["_id", "mark_status", "answered_by", "answered_at"]
+
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_chatbot_db()[db.LOGS_COLLECTION]
+            logs.insert_many([
+                {
+                    "_id": i,
+                    "timestamp": datetime(2025, 1, 1, i),
+                    "marking": {"status": "Answerable"},
+                    "answered_by": "admin@example.com",
+                    "answered_at": datetime(2025, 1, 2),
+                } for i in range(2)
+            ] + [{"_id": 2, "timestamp": datetime(2025, 1, 1, 2), "query_text": "not exported"}])
+
+            batches = list(log_export.iter_record_batches(db.get_chatbot_db(), columns, batch_size=2))
+            assert [batch.num_rows for batch in batches] == [2, 1]
+            rows = [row for batch in batches for row in batch.to_pylist()]
+            assert rows[0] == {"_id": "0", "mark_status": "Answerable", "answered_by": "admin@example.com", "answered_at": datetime(2025, 1, 2)}
+            assert rows[2] == {"_id": "2", "mark_status": None, "answered_by": None, "answered_at": None}
+
+            data = b"".join(log_export.iter_export_bytes(db.get_chatbot_db(), columns, fmt="parquet", batch_size=2))
+            table = pq.read_table(io.BytesIO(data))
+            assert table.schema.field("answered_by").type == log_export.pa.string()
+            assert table.column("_id").to_pylist() == ["0", "1", "2"]
+
+    run(scenario())
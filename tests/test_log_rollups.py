@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+from backend.db import log_rollups
+from tests.conftest import run
+
+
+def _log(timestamp, status="answered", language="en", query="Minimum wage?"):
+    return {"timestamp": timestamp, "status": status, "language": language, "query_text": query}
+
+
+@pytest.mark.mongod  # $dateTrunc
+def test_refresh_is_idempotent_and_counts_late_logs(mongo):
+    async def scenario():
+        async with mongo() as db:
+            rollups = log_rollups.LogRollups()
+            await rollups.ensure_indexes()
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            now = datetime.now()
+            old = (now - timedelta(hours=3)).replace(minute=10)
+            await logs.insert_many([_log(old), _log(old, "unanswered", "hi"), _log(old, query=" minimum WAGE? ")])
+
+            assert await rollups.refresh() == 3
+            # Re-running a window (failed release, lease takeover) rewrites the same totals.
+            state = db.get_async_chatbot_db()[log_rollups.STATE_COLLECTION]
+            await state.delete_many({})
+            assert await rollups.refresh() == 3
+            stats = await rollups.get_stats(granularity="hour", start=old - timedelta(hours=1))
+            assert stats["totals"]["total"] == 3
+            assert stats["totals"]["status"] == {"answered": 2, "unanswered": 1}
+            assert stats["top_questions"] == [{"question": "minimum wage?", "count": 3}]
+
+            # Written after its hour was rolled up, but within ROLLUP_LATE_SECONDS.
+            await logs.insert_one(_log(now - timedelta(minutes=5)))
+            await state.update_one({"_id": log_rollups.STATE_ID}, {"$set": {"high_water_mark": now - timedelta(minutes=2)}})
+            await rollups.refresh()
+            daily = await rollups.get_stats(start=old - timedelta(days=1))
+            assert daily["totals"]["total"] == 4
+            assert daily["top_questions"] == [{"question": "minimum wage?", "count": 4}]
+
+    run(scenario())
+
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("prometheus_client")
+from backend.db.log_sink import LogSink
+from tests.conftest import run
+
+
+class _Collection:
+    '''insert_many stand-in; the first call hangs until cancelled when hang_first is set.'''
+
+    def __init__(self, hang_first=False):
+        self.hang_first = hang_first
+        self.inserted = []
+        self.calls = 0
+
+    async def insert_many(self, entries, ordered=False):
+        self.calls += 1
+        if self.hang_first and self.calls == 1:
+            await asyncio.Event().wait()
+        self.inserted.extend(entries)
+
+
+def test_batches_are_written():
+    collection = _Collection()
+
+    async def scenario():
+        sink = LogSink(lambda: collection, batch_size=2, flush_interval=0.01)
+        await sink.start()
+        for i in range(5):
+            assert sink.submit({"n": i})
+        await asyncio.sleep(0.05)
+        await sink.stop()
+        return sink.stats()
+
+    stats = run(scenario())
+    assert sorted(e["n"] for e in collection.inserted) == [0, 1, 2, 3, 4]
+    assert stats["written"] == 5 and stats["failed"] == 0
+
+
+def test_stop_during_flush_keeps_the_batch():
+    collection = _Collection(hang_first=True)
+
+    async def scenario():
+        sink = LogSink(lambda: collection, batch_size=2, flush_interval=0.01)
+        await sink.start()
+        sink.submit({"n": 0})
+        sink.submit({"n": 1})
+        await asyncio.sleep(0.02)  # the writer is now stuck inside the first insert_many
+        sink.submit({"n": 2})
+        await sink.stop()
+
+    run(scenario())
+    assert sorted(e["n"] for e in collection.inserted) == [0, 1, 2]
+
+
+def test_drop_newest_policy():
+    collection = _Collection()
+
+    async def scenario():
+        sink = LogSink(lambda: collection, max_queue=1, overflow_policy="drop_newest")
+        await sink.start()
+        # Nothing yields to the writer between the two submits, so the queue is still full.
+        assert sink.submit({"n": 0})
+        assert not sink.submit({"n": 1})
+        stats = sink.stats()
+        await sink.stop()
+        return stats
+
+    stats = run(scenario())
+    assert stats["dropped"] == 1 and stats["queue_depth"] == 1
+    assert [e["n"] for e in collection.inserted] == [0]
+
+def test_stop_right_after_start_writes_queued_entries():
+    collection = _Collection()
+
+    async def scenario():
+        sink = LogSink(lambda: collection, batch_size=2, flush_interval=0.01)
+        await sink.start()
+        sink.submit({"n": 0})
+        sink.submit({"n": 1})
+        # The writer task has not run yet, so it is cancelled before its own shutdown flush.
+        await sink.stop()
+
+    run(scenario())
+    assert sorted(e["n"] for e in collection.inserted) == [0, 1]
@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("passlib")
+from pymongo.errors import ConnectionFailure
+from backend.db import mongo_utils
+from tests.conftest import MONGO_TEST_URI, run
+
+
+def test_accessors_fail_before_connect():
+    for getter in (
+        mongo_utils.get_async_chatbot_db,
+        mongo_utils.get_async_admin_db,
+        mongo_utils.get_async_legal_db,
+        mongo_utils.get_chatbot_db,
+        mongo_utils.get_legal_db,
+    ):
+        with pytest.raises(ConnectionFailure):
+            getter()
+
+
+def test_async_and_sync_handles_share_databases(mongo):
+    async def scenario():
+        async with mongo() as db:
+            await db.get_async_legal_db()["faqs"].insert_one({"question": "q", "answer": "a"})
+            await db.get_async_admin_db()["admin_answers"].insert_one({"answer": "x"})
+            # The sync facade (RAG pipeline, scripts) sees what the async handles wrote.
+            assert db.get_all_faqs() == [{"question": "q", "answer": "a"}]
+            assert db.get_admin_db()["admin_answers"].count_documents({}) == 1
+            assert db.get_chatbot_db().name == db.get_async_chatbot_db().name
+
+    run(scenario())
+
+
+def test_reconnecting_keeps_indexes_and_replaces_the_legacy_timestamp_index(mongo):
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            await logs.drop_index(db.LOGS_TIMESTAMP_INDEX)
+            await logs.create_index([("timestamp", 1)], name=db.LEGACY_LOGS_TIMESTAMP_INDEX)
+            await logs.create_index([("user_id", 1)], name="user_logs")
+            await db.connect_to_mongo(MONGO_TEST_URI, db.async_client, db.client)
+            indexes = await logs.index_information()
+            assert db.LEGACY_LOGS_TIMESTAMP_INDEX not in indexes
+            assert [tuple(part) for part in indexes[db.LOGS_TIMESTAMP_INDEX]["key"]] == [("timestamp", 1), ("_id", 1)]
+            # Startup no longer drops indexes it doesn't manage.
+            assert "user_logs" in indexes
+
+    run(scenario())
+
+
+def test_connect_sync_facade_leaves_async_handles_alone(sync_mongo_client):
+    try:
+        mongo_utils.connect_sync_facade(MONGO_TEST_URI, sync_mongo_client)
+        assert mongo_utils.get_legal_db().name == "legal_db"
+        with pytest.raises(ConnectionFailure):
+            mongo_utils.get_async_legal_db()
+    finally:
+        mongo_utils.client = None
+        mongo_utils.sync_chatbot_db = mongo_utils.sync_admin_db = None
+        mongo_utils.sync_legal_db = mongo_utils.sync_links_db = None
+
+
+def test_password_hashing_runs_off_the_event_loop(mongo, monkeypatch):
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def recording_to_thread(func, *args, **kwargs):
+        offloaded.append(func.__name__)
+        return await to_thread(func, *args, **kwargs)
+
+    monkeypatch.setattr(mongo_utils.asyncio, "to_thread", recording_to_thread)
+
+    async def scenario():
+        async with mongo() as db:
+            await db.create_user({"email": "a@example.com", "password": "s3cret"})
+            with pytest.raises(ValueError):
+                await db.create_user({"email": "a@example.com", "password": "other"})
+            user = await db.get_user_by_email("a@example.com")
+            assert "password" not in user and user["hashed_password"] != "s3cret"
+            assert await db.verify_user("a@example.com", "s3cret")
+            assert not await db.verify_user("a@example.com", "wrong")
+            assert not await db.verify_user("nobody@example.com", "s3cret")
+
+    run(scenario())
+    assert offloaded == ["hash", "verify", "verify"]
+
+
+def test_log_pages_walk_every_entry_once(mongo):
+    async def scenario():
+        async with mongo() as db:
+            base = datetime(2025, 1, 1)
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            # Pairs of logs share a timestamp, so the _id tie-break is exercised too.
+            await logs.insert_many([{"n": i, "timestamp": base + timedelta(minutes=i // 2)} for i in range(7)])
+            seen, cursor, pages = [], None, 0
+            while True:
+                page, cursor = await db.get_logs_page({}, limit=3, cursor=cursor, fields=["n"])
+                seen.extend(log["n"] for log in page)
+                pages += 1
+                if cursor is None:
+                    break
+            assert sorted(seen) == list(range(7)) and len(seen) == 7
+            assert pages == 3
+            with pytest.raises(ValueError):
+                await db.get_logs_page({}, cursor="not-a-cursor")
+
+    run(scenario())
+
+
+def test_logs_query_combines_triage_and_unanswered():
+    assert mongo_utils.build_logs_query(triage="marked", unanswered=True) == {"$and": [
+        {"triage": "marked"},
+        {"triage": {"$in": mongo_utils.OPEN_TRIAGE_STATES}},
+    ]}
+    assert mongo_utils.build_logs_query(unanswered=True) == {"triage": {"$in": mongo_utils.OPEN_TRIAGE_STATES}}
+
+
+def test_triage_backfill_runs_once(mongo):
+    async def scenario():
+        async with mongo() as db:
+            chatbot = db.get_async_chatbot_db()
+            # connect_to_mongo already applied it to the empty database.
+            assert await chatbot[db.MIGRATIONS_COLLECTION].find_one({"_id": "log_triage"})
+            await chatbot[db.MIGRATIONS_COLLECTION].delete_many({})
+            await chatbot[db.LOGS_COLLECTION].insert_many([
+                {"status": "answered"},
+                {"status": "unanswered", "answer": "admin reply"},
+                {"status": "unanswered"},
+            ])
+            await db.backfill_log_triage()
+            triage = [log["triage"] async for log in chatbot[db.LOGS_COLLECTION].find().sort("_id", 1)]
+            assert triage == ["answered", "answered", "unanswered"]
+
+            await chatbot[db.LOGS_COLLECTION].insert_one({"status": "unanswered", "late": True})
+            await db.backfill_log_triage()
+            assert "triage" not in await chatbot[db.LOGS_COLLECTION].find_one({"late": True})
+
+    run(scenario())
+
+
+def test_bulk_mark_reports_each_item(mongo):
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            open_id, closed_id = (await logs.insert_many([
+                {"triage": db.TRIAGE_UNANSWERED},
+                {"triage": db.TRIAGE_ANSWERED},
+            ])).inserted_ids
+            missing_id = "0" * 24
+            results = await db.bulk_mark_logs(
+                [(str(open_id), "Pending"), (str(open_id), "Irrelevant"), (str(closed_id), "Pending"),
+                 (missing_id, "Pending"), ("not-an-id", "Pending")],
+                marked_by="admin@example.com",
+            )
+            assert [r["result"] for r in results] == ["marked", "duplicate", "not_open", "not_found", "invalid_id"]
+            marked = await logs.find_one({"_id": open_id})
+            assert marked["triage"] == db.TRIAGE_MARKED
+            assert marked["marking"]["status"] == "Pending"
+            assert marked["marking"]["marked_by"] == "admin@example.com"
+            assert (await logs.find_one({"_id": closed_id})).get("marking") is None
+
+    run(scenario())
+
+
+def test_bulk_mark_reports_logs_closed_before_the_write(mongo, monkeypatch):
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            kept_id, closed_id = (await logs.insert_many([
+                {"triage": db.TRIAGE_UNANSWERED},
+                {"triage": db.TRIAGE_UNANSWERED},
+            ])).inserted_ids
+            bulk_write = logs.bulk_write
+
+            async def answered_meanwhile(self, operations, **kwargs):
+                await logs.update_one({"_id": closed_id}, {"$set": {"triage": db.TRIAGE_ANSWERED}})
+                return await bulk_write(operations, **kwargs)
+
+            monkeypatch.setattr(type(logs), "bulk_write", answered_meanwhile, raising=False)
+            results = await db.bulk_mark_logs([(str(kept_id), "Pending"), (str(closed_id), "Pending")], marked_by="admin@example.com")
+            assert [r["result"] for r in results] == ["marked", "not_open"]
+            assert (await logs.find_one({"_id": closed_id})).get("marking") is None
+
+    run(scenario())
+
+
+def test_bulk_answer_closes_open_and_closed_logs(mongo):
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            ids = (await logs.insert_many([
+                {"triage": db.TRIAGE_MARKED, "status": "unanswered"},
+                {"triage": db.TRIAGE_ANSWERED, "status": "answered"},
+            ])).inserted_ids
+            results = await db.bulk_answer_logs([(str(i), f"answer {n}") for n, i in enumerate(ids)], answered_by="a@b.c")
+            assert [r["result"] for r in results] == ["answered", "answered"]
+            async for log in logs.find():
+                assert log["triage"] == db.TRIAGE_ANSWERED
+                assert log["answered_by"] == "a@b.c" and log["answered_at"]
+                # The bot's own status is kept for the statistics.
+                assert log["status"] in ("unanswered", "answered")
+            assert await db.get_unanswered_logs() == []
+
+    run(scenario())
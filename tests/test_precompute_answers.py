@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("sentence_transformers")
+from backend.nlp.warm_answers import WARM_ANSWERS_COLLECTION, warm_answer_id
+from backend.scripts import precompute_answers
+from tests.conftest import run
+
+
+def _question(query, count=5):
+    return {"_id": warm_answer_id(query, "en"), "query": query, "language": "en", "count": count}
+
+
+def _entry(query, corpus_version="v1"):
+    return {"_id": warm_answer_id(query, "en"), "answer": f"old answer to {query}", "corpus_version": corpus_version, "run_id": "old"}
+
+
+def test_nothing_mined_leaves_the_store_alone(mongo):
+    async def scenario():
+        async with mongo() as db:
+            store = db.get_chatbot_db()[WARM_ANSWERS_COLLECTION]
+            store.insert_one(_entry("minimum wage"))
+            stats = precompute_answers.precompute([], "v1", "run-2")
+            assert stats["removed"] == 0
+            assert store.count_documents({}) == 1
+
+    run(scenario())
+
+
+def test_failed_regeneration_keeps_current_entries(mongo, monkeypatch):
+    def generate(query, language):
+        if query == "leave":
+            raise RuntimeError("LLM unavailable")
+        return f"new answer to {query}"
+
+    monkeypatch.setattr(precompute_answers, "generate_warm_answer", generate)
+
+    async def scenario():
+        async with mongo() as db:
+            store = db.get_chatbot_db()[WARM_ANSWERS_COLLECTION]
+            store.insert_many([_entry("minimum wage"), _entry("leave"), _entry("bonus"), _entry("gratuity", "v0")])
+            stats = precompute_answers.precompute(
+                [_question("minimum wage"), _question("leave"), _question("gratuity")], "v1", "run-2", force=True
+            )
+            assert (stats["generated"], stats["failed"]) == (2, 1)
+            answers = {doc["_id"]: doc["answer"] for doc in store.find()}
+            # "bonus" is no longer asked often; "leave" failed but its answer is still current.
+            assert answers == {
+                warm_answer_id("minimum wage", "en"): "new answer to minimum wage",
+                warm_answer_id("leave", "en"): "old answer to leave",
+                warm_answer_id("gratuity", "en"): "new answer to gratuity",
+            }
+
+    run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("sentence_transformers")
+from backend.nlp import query_clustering
+from tests.conftest import run
+
+
+def test_assign_to_centroids_respects_threshold():
+    vectors = query_clustering.normalize_rows(np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]], dtype=np.float32))
+    centroids = query_clustering.normalize_rows(np.array([[1.0, 0.1]], dtype=np.float32))
+    assert query_clustering.assign_to_centroids(vectors, centroids, 0.9).tolist() == [0, -1, -1]
+    assert query_clustering.assign_to_centroids(vectors, np.empty((0, 0)), 0.9).tolist() == [-1, -1, -1]
+
+
+def test_leader_cluster_groups_close_vectors():
+    vectors = query_clustering.normalize_rows(np.array([[1, 0], [0.99, 0.05], [0, 1], [0.05, 0.99]], dtype=np.float32))
+    groups = query_clustering.leader_cluster(vectors, 0.9)
+    assert [g.tolist() for g in groups] == [[0, 1], [2, 3]]
+
+
+def _fake_embeddings(texts):
+    return [[1.0, 0.0] if "wage" in text else [0.0, 1.0] for text in texts]
+
+
+def test_two_workers_cluster_each_query_once(mongo, monkeypatch):
+    monkeypatch.setattr(query_clustering, "get_query_embeddings", _fake_embeddings)
+
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            await logs.insert_many(
+                [{"triage": "unanswered", "query_text": f"minimum wage {i}"} for i in range(3)]
+                + [{"triage": "unanswered", "query_text": f"leave rules {i}"} for i in range(2)]
+            )
+            workers = [query_clustering.QueryClusterer(threshold=0.9) for _ in range(2)]
+            assigned = await asyncio.gather(*(w.refresh() for w in workers))
+            assert sorted(assigned) == [0, 5]  # the lease holder did all the work
+            clusters = await db.get_async_chatbot_db()[query_clustering.CLUSTERS_COLLECTION].find().to_list(None)
+            assert sorted(c["count"] for c in clusters) == [2, 3]
+
+            # The lease was released, so either worker can take the next run.
+            await logs.insert_one({"triage": "unanswered", "query_text": "minimum wage again"})
+            assert await workers[1].refresh() == 1
+
+    run(scenario())
+
+
+@pytest.mark.mongod  # $topN
+def test_clusters_list_open_queries_largest_first(mongo, monkeypatch):
+    monkeypatch.setattr(query_clustering, "get_query_embeddings", _fake_embeddings)
+
+    async def scenario():
+        async with mongo() as db:
+            logs = db.get_async_chatbot_db()[db.LOGS_COLLECTION]
+            await logs.insert_many(
+                [{"triage": "unanswered", "query_text": f"minimum wage {i}"} for i in range(3)]
+                + [{"triage": "unanswered", "query_text": f"leave rules {i}"} for i in range(2)]
+                + [{"triage": "answered", "query_text": "minimum wage closed"}]
+            )
+            clusterer = query_clustering.QueryClusterer(threshold=0.9)
+            await clusterer.refresh()
+            await logs.insert_one({"triage": "unanswered", "query_text": "leave rules new"})
+            result = await clusterer.get_clusters(samples=2)
+            assert [c["open_count"] for c in result["clusters"]] == [3, 2]
+            assert all(len(c["sample_questions"]) == 2 for c in result["clusters"])
+            assert result["unclustered"] == 1
+
+    run(scenario())
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("langchain_groq")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("pymongo")
+from backend.nlp.rag import pack_context
+from backend.nlp.tokens import count_tokens
+from tests.conftest import run
+
+
+def _chunk(collection, text, embedding):
+    return {"_collection": collection, "content_en": text, "_embedding": embedding}
+
+
+def _with_links(mongo, collections, check):
+    '''Runs check() with a reference link stored for each collection.'''
+    async def scenario():
+        async with mongo() as db:
+            db.get_legal_db()["links"].insert_many(
+                [{"collection": c, "reference_link": f"https://example.org/{c}"} for c in collections]
+            )
+            check()
+
+    run(scenario())
+
+
+def test_one_chunk_per_link_and_no_near_duplicates(mongo):
+    faqs = [
+        _chunk("wages", "Minimum wage is fixed by the state.", [1.0, 0.0]),
+        _chunk("wages", "Wages are paid monthly.", [0.0, 1.0]),
+        _chunk("leave", "Minimum wages are set by each state.", [0.99, 0.05]),
+        _chunk("bonus", "Bonus is 8.33% of wages.", [0.0, 1.0]),
+    ]
+
+    def check():
+        context, packed = pack_context(faqs, token_budget=1000, duplicate_threshold=0.95)
+        assert [chunk["_collection"] for chunk in packed] == ["wages", "bonus"]
+        # Sources are numbered in the order they are cited.
+        assert "Source 1 (Topic: Wages)" in context and "Source 2 (Topic: Bonus)" in context
+        assert "https://example.org/bonus" in context
+        assert "Wages are paid monthly." not in context
+
+    _with_links(mongo, ["wages", "leave", "bonus"], check)
+
+
+def test_best_chunk_is_truncated_to_fit_the_budget(mongo):
+    long_text = "the employer must pay wages on time " * 100
+    faqs = [_chunk("wages", long_text, [1.0, 0.0]), _chunk("bonus", "Bonus is 8.33% of wages.", [0.0, 1.0])]
+
+    def check():
+        context, packed = pack_context(faqs, token_budget=100, duplicate_threshold=0.95)
+        # The best chunk takes the whole budget, so the second one is left out.
+        assert [chunk["_collection"] for chunk in packed] == ["wages"]
+        assert count_tokens(context) <= 100
+        assert "the employer must pay wages" in context and long_text not in context
+
+    _with_links(mongo, ["wages", "bonus"], check)
+
+
+def test_later_chunks_stop_at_the_budget(mongo):
+    faqs = [_chunk(f"act_{i}", f"Section {i} of the act.", [float(i == j) for j in range(3)]) for i in range(3)]
+
+    def check():
+        one_source = count_tokens(pack_context(faqs[:1], token_budget=10000)[0])
+        _, packed = pack_context(faqs, token_budget=one_source + 2, duplicate_threshold=0.95)
+        assert [chunk["_collection"] for chunk in packed] == ["act_0"]
+        _, packed = pack_context(faqs, token_budget=10000, duplicate_threshold=0.95)
+        assert len(packed) == 3
+
+    _with_links(mongo, [f"act_{i}" for i in range(3)], check)
+
+
+def test_packing_leaves_the_callers_chunks_untouched(mongo):
+    faqs = [_chunk("wages", "Minimum wage is fixed by the state.", [1.0, 0.0])]
+
+    def check():
+        _, packed = pack_context(faqs, token_budget=1000)
+        assert packed[0]["__ref_link"] == "https://example.org/wages"
+        assert "__ref_link" not in faqs[0]
+
+    _with_links(mongo, ["wages"], check)
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+pytest.importorskip("pymongo")
+from backend.services import tts_service
+from tests.conftest import run
+
+
+@pytest.fixture
+def tts(monkeypatch):
+    calls = []
+
+    def fake_synthesize(text, lang, voice):
+        calls.append(text)
+        return b"RIFF" + text.encode()
+
+    # Threads running a fake engine stand in for the spawned pyttsx3 worker processes.
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(tts_service, "_synthesize_in_worker", fake_synthesize)
+    monkeypatch.setattr(tts_service, "_get_pool", lambda: pool)
+    monkeypatch.setattr(tts_service, "audio_cache", tts_service.AudioCache())
+    yield calls
+    pool.shutdown()
+
+
+def test_contains_does_not_count():
+    cache = tts_service.AudioCache()
+    key = tts_service.cache_key("hello", "en")
+    assert key not in cache
+    cache.put(key, b"abc")
+    assert key in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_schedule_then_get_counts_one_miss(tts, mongo):
+    async def scenario():
+        async with mongo():
+            audio_id = await tts_service.schedule_synthesis("hello", "en")
+            assert await tts_service.get_audio(audio_id) == b"RIFFhello"
+            assert await tts_service.get_audio(audio_id) == b"RIFFhello"
+
+    run(scenario())
+    assert tts == ["hello"]
+    # One miss starts the synthesis, the other caller joins it; the second GET is a hit.
+    assert (tts_service.audio_cache.hits, tts_service.audio_cache.misses) == (1, 1)
+
+
+def test_busy_pool_fails_fast(tts, mongo, monkeypatch):
+    monkeypatch.setattr(tts_service, "TTS_MAX_PENDING", 0)
+
+    async def scenario():
+        async with mongo():
+            assert tts_service.tts_busy()
+            # The handle is still issued; the audio is synthesized on the first GET instead.
+            audio_id = await tts_service.schedule_synthesis("busy", "en")
+            with pytest.raises(tts_service.TTSBusyError):
+                await tts_service.get_audio(audio_id)
+
+    run(scenario())
+    assert tts == []
+
+
+def test_handle_resolves_on_another_worker(tts, mongo):
+    async def scenario():
+        async with mongo() as db:
+            await tts_service.ensure_handle_index()
+            # Stored by another worker's schedule_synthesis; this one never saw the handle.
+            audio_id = tts_service.audio_id_for("namaste", "hi")
+            await db.get_async_chatbot_db()[tts_service.TTS_HANDLES_COLLECTION].insert_one(
+                {"_id": audio_id, "text": "namaste", "lang": "hi", "voice": None, "issued_at": datetime.now(timezone.utc)}
+            )
+            assert await tts_service.audio_exists(audio_id)
+            assert await tts_service.get_audio(audio_id) == b"RIFFnamaste"
+            assert not await tts_service.audio_exists("0" * 64)
+            assert await tts_service.get_audio("0" * 64) is None
+
+    run(scenario())
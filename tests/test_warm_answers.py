@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("pymongo")
+from backend.nlp import warm_answers
+from backend.nlp.warm_answers import WarmAnswerStore, warm_answer_id, query_key
+from tests.conftest import run
+
+
+async def _version():
+    return "v1"
+
+
+def test_lookups_buffer_hit_counts(mongo):
+    async def scenario():
+        async with mongo() as db:
+            collection = db.get_async_chatbot_db()[warm_answers.WARM_ANSWERS_COLLECTION]
+            await collection.insert_many([
+                {"_id": warm_answer_id("Minimum wage?", "en"), "answer": "Rs 400", "corpus_version": "v1", "hits": 0},
+                {"_id": warm_answer_id("Old question", "en"), "answer": "stale", "corpus_version": "v0", "hits": 0},
+            ])
+            store = WarmAnswerStore(hits_flush_interval=3600)
+            store.current_version = _version
+
+            assert (await store.lookup("  minimum   WAGE? ", "en"))["answer"] == "Rs 400"
+            assert await store.lookup("Minimum wage?", "hi") is None
+            assert await store.lookup("Old question", "en") is None  # built for another corpus
+            found = await store.lookup_many(["Minimum wage?", "other"], "en")
+            assert [f and f["answer"] for f in found] == ["Rs 400", None]
+            assert (store.hits, store.misses) == (2, 3)
+
+            # Lookups are reads only until the buffered counts are flushed.
+            doc = await collection.find_one({"_id": warm_answer_id("Minimum wage?", "en")})
+            assert doc["hits"] == 0
+            await store.flush_hits()
+            doc = await collection.find_one({"_id": warm_answer_id("Minimum wage?", "en")})
+            assert doc["hits"] == 2
+
+    run(scenario())
+
+
+def test_invalidate_questions_drops_every_language(mongo):
+    async def scenario():
+        async with mongo() as db:
+            collection = db.get_async_chatbot_db()[warm_answers.WARM_ANSWERS_COLLECTION]
+            await collection.insert_many([
+                {"_id": warm_answer_id("leave", lang), "query_key": query_key("leave"), "answer": "x"} for lang in ("en", "hi")
+            ])
+            assert await WarmAnswerStore().invalidate_questions(["Leave", ""]) == 2
+
+    run(scenario())